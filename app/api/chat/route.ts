@@ -131,6 +131,87 @@ async function searchDocumentsVectorial(query: string, limit: number = 10): Prom
   }
 }
 
+// Número de artículo canónico citado en la consulta ("artículo 27", "art. 4o", "artículo 274 bis").
+// Debe coincidir con normalize_article_number de lib/legal_structure.py.
+function parseArticleQuery(query: string): string | null {
+  const match = query.match(/\b(?:art[íi]culo|art\.?)\s*(\d+)\s*(?:o\b|º|°)?\s*(?:\b(bis|ter|qu[áa]ter|quinquies|sexies|septies|octies|nonies|decies)\b)?/i);
+  if (!match) return null;
+  const number = String(parseInt(match[1], 10));
+  return match[2] ? `${number} ${match[2].toLowerCase().normalize('NFD').replace(/[\u0300-\u036f]/g, '')}` : number;
+}
+
+// Palabras de un nombre de archivo o de una consulta, sin acentos ni mayúsculas
+// ("ConstitucionPoliticaEstadosUnidosMexicanos.doc.txt" -> constitucion, politica, ...)
+function sourceWords(text: string): string[] {
+  return text
+    .replace(/\.(doc|txt|pdf)\b/gi, ' ')
+    .replace(/([a-záéíóúñ])([A-ZÁÉÍÓÚÑ])/g, '$1 $2')
+    .toLowerCase()
+    .normalize('NFD').replace(/[\u0300-\u036f]/g, '')
+    .split(/[^a-z0-9]+/)
+    .filter(word => word.length > 3);
+}
+
+// Muchos códigos tienen un artículo 27: si la consulta nombra el documento
+// ("artículo 27 de la constitución") se usan solo los que más coinciden; si no,
+// se devuelve cada documento como un grupo con su artículo completo en orden
+async function searchArticleExact(query: string, limit: number = 10, chunksPerDocument: number = 3): Promise<Document[]> {
+  const articleNumber = parseArticleQuery(query);
+  if (!articleNumber) return [];
+
+  try {
+    const { data, error } = await supabase
+      .from('chunks')
+      .select('chunk_id, chunk_text, char_count, document_id, article_number, chunk_order, documents(source)')
+      .eq('article_number', articleNumber)
+      .order('document_id')
+      .order('chunk_order')
+      .limit(limit * 10);
+
+    if (error) {
+      console.error('Error en búsqueda exacta por artículo:', error);
+      return [];
+    }
+
+    const groups = new Map<string, any[]>();
+    for (const chunk of data || []) {
+      const group = groups.get(chunk.document_id) || [];
+      group.push(chunk);
+      groups.set(chunk.document_id, group);
+    }
+
+    const queryWords = new Set(sourceWords(query));
+    const scores = new Map<string, number>();
+    for (const [documentId, chunks] of groups) {
+      const source = (chunks[0] as any).documents?.source || '';
+      scores.set(documentId, sourceWords(source).filter(word => queryWords.has(word)).length);
+    }
+    const bestScore = Math.max(0, ...scores.values());
+    const documentIds = [...groups.keys()].filter(documentId => scores.get(documentId) === bestScore);
+
+    // El documento nombrado se devuelve completo; si no hay uno, unos chunks de cada documento
+    const perDocument = documentIds.length === 1 ? limit : Math.max(1, Math.min(chunksPerDocument, Math.floor(limit / documentIds.length)));
+    const results = documentIds
+      .flatMap(documentId => groups.get(documentId)!.slice(0, perDocument))
+      .slice(0, limit);
+
+    console.log(`✅ Artículo ${articleNumber}: ${results.length} chunks de ${Math.min(documentIds.length, results.length)} documento(s) por coincidencia exacta`);
+    return results.map((chunk: any) => ({
+      chunk_id: chunk.chunk_id,
+      document_id: chunk.document_id,
+      source: chunk.documents?.source || 'Documento legal',
+      legal_document_name: chunk.documents?.source,
+      article_number: chunk.article_number,
+      // Coincidencia exacta: por encima de cualquier score vectorial o BM25
+      similarity_score: 1,
+      content: chunk.chunk_text
+    }));
+  } catch (error) {
+    console.error('Error en búsqueda exacta por artículo:', error);
+    return [];
+  }
+}
+
 // Función para generar respuesta usando Gemini
 async function generateResponse(query: string, context: string): Promise<string> {
   try {
@@ -256,8 +337,12 @@ export async function POST(req: NextRequest) {
     // Ejecutar búsquedas secuencialmente para debug
     console.log('🔍 Ejecutando BM25...');
     const bm25Results = await searchDocumentsBM25(finalQuery, 10);
+    // Consultas del tipo "artículo 27": coincidencia exacta sin embeddings ni búsqueda vectorial
+    const exactResults = await searchArticleExact(finalQuery, 10);
     console.log('🔍 Ejecutando Vectorial...');
-    const vectorResults = await searchDocumentsVectorial(finalQuery, 10);
+    const vectorResults = exactResults.length > 0
+      ? exactResults
+      : await searchDocumentsVectorial(finalQuery, 10);
 
     console.log('📊 Resultados obtenidos:');
     console.log(`- BM25: ${bm25Results.length} documentos`);
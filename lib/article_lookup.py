@@ -0,0 +1,29 @@
+from typing import Any, Dict, List, Optional
+
+from lib.legal_structure import parse_article_query
+
+
+def lookup_article(supabase, article_number: str, document_id: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    Chunks de un artículo por coincidencia exacta en chunks.article_number
+    (índice idx_chunks_article_number), en orden dentro del artículo.
+    """
+    query = supabase.table('chunks').select(
+        'chunk_id, chunk_text, document_id, section_id, article_number, chunk_order, start_page, end_page'
+    ).eq('article_number', article_number)
+    if document_id:
+        query = query.eq('document_id', document_id)
+    result = query.order('document_id').order('chunk_order').limit(limit).execute()
+    return result.data or []
+
+
+def lookup_article_query(supabase, query: str, document_id: Optional[str] = None, limit: int = 20) -> Optional[List[Dict[str, Any]]]:
+    """
+    Si la consulta cita un artículo concreto, devolver sus chunks sin búsqueda
+    vectorial. None si la consulta no cita ningún artículo; lista vacía si lo
+    cita pero no existe.
+    """
+    article_number = parse_article_query(query)
+    if article_number is None:
+        return None
+    return lookup_article(supabase, article_number, document_id=document_id, limit=limit)
@@ -0,0 +1,340 @@
+import json
+import math
+import os
+import re
+import threading
+from array import array
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from lib.legal_structure import strip_accents
+from lib.supabase.client import document_ids_by_section
+
+# Columnas que devuelve search_bm25 (además de bm25_score)
+ROW_COLUMNS = (
+    'chunk_id', 'chunk_text', 'char_count', 'chunk_order', 'document_id', 'section_id',
+    'legal_document_name', 'legal_document_code', 'article_number', 'section_number',
+    'paragraph_number', 'created_at'
+)
+
+DEFAULT_K1 = 1.2
+DEFAULT_B = 0.75
+
+# Stopwords del diccionario 'spanish' de Postgres (sin acentos)
+SPANISH_STOPWORDS = frozenset("""
+de la que el en y a los del se las por un para con no una su al lo como mas pero sus le ya o
+este si porque esta entre cuando muy sin sobre tambien me hasta hay donde quien desde todo nos
+durante todos uno les ni contra otros ese eso ante ellos e esto mi antes algunos que unos yo otro
+otras otra el tanto esa estos mucho quienes nada muchos cual poco ella estar estas algunas algo
+nosotros mi mis tu te ti tu tus ellas nosotras vosotros vosotras os mio mia mios mias tuyo tuya
+tuyos tuyas suyo suya suyos suyas nuestro nuestra nuestros nuestras vuestro vuestra vuestros
+vuestras esos esas estoy estas esta estamos estais estan este estes estemos esteis esten fue
+fueron fui fuimos ser es son era eran sera seran sido siendo ha han he hemos habia habian haber
+hubo tiene tienen tener tenia cual cuales sea sean
+""".split())
+
+# Sufijos que se eliminan al derivar, de más largo a más corto
+_DERIVATIONAL_SUFFIXES = (
+    'amientos', 'imientos', 'aciones', 'uciones', 'amiento', 'imiento', 'adoras', 'adores',
+    'ancias', 'encias', 'logias', 'idades', 'mente', 'acion', 'ucion', 'adora', 'ador', 'ancia',
+    'encia', 'logia', 'idad', 'ables', 'ibles', 'ismos', 'istas', 'able', 'ible', 'ismo', 'ista',
+    'osos', 'osas', 'ivos', 'ivas', 'oso', 'osa', 'ivo', 'iva',
+)
+_VERB_SUFFIXES = (
+    'aremos', 'eremos', 'iremos', 'ieron', 'iendo', 'aron', 'ando', 'ados', 'adas', 'idos',
+    'idas', 'aria', 'eria', 'iria', 'ado', 'ada', 'ido', 'ida', 'ara', 'era', 'ira', 'ar', 'er', 'ir',
+)
+_PLURAL_SUFFIXES = ('es', 's')
+_VOWEL_SUFFIXES = ('a', 'o', 'e')
+MIN_STEM = 3
+# Cambia con las reglas de stem_spanish: un índice guardado con otras reglas no se carga
+STEMMER_VERSION = 2
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+@lru_cache(maxsize=100000)
+def stem_spanish(word: str) -> str:
+    """
+    Derivación ligera para español (al estilo de Snowball): se quita como
+    mucho un sufijo derivativo o verbal, luego el plural y luego la vocal
+    final, sin dejar raíces de menos de MIN_STEM letras. Espera texto sin
+    acentos. Singular y plural comparten raíz:
+
+    >>> [stem_spanish(w) for w in ('derecho', 'derechos', 'persona', 'personas')]
+    ['derech', 'derech', 'person', 'person']
+    >>> [stem_spanish(w) for w in ('ley', 'leyes', 'base', 'bases', 'nacion', 'naciones')]
+    ['ley', 'ley', 'bas', 'bas', 'nacion', 'nacion']
+    """
+    if len(word) <= MIN_STEM or word.isdigit():
+        return word
+    for suffixes in (_DERIVATIONAL_SUFFIXES, _VERB_SUFFIXES):
+        for suffix in suffixes:
+            if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+                word = word[:-len(suffix)]
+                break
+        else:
+            continue
+        break
+    for suffixes in (_PLURAL_SUFFIXES, _VOWEL_SUFFIXES):
+        for suffix in suffixes:
+            if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+                word = word[:-len(suffix)]
+                break
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Términos de un texto: minúsculas, sin acentos, sin stopwords y derivados"""
+    words = _TOKEN_RE.findall(strip_accents(text.lower()))
+    return [stem_spanish(w) for w in words if w not in SPANISH_STOPWORDS]
+
+
+class BM25Index:
+    """
+    Índice invertido BM25 sobre chunks, equivalente en filas a search_bm25.
+
+    Las listas de postings tienen dos capas:
+      - base: arreglos numpy contiguos (formato CSR) tal como se cargan de disco
+      - delta: array('I') por término con los documentos añadidos después
+    `compact()` fusiona ambas capas y descarta los documentos borrados; `save()`
+    compacta antes de escribir. Los ids internos de documento son enteros
+    crecientes, así las postings de cada término quedan ordenadas.
+    """
+
+    def __init__(self, k1: float = DEFAULT_K1, b: float = DEFAULT_B):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self.rows: List[Optional[Dict[str, Any]]] = []
+        self._doc_len = array('I')
+        self._by_chunk_id: Dict[str, int] = {}
+        self._df: Dict[str, int] = {}
+        self._total_len = 0
+        self._live = 0
+        self._deleted: List[int] = []
+
+        self._base_terms: Dict[str, int] = {}
+        self._base_offsets = np.zeros(1, dtype=np.int64)
+        self._base_docs = np.zeros(0, dtype=np.uint32)
+        self._base_tfs = np.zeros(0, dtype=np.uint32)
+        self._delta: Dict[str, Tuple[array, array]] = {}
+
+    def __len__(self) -> int:
+        return self._live
+
+    @property
+    def avgdl(self) -> float:
+        return self._total_len / self._live if self._live else 0.0
+
+    def add(self, rows: Iterable[Dict[str, Any]]):
+        """Añadir o reemplazar chunks (por chunk_id)"""
+        with self._lock:
+            for row in rows:
+                chunk_id = str(row['chunk_id'])
+                if chunk_id in self._by_chunk_id:
+                    self._remove_one(chunk_id)
+                terms = tokenize(row.get('chunk_text') or '')
+                doc = len(self.rows)
+                self.rows.append({column: row.get(column) for column in ROW_COLUMNS})
+                self._doc_len.append(len(terms))
+                self._by_chunk_id[chunk_id] = doc
+                self._total_len += len(terms)
+                self._live += 1
+
+                counts: Dict[str, int] = {}
+                for term in terms:
+                    counts[term] = counts.get(term, 0) + 1
+                for term, tf in counts.items():
+                    postings = self._delta.get(term)
+                    if postings is None:
+                        postings = self._delta[term] = (array('I'), array('I'))
+                    postings[0].append(doc)
+                    postings[1].append(tf)
+                    self._df[term] = self._df.get(term, 0) + 1
+
+    def _remove_one(self, chunk_id: str):
+        doc = self._by_chunk_id.pop(chunk_id)
+        row = self.rows[doc]
+        for term in set(tokenize(row.get('chunk_text') or '')):
+            self._df[term] -= 1
+        self._total_len -= self._doc_len[doc]
+        self._live -= 1
+        # Las postings del documento quedan hasta compact(); se ignoran en search()
+        self.rows[doc] = None
+        self._deleted.append(doc)
+
+    def remove(self, chunk_ids: Iterable[str]):
+        with self._lock:
+            for chunk_id in chunk_ids:
+                if str(chunk_id) in self._by_chunk_id:
+                    self._remove_one(str(chunk_id))
+
+    def _postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        parts_docs, parts_tfs = [], []
+        index = self._base_terms.get(term)
+        if index is not None:
+            start, end = self._base_offsets[index], self._base_offsets[index + 1]
+            parts_docs.append(self._base_docs[start:end])
+            parts_tfs.append(self._base_tfs[start:end])
+        delta = self._delta.get(term)
+        if delta is not None:
+            parts_docs.append(np.frombuffer(delta[0], dtype=np.uint32))
+            parts_tfs.append(np.frombuffer(delta[1], dtype=np.uint32))
+        if not parts_docs:
+            return self._base_docs[:0], self._base_tfs[:0]
+        if len(parts_docs) == 1:
+            return parts_docs[0], parts_tfs[0]
+        return np.concatenate(parts_docs), np.concatenate(parts_tfs)
+
+    def search(self, query: str, limit: int = 30, match_all: bool = False) -> List[Dict[str, Any]]:
+        """
+        Top `limit` chunks por BM25, con las columnas de search_bm25 y bm25_score.
+        Con match_all=True solo cuentan los chunks que contienen todos los
+        términos de la consulta, como el filtro plainto_tsquery de SQL.
+
+        >>> index = BM25Index()
+        >>> index.add([{'chunk_id': 'c1', 'chunk_text': 'Toda persona tiene derecho a la salud'}])
+        >>> [row['chunk_id'] for row in index.search('derechos de las personas', match_all=True)]
+        ['c1']
+
+        Sin tokens en el corpus (solo stopwords o texto vacío) no hay resultados:
+
+        >>> index = BM25Index()
+        >>> index.add([{'chunk_id': 'c1', 'chunk_text': 'de la'}])
+        >>> index.search('salud')
+        []
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            if not terms or not self._total_len:
+                return []
+            n = len(self.rows)
+            doc_len = np.frombuffer(self._doc_len, dtype=np.uint32).astype(np.float32)
+            scores = np.zeros(n, dtype=np.float32)
+            matched = np.zeros(n, dtype=np.int32) if match_all else None
+            norm = self.k1 * (1 - self.b + self.b * doc_len / self.avgdl)
+
+            for term in terms:
+                df = self._df.get(term, 0)
+                if df <= 0:
+                    if match_all:
+                        return []
+                    continue
+                docs, tfs = self._postings(term)
+                tf = tfs.astype(np.float32)
+                idf = math.log(1 + (self._live - df + 0.5) / (df + 0.5))
+                scores[docs] += idf * tf * (self.k1 + 1) / (tf + norm[docs])
+                if match_all:
+                    matched[docs] += 1
+
+            if match_all:
+                scores[matched < len(terms)] = 0
+            scores[self._deleted] = 0
+            candidates = np.flatnonzero(scores > 0)
+            if len(candidates) > limit:
+                candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+            candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+
+            return [dict(self.rows[doc], bm25_score=float(scores[doc])) for doc in candidates]
+
+    def compact(self):
+        """Fusionar base y delta en arreglos contiguos y descartar documentos borrados"""
+        with self._lock:
+            remap = np.full(len(self.rows), -1, dtype=np.int64)
+            live_docs = [doc for doc, row in enumerate(self.rows) if row is not None]
+            remap[live_docs] = np.arange(len(live_docs))
+
+            terms, offsets, all_docs, all_tfs = [], [0], [], []
+            for term in sorted(set(self._base_terms) | set(self._delta)):
+                if self._df.get(term, 0) <= 0:
+                    continue
+                docs, tfs = self._postings(term)
+                new_docs = remap[docs]
+                keep = new_docs >= 0
+                terms.append(term)
+                all_docs.append(new_docs[keep].astype(np.uint32))
+                all_tfs.append(tfs[keep])
+                offsets.append(offsets[-1] + int(keep.sum()))
+
+            self.rows = [self.rows[doc] for doc in live_docs]
+            self._doc_len = array('I', (self._doc_len[doc] for doc in live_docs))
+            self._by_chunk_id = {str(row['chunk_id']): doc for doc, row in enumerate(self.rows)}
+            self._df = {term: offsets[i + 1] - offsets[i] for i, term in enumerate(terms)}
+            self._base_terms = {term: i for i, term in enumerate(terms)}
+            self._base_offsets = np.asarray(offsets, dtype=np.int64)
+            self._base_docs = np.concatenate(all_docs) if all_docs else np.zeros(0, dtype=np.uint32)
+            self._base_tfs = np.concatenate(all_tfs) if all_tfs else np.zeros(0, dtype=np.uint32)
+            self._delta = {}
+            self._deleted = []
+
+    def save(self, path: str):
+        """
+        Guardar en `path` (directorio): meta.json con parámetros y términos,
+        postings.npz con los arreglos CSR y rows.jsonl con las filas.
+        """
+        os.makedirs(path, exist_ok=True)
+        with self._lock:
+            self.compact()
+            with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump({
+                    'k1': self.k1,
+                    'b': self.b,
+                    'stemmer': STEMMER_VERSION,
+                    'terms': sorted(self._base_terms, key=self._base_terms.get)
+                }, f, ensure_ascii=False)
+            np.savez(
+                os.path.join(path, 'postings.npz'),
+                offsets=self._base_offsets,
+                docs=self._base_docs,
+                tfs=self._base_tfs,
+                doc_len=np.frombuffer(self._doc_len, dtype=np.uint32)
+            )
+            with open(os.path.join(path, 'rows.jsonl'), 'w', encoding='utf-8') as f:
+                for row in self.rows:
+                    f.write(json.dumps(row, ensure_ascii=False, default=str) + '\n')
+
+    @classmethod
+    def load(cls, path: str) -> 'BM25Index':
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('stemmer', 1) != STEMMER_VERSION:
+            raise ValueError(f"{path}: índice BM25 construido con otra derivación "
+                             f"(versión {meta.get('stemmer', 1)}, actual {STEMMER_VERSION}); reconstrúyelo")
+        index = cls(k1=meta['k1'], b=meta['b'])
+        data = np.load(os.path.join(path, 'postings.npz'))
+        index._base_offsets = data['offsets']
+        index._base_docs = data['docs']
+        index._base_tfs = data['tfs']
+        index._doc_len = array('I', data['doc_len'].astype(np.uint32).tobytes())
+        index._base_terms = {term: i for i, term in enumerate(meta['terms'])}
+        index._df = {term: int(index._base_offsets[i + 1] - index._base_offsets[i])
+                     for i, term in enumerate(meta['terms'])}
+        with open(os.path.join(path, 'rows.jsonl'), encoding='utf-8') as f:
+            index.rows = [json.loads(line) for line in f]
+        index._by_chunk_id = {str(row['chunk_id']): doc for doc, row in enumerate(index.rows)}
+        index._total_len = int(data['doc_len'].sum())
+        index._live = len(index.rows)
+        return index
+
+
+def build_from_supabase(supabase, k1: float = DEFAULT_K1, b: float = DEFAULT_B, page_size: int = 1000) -> BM25Index:
+    """
+    Construir el índice leyendo la tabla chunks por páginas. document_id se
+    obtiene por la sección de cada chunk, como en search_chunks_bm25.
+    """
+    index = BM25Index(k1=k1, b=b)
+    columns = ', '.join(column for column in ROW_COLUMNS if column != 'document_id')
+    start = 0
+    while True:
+        rows = supabase.table('chunks').select(columns) \
+            .order('chunk_id').range(start, start + page_size - 1).execute().data or []
+        documents = document_ids_by_section(supabase, (row.get('section_id') for row in rows))
+        index.add([dict(row, document_id=documents.get(str(row.get('section_id')))) for row in rows])
+        if len(rows) < page_size:
+            break
+        start += page_size
+    index.compact()
+    return index
@@ -0,0 +1,11 @@
+# Configuración del SentenceChunker de la ingesta (scripts/load_documents.py).
+# El worker de chonkie_chunker.py tiene la suya (DEFAULT_PARAMS), con más
+# delimitadores y min_sentences_per_chunk=2.
+LOADER_CHUNKER_PARAMS = {
+    'tokenizer_or_token_counter': 'gpt2',
+    'chunk_size': 512,
+    'chunk_overlap': 50,
+    'min_sentences_per_chunk': 1,
+    'min_characters_per_sentence': 10,
+    'delim': ['.', '!', '?', '\n', 'PRIMERA.', 'SEGUNDA.', 'TERCERA.', 'CUARTA.', 'QUINTA.', 'SEXTA.', 'SÉPTIMA.', 'OCTAVA.', 'NOVENA.', 'DÉCIMA.']
+}
@@ -0,0 +1,444 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from lib.bm25 import DEFAULT_B, DEFAULT_K1, ROW_COLUMNS, BM25Index
+from lib.embedding_migration import LEGACY_MODEL_VERSION, get_model
+from lib.query_cache import bump_corpus_generation
+from lib.reference_graph import update_document_references
+from lib.supabase.bulk_writer import BulkWriter
+from lib.vector_index import DEFAULT_BLOCK_ROWS, EMBEDDING_DIMENSION, VectorIndex, normalize_rows, parse_vector
+
+SNAPSHOT_FORMAT = 'corpus-snapshot'
+SNAPSHOT_FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+
+DEFAULT_PAGE_SIZE = 1000
+# Filas por record batch: cada batch de embeddings es un bloque contiguo de la búsqueda mapeada
+DEFAULT_BATCH_ROWS = 16384
+
+# Columnas de cada tabla: (nombre, tipo Arrow). Los uuid, fechas y timestamps
+# se guardan como texto tal como los devuelve PostgREST.
+TABLE_COLUMNS = {
+    'documents': (
+        ('document_id', 'string'), ('source', 'string'), ('doc_type', 'string'), ('jurisdiction', 'string'),
+        ('publication_date', 'string'), ('last_reform_date', 'string'), ('created_at', 'string'),
+    ),
+    'sections': (
+        ('section_id', 'string'), ('document_id', 'string'), ('parent_section_id', 'string'),
+        ('section_type', 'string'), ('section_number', 'string'), ('content_hash', 'string'),
+        ('created_at', 'string'),
+    ),
+    'chunks': (
+        ('chunk_id', 'string'), ('section_id', 'string'), ('document_id', 'string'), ('chunk_text', 'string'),
+        ('char_count', 'int32'), ('start_page', 'int32'), ('end_page', 'int32'), ('vector_id', 'string'),
+        ('hierarchy_id', 'string'), ('legal_document_name', 'string'), ('legal_document_code', 'string'),
+        ('article_number', 'string'), ('section_number', 'string'), ('paragraph_number', 'string'),
+        ('chunk_order', 'int32'), ('created_at', 'string'),
+    ),
+    'embeddings': (
+        ('vector_id', 'string'), ('chunk_id', 'string'), ('embeddings_order', 'int32'), ('created_at', 'string'),
+    ),
+}
+
+PRIMARY_KEYS = {'documents': 'document_id', 'sections': 'section_id', 'chunks': 'chunk_id', 'embeddings': 'vector_id'}
+
+# Hijas antes que padres al exportar: una fila que se carga durante la
+# exportación tiene a su padre en la tabla que aún se va a leer. Al
+# restaurar, el orden inverso respeta las FK.
+EXPORT_ORDER = ('embeddings', 'chunks', 'sections', 'documents')
+IMPORT_ORDER = tuple(reversed(EXPORT_ORDER))
+
+Row = Dict[str, Any]
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc  # noqa: F401
+    except ImportError:
+        raise ImportError('Las instantáneas del corpus requieren pyarrow: pip install pyarrow')
+    return pa
+
+
+def _schema(table: str, dimension: Optional[int] = None):
+    pa = _pyarrow()
+    fields = [pa.field(name, getattr(pa, kind)()) for name, kind in TABLE_COLUMNS[table]]
+    if table == 'embeddings':
+        # Lista de tamaño fijo: los valores de un batch son una matriz float32 contigua
+        fields.append(pa.field('embedding', pa.list_(pa.float32(), dimension), nullable=False))
+    return pa.schema(fields)
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class _TableWriter:
+    """Archivo Arrow IPC de una tabla; junta páginas hasta `batch_rows` filas por record batch"""
+
+    def __init__(self, path: str, schema, batch_rows: int):
+        pa = _pyarrow()
+        self.path = path
+        self.schema = schema
+        self.batch_rows = batch_rows
+        self.rows = 0
+        self._pending: List[Any] = []
+        self._pending_rows = 0
+        self._sink = pa.OSFile(path + '.tmp', 'wb')
+        # Sin compresión: los buffers del archivo se pueden mapear en memoria tal cual
+        self._writer = pa.ipc.new_file(self._sink, schema)
+
+    def write(self, table):
+        self._pending.append(table)
+        self._pending_rows += table.num_rows
+        if self._pending_rows >= self.batch_rows:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending_rows:
+            return
+        pa = _pyarrow()
+        table = pa.concat_tables(self._pending).combine_chunks()
+        for batch in table.to_batches(max_chunksize=self.batch_rows):
+            self._writer.write_batch(batch)
+        self.rows += self._pending_rows
+        self._pending, self._pending_rows = [], 0
+
+    def close(self) -> Dict[str, Any]:
+        self._flush()
+        self._writer.close()
+        self._sink.close()
+        os.replace(self.path + '.tmp', self.path)
+        return {
+            'file': os.path.basename(self.path),
+            'rows': self.rows,
+            'bytes': os.path.getsize(self.path),
+            'sha256': _file_sha256(self.path),
+            'columns': self.schema.names,
+        }
+
+
+def _iter_pages(supabase, table: str, columns: List[str], key: str, page_size: int,
+                model_version: Optional[str] = None) -> Iterator[List[Row]]:
+    """Páginas de una tabla por clave (keyset: cada página pide las claves mayores que la última, sin OFFSET)"""
+    cursor = None
+    while True:
+        query = supabase.table(table).select(', '.join(columns))
+        if model_version is not None:
+            query = query.eq('model_version', model_version)
+        if cursor is not None:
+            query = query.gt(key, cursor)
+        rows = query.order(key).limit(page_size).execute().data or []
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        cursor = rows[-1][key]
+
+
+def _embedding_pages(supabase, page_size: int, model_version: Optional[str]) -> Iterator[Tuple[List[Row], np.ndarray]]:
+    """Páginas de embeddings (o de chunk_embeddings de `model_version`) con sus vectores como matriz float32"""
+    if model_version is None:
+        pages = _iter_pages(supabase, 'embeddings', [name for name, _ in TABLE_COLUMNS['embeddings']] + ['embedding'],
+                            'vector_id', page_size)
+    else:
+        pages = _iter_pages(supabase, 'chunk_embeddings', ['chunk_id', 'embedding', 'created_at'],
+                            'chunk_id', page_size, model_version=model_version)
+    for rows in pages:
+        rows = [row for row in rows if row.get('embedding')]
+        if rows:
+            yield rows, np.asarray([parse_vector(row.pop('embedding')) for row in rows], dtype=np.float32)
+
+
+def _embedding_model(supabase, version: str) -> Optional[Row]:
+    try:
+        return get_model(supabase, version)
+    except Exception:
+        # Bases anteriores a la migración de embedding_models
+        return None
+
+
+def export_snapshot(
+    supabase,
+    path: str,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    model_version: Optional[str] = None,
+    report: Callable[[str], None] = print
+) -> Dict[str, Any]:
+    """
+    Exportar documents, sections, chunks y embeddings a archivos Arrow IPC
+    (uno por tabla) en el directorio `path`, leyendo por páginas sin cargar
+    el corpus en memoria. Los embeddings se guardan como listas float32 de
+    tamaño fijo; con `model_version` se exportan los de esa versión en
+    chunk_embeddings en lugar de la tabla embeddings. manifest.json (filas,
+    bytes y sha256 de cada archivo, modelo y dimensión) se escribe al final:
+    un directorio sin manifiesto es una exportación interrumpida.
+    """
+    os.makedirs(path, exist_ok=True)
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    pa = _pyarrow()
+    version = model_version or LEGACY_MODEL_VERSION
+    model = _embedding_model(supabase, version)
+    dimension = None
+    tables = {}
+    start = time.perf_counter()
+    for table in EXPORT_ORDER:
+        table_start = time.perf_counter()
+        file_path = os.path.join(path, f'{table}.arrow')
+        writer = None
+        if table == 'embeddings':
+            for rows, vectors in _embedding_pages(supabase, page_size, model_version):
+                if writer is None:
+                    dimension = vectors.shape[1]
+                    writer = _TableWriter(file_path, _schema(table, dimension), batch_rows)
+                if vectors.ndim != 2 or vectors.shape[1] != dimension:
+                    raise ValueError(f'Embeddings de dimensiones distintas en {version}: {vectors.shape}, se esperaba {dimension}')
+                columns = {name: pa.array([row.get(name) for row in rows], type=writer.schema.field(name).type)
+                           for name in writer.schema.names if name != 'embedding'}
+                columns['embedding'] = pa.FixedSizeListArray.from_arrays(pa.array(vectors.reshape(-1)), dimension)
+                writer.write(pa.table(columns, schema=writer.schema))
+            if writer is None:
+                dimension = (model or {}).get('dimension') or EMBEDDING_DIMENSION
+                writer = _TableWriter(file_path, _schema(table, dimension), batch_rows)
+        else:
+            schema = _schema(table)
+            writer = _TableWriter(file_path, schema, batch_rows)
+            for rows in _iter_pages(supabase, table, schema.names, PRIMARY_KEYS[table], page_size):
+                writer.write(pa.Table.from_pylist(rows, schema=schema))
+        tables[table] = writer.close()
+        report(f"   📦 {table}: {tables[table]['rows']} filas, {tables[table]['bytes'] / 1e6:.1f} MB "
+               f"en {time.perf_counter() - table_start:.1f} s")
+
+    manifest = {
+        'format': SNAPSHOT_FORMAT,
+        'format_version': SNAPSHOT_FORMAT_VERSION,
+        'created_at': _now(),
+        'embedding': {
+            'model_version': version,
+            'source_table': 'embeddings' if model_version is None else 'chunk_embeddings',
+            'dimension': dimension,
+            'model': model,
+        },
+        'tables': tables,
+    }
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(tmp_path, manifest_path)
+    report(f"✅ Instantánea en {path} ({time.perf_counter() - start:.1f} s)")
+    return manifest
+
+
+def read_manifest(path: str) -> Dict[str, Any]:
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        raise ValueError(f'{path} no tiene {MANIFEST_NAME}: no es una instantánea o la exportación no terminó')
+    with open(manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != SNAPSHOT_FORMAT or manifest.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Formato de instantánea no soportado: {manifest.get('format')} v{manifest.get('format_version')}")
+    return manifest
+
+
+def verify_snapshot(path: str) -> Dict[str, Any]:
+    """Comprobar tamaño, sha256 y filas de cada archivo contra el manifiesto; devuelve el manifiesto"""
+    manifest = read_manifest(path)
+    for table, entry in manifest['tables'].items():
+        file_path = os.path.join(path, entry['file'])
+        if not os.path.exists(file_path) or os.path.getsize(file_path) != entry['bytes']:
+            raise ValueError(f"{entry['file']} falta o no tiene el tamaño del manifiesto")
+        if _file_sha256(file_path) != entry['sha256']:
+            raise ValueError(f"{entry['file']} no coincide con el sha256 del manifiesto")
+        rows = sum(batch.num_rows for batch in iter_batches(path, table))
+        if rows != entry['rows']:
+            raise ValueError(f"{entry['file']} tiene {rows} filas; el manifiesto dice {entry['rows']}")
+    return manifest
+
+
+def iter_batches(path: str, table: str) -> Iterator[Any]:
+    """Record batches de una tabla de la instantánea, mapeados en memoria (sin copiar los datos)"""
+    pa = _pyarrow()
+    source = pa.memory_map(os.path.join(path, f'{table}.arrow'), 'r')
+    reader = pa.ipc.open_file(source)
+    for i in range(reader.num_record_batches):
+        yield reader.get_batch(i)
+
+
+def _parents_first(rows: List[Row]) -> List[Row]:
+    """Secciones ordenadas por profundidad, para que parent_section_id exista al insertar cada lote"""
+    parents = {row['section_id']: row.get('parent_section_id') for row in rows}
+    depths: Dict[str, int] = {}
+    for section_id in parents:
+        chain = []
+        while section_id in parents and section_id not in depths:
+            if section_id in chain:
+                raise ValueError(f'Ciclo en parent_section_id de las secciones: {section_id}')
+            chain.append(section_id)
+            section_id = parents[section_id]
+        # Raíz, padre ausente de la instantánea o profundidad ya conocida
+        depth = depths.get(section_id, -1)
+        for chain_id in reversed(chain):
+            depth += 1
+            depths[chain_id] = depth
+    return sorted(rows, key=lambda row: depths[row['section_id']])
+
+
+def _restore_rows(path: str, table: str, manifest: Dict[str, Any]) -> Iterator[List[Row]]:
+    embedding = manifest['embedding']
+    if table == 'sections':
+        rows = [row for batch in iter_batches(path, table) for row in batch.to_pylist()]
+        if rows:
+            yield _parents_first(rows)
+        return
+    for batch in iter_batches(path, table):
+        rows = batch.to_pylist()
+        if table == 'embeddings' and embedding['source_table'] == 'chunk_embeddings':
+            rows = [
+                {'chunk_id': row['chunk_id'], 'model_version': embedding['model_version'],
+                 'embedding': row['embedding'], 'created_at': row['created_at']}
+                for row in rows
+            ]
+        yield rows
+
+
+def import_snapshot(
+    supabase,
+    path: str,
+    writer=None,
+    upsert: bool = True,
+    verify: bool = True,
+    report: Callable[[str], None] = print
+) -> Dict[str, Any]:
+    """
+    Restaurar una instantánea con escrituras por lotes, sin calcular ningún
+    embedding. `writer` es un BulkWriter (por defecto, sobre `supabase`; con
+    `upsert` restaurar dos veces no duplica) o un CopyBulkWriter (COPY
+    directo a Postgres, solo inserta: tablas vacías y upsert=False). Las
+    tablas se cargan de padres a hijas; después se recalcula el grafo de
+    referencias de cada documento desde sus chunks (article_references no va
+    en la instantánea) y se invalidan las cachés de consultas. Devuelve
+    filas escritas por tabla, filas fallidas y segundos.
+    """
+    manifest = verify_snapshot(path) if verify else read_manifest(path)
+    writer = writer or BulkWriter(supabase)
+    embedding = manifest['embedding']
+    if embedding['source_table'] == 'chunk_embeddings' and _embedding_model(supabase, embedding['model_version']) is None:
+        model = embedding.get('model')
+        if model is None:
+            raise ValueError(f"El manifiesto no describe el modelo {embedding['model_version']}")
+        # La versión se restaura sin activar: se activa con scripts/reembed.py --activate-version
+        supabase.table('embedding_models').insert({
+            'model_version': model['model_version'],
+            'provider': model['provider'],
+            'model': model['model'],
+            'dimension': model['dimension'],
+            'status': 'building'
+        }).execute()
+
+    stats: Dict[str, Any] = {'rows': {}, 'failed': 0, 'seconds': 0.0}
+    start = time.perf_counter()
+    failed_before = len(writer.failed)
+    for table in IMPORT_ORDER:
+        table_start = time.perf_counter()
+        target = embedding['source_table'] if table == 'embeddings' else table
+        written = 0
+        for rows in _restore_rows(path, table, manifest):
+            written += writer.write_rows(target, rows, upsert=upsert)
+        stats['rows'][target] = written
+        elapsed = time.perf_counter() - table_start
+        report(f"   📥 {target}: {written}/{manifest['tables'][table]['rows']} filas en {elapsed:.1f} s "
+               f"({written / elapsed if elapsed else 0:.0f} filas/s)")
+
+    table_start = time.perf_counter()
+    references = 0
+    for batch in iter_batches(path, 'documents'):
+        for document_id in batch.column('document_id').to_pylist():
+            references += len(update_document_references(supabase, document_id))
+    stats['rows']['article_references'] = references
+    report(f"   🔗 article_references: {references} filas en {time.perf_counter() - table_start:.1f} s")
+
+    stats['failed'] = len(writer.failed) - failed_before
+    stats['seconds'] = time.perf_counter() - start
+    bump_corpus_generation()
+    return stats
+
+
+class SnapshotVectorIndex(VectorIndex):
+    """
+    VectorIndex de solo lectura sobre embeddings.arrow de una instantánea.
+
+    Cada record batch se mapea en memoria y sus valores se usan como bloque
+    de la búsqueda sin copiarlos. Los vectores se guardan tal como están en
+    la base (sin normalizar), así que la similitud coseno se obtiene
+    escalando cada bloque por las inversas de las normas de sus filas,
+    calculadas al abrir.
+    """
+
+    def __init__(self, path: str, block_rows: int = DEFAULT_BLOCK_ROWS):
+        manifest = read_manifest(path)
+        self.path = path
+        self.block_rows = block_rows
+        self.dimension = manifest['embedding']['dimension']
+        self._lock = threading.Lock()
+        self._batches: List[Tuple[np.ndarray, np.ndarray]] = []
+        self.ids: List[str] = []
+        for batch in iter_batches(path, 'embeddings'):
+            if not batch.num_rows:
+                continue
+            values = batch.column('embedding').flatten().to_numpy(zero_copy_only=True)
+            matrix = values.reshape(batch.num_rows, self.dimension)
+            norms = np.linalg.norm(matrix, axis=1)
+            norms[norms == 0] = 1.0
+            self._batches.append((matrix, (1.0 / norms).astype(np.float32)))
+            self.ids.extend(batch.column('chunk_id').to_pylist())
+        self._count = len(self.ids)
+
+    def _blocks(self) -> Iterator[Tuple[int, np.ndarray, Optional[np.ndarray]]]:
+        start = 0
+        for matrix, inv_norms in self._batches:
+            for offset in range(0, len(matrix), self.block_rows):
+                yield start + offset, matrix[offset:offset + self.block_rows], inv_norms[offset:offset + self.block_rows]
+            start += len(matrix)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Copia en memoria de las filas normalizadas L2 (para construir HNSW o cuantizar)"""
+        if not self._batches:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return normalize_rows(np.concatenate([matrix for matrix, _ in self._batches]))
+
+    def append(self, chunk_ids, vectors) -> int:
+        raise ValueError('El índice de una instantánea es de solo lectura; exporta otra instantánea')
+
+
+def open_vector_index(path: str, block_rows: int = DEFAULT_BLOCK_ROWS) -> SnapshotVectorIndex:
+    return SnapshotVectorIndex(path, block_rows=block_rows)
+
+
+def build_bm25_index(path: str, k1: float = DEFAULT_K1, b: float = DEFAULT_B) -> BM25Index:
+    """Construir el índice BM25 leyendo chunks.arrow mapeado en memoria, sin consultar la base"""
+    read_manifest(path)
+    index = BM25Index(k1=k1, b=b)
+    for batch in iter_batches(path, 'chunks'):
+        index.add(batch.select(list(ROW_COLUMNS)).to_pylist())
+    index.compact()
+    return index
@@ -39,6 +39,8 @@ export const sections = pgTable("sections", {
 export const chunks = pgTable("chunks", {
 	chunkId: uuid("chunk_id").primaryKey().notNull(),
 	sectionId: uuid("section_id"),
+	// Migración 20240625000000_add_article_lookup.sql (se rellena desde la sección si falta)
+	documentId: uuid("document_id"),
 	chunkText: text("chunk_text").notNull(),
 	charCount: integer("char_count").notNull(),
 	startPage: integer("start_page"),
@@ -60,6 +62,12 @@ export const chunks = pgTable("chunks", {
 	index("idx_chunks_document_code").using("btree", table.legalDocumentCode.asc().nullsLast().op("text_ops")),
 	index("idx_chunks_document_name").using("btree", table.legalDocumentName.asc().nullsLast().op("text_ops")),
 	index("idx_chunks_hierarchy").using("btree", table.hierarchyId.asc().nullsLast().op("uuid_ops")),
+	index("idx_chunks_document_article").using("btree", table.documentId.asc().nullsLast().op("uuid_ops"), table.articleNumber.asc().nullsLast().op("text_ops"), table.chunkOrder.asc().nullsLast().op("int4_ops")),
+	foreignKey({
+			columns: [table.documentId],
+			foreignColumns: [documents.documentId],
+			name: "chunks_document_id_fkey"
+		}).onDelete("cascade"),
 	foreignKey({
 			columns: [table.sectionId],
 			foreignColumns: [sections.sectionId],
@@ -186,6 +194,7 @@ export const appSettings = pgTable('app_settings', {
 // Relaciones
 export const documentsRelations = relations(documents, ({ many }) => ({
   sections: many(sections),
+  chunks: many(chunks),
   legalHierarchies: many(legalHierarchy),
 }));
 
@@ -207,6 +216,10 @@ export const sectionsRelations = relations(sections, ({ one, many }) => ({
 
 export const chunksRelations = relations(chunks, ({ one, many }) => ({
   embeddings: many(embeddings),
+  document: one(documents, {
+    fields: [chunks.documentId],
+    references: [documents.documentId],
+  }),
   section: one(sections, {
     fields: [chunks.sectionId],
     references: [sections.sectionId],
@@ -0,0 +1,104 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence
+
+from lib.rate_limiter import TokenBucketRateLimiter
+
+EmbedBatchFn = Callable[[List[str]], List[List[float]]]
+
+# Reintentos por rate limit y segundos de backoff acumulados en el proceso
+backoff_stats = {'retries': 0, 'seconds': 0.0}
+_backoff_lock = threading.Lock()
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimación barata de tokens (~4 caracteres por token)"""
+    return max(1, len(text) // 4)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Detectar errores 429 / cuota agotada del proveedor de embeddings"""
+    error_str = str(error).lower()
+    return '429' in error_str or 'quota' in error_str or 'rate limit' in error_str or 'resource_exhausted' in error_str
+
+
+def backoff_delay(attempt: int, base_delay: float = 1.0, max_delay: float = 60.0) -> float:
+    """Backoff exponencial con jitter completo: uniforme en [0, min(max, base * 2^attempt)]"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def call_with_backoff(
+    fn: Callable,
+    *args,
+    max_retries: int = 5,
+    base_delay: float = 1.0,
+    max_delay: float = 60.0,
+    **kwargs
+):
+    """
+    Ejecutar `fn` reintentando solo ante errores de rate limit.
+    Cualquier otro error se propaga de inmediato.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if not is_rate_limit_error(e) or attempt == max_retries:
+                raise
+            wait_time = backoff_delay(attempt, base_delay, max_delay)
+            with _backoff_lock:
+                backoff_stats['retries'] += 1
+                backoff_stats['seconds'] += wait_time
+            print(f"    ⏳ Rate limit alcanzado. Esperando {wait_time:.1f}s... (intento {attempt + 1}/{max_retries})")
+            time.sleep(wait_time)
+
+
+def embed_in_batches(
+    texts: Sequence[str],
+    embed_batch: EmbedBatchFn,
+    batch_size: int = 100,
+    concurrency: int = 4,
+    limiter: Optional[TokenBucketRateLimiter] = None,
+    max_retries: int = 5,
+    base_delay: float = 1.0,
+    max_delay: float = 60.0
+) -> List[List[float]]:
+    """
+    Generar embeddings para `texts` en lotes de `batch_size`, con hasta
+    `concurrency` peticiones simultáneas pasando por el limitador compartido.
+    Devuelve los vectores en el mismo orden que los textos de entrada.
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+
+    def run_batch(batch: List[str]) -> List[List[float]]:
+        tokens = sum(estimate_tokens(t) for t in batch)
+
+        def attempt():
+            # Cada reintento vuelve a pasar por el limitador
+            if limiter:
+                limiter.acquire(tokens)
+            return embed_batch(batch)
+
+        vectors = call_with_backoff(
+            attempt,
+            max_retries=max_retries,
+            base_delay=base_delay,
+            max_delay=max_delay
+        )
+        if len(vectors) != len(batch):
+            raise ValueError(f'Se esperaban {len(batch)} embeddings y se recibieron {len(vectors)}')
+        return vectors
+
+    if concurrency <= 1 or len(batches) == 1:
+        results = [run_batch(batch) for batch in batches]
+    else:
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(batches))) as executor:
+            results = list(executor.map(run_batch, batches))
+
+    return [vector for batch_vectors in results for vector in batch_vectors]
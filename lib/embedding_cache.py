@@ -0,0 +1,257 @@
+import contextlib
+import hashlib
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import unicodedata
+from typing import Callable, Dict, List, Optional, Sequence
+
+EMBEDDING_DIMENSION = 768
+
+# Registros que se añaden al archivo de vectores cada vez que hay que crecerlo
+_GROW_RECORDS = 1024
+# Segundos que un proceso espera el lock de escritura de otro sobre el índice
+_BUSY_TIMEOUT = 60
+
+
+def normalize_text(text: str) -> str:
+    """Normalización usada para la clave: Unicode NFC y espacios colapsados"""
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+def cache_key(model: str, text: str) -> str:
+    """Clave direccionada por contenido: sha256(modelo, texto normalizado)"""
+    digest = hashlib.sha256()
+    digest.update(model.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(normalize_text(text).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Caché persistente de embeddings direccionada por contenido.
+
+    El índice (clave -> slot, último uso) vive en SQLite y los vectores en un
+    archivo de registros float32 de tamaño fijo mapeado en memoria. Cuando se
+    supera `max_entries` se desaloja la entrada usada hace más tiempo (LRU) y
+    su slot se reutiliza, así que el archivo nunca pasa de
+    `max_entries * dimension * 4` bytes.
+
+    Varios procesos pueden compartir el directorio (workers de --queue,
+    reembed.py junto al loader). Los slots se asignan dentro de una
+    transacción BEGIN IMMEDIATE de SQLite, y los vectores se leen y escriben
+    mientras se tiene ese lock, así nadie reutiliza un slot que otro proceso
+    está leyendo. El archivo de vectores solo crece.
+    """
+
+    def __init__(self, path: str, dimension: int = EMBEDDING_DIMENSION, max_entries: int = 100000):
+        if max_entries <= 0:
+            raise ValueError('max_entries debe ser mayor que 0')
+
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.dimension = dimension
+        self.max_entries = max_entries
+        self._record = struct.Struct(f'<{dimension}f')
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # Sin transacciones implícitas: cada operación abre la suya con _transaction()
+        self._db = sqlite3.connect(os.path.join(path, 'index.sqlite3'), timeout=_BUSY_TIMEOUT,
+                                   check_same_thread=False, isolation_level=None)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS entries (
+              key TEXT PRIMARY KEY NOT NULL,
+              slot INTEGER NOT NULL UNIQUE,
+              last_used INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries(last_used);
+        """)
+        with self._transaction():
+            self._db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('dimension', ?)", [str(dimension)])
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'dimension'").fetchone()
+        if int(row[0]) != dimension:
+            raise ValueError(f'La caché en {path} tiene dimensión {row[0]}, no {dimension}')
+
+        self._file = open(os.path.join(path, 'vectors.f32'), 'a+b')
+        self._mmap: Optional[mmap.mmap] = None
+        self._capacity = 0
+        self._remap()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """BEGIN IMMEDIATE: un solo proceso a la vez asigna slots o toca el archivo de vectores"""
+        self._db.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self._db.execute('ROLLBACK')
+            raise
+        self._db.execute('COMMIT')
+
+    def _remap(self):
+        """Mapear el archivo entero; otro proceso puede haberlo hecho crecer"""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._capacity = os.path.getsize(self._file.name) // self._record.size
+        if self._capacity:
+            self._mmap = mmap.mmap(self._file.fileno(), self._capacity * self._record.size)
+
+    def _read(self, slot: int) -> List[float]:
+        if slot >= self._capacity:
+            self._remap()
+        return list(self._record.unpack_from(self._mmap, slot * self._record.size))
+
+    def _write(self, slot: int, vector: Sequence[float]):
+        if slot >= self._capacity:
+            self._remap()
+        if slot >= self._capacity:
+            # Solo crecer (con el lock de _transaction tomado): nunca truncar por debajo del mapeo de otro proceso
+            records = max(slot + 1, min(self._capacity + _GROW_RECORDS, self.max_entries))
+            self._file.truncate(records * self._record.size)
+            self._remap()
+        self._record.pack_into(self._mmap, slot * self._record.size, *vector)
+
+    def _clock(self) -> int:
+        """Último last_used de la base (compartido entre procesos), dentro de la transacción"""
+        return self._db.execute('SELECT COALESCE(MAX(last_used), 0) FROM entries').fetchone()[0]
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Buscar varios textos; None en las posiciones que no están en caché"""
+        keys = [cache_key(model, text) for text in texts]
+        results: List[Optional[List[float]]] = [None] * len(keys)
+
+        with self._lock, self._transaction():
+            found: Dict[str, int] = {}
+            unique = list(dict.fromkeys(keys))
+            # Consultar en bloques para no pasar el límite de parámetros de SQLite
+            for start in range(0, len(unique), 500):
+                block = unique[start:start + 500]
+                query = f'SELECT key, slot FROM entries WHERE key IN ({",".join("?" for _ in block)})'
+                found.update(self._db.execute(query, block).fetchall())
+
+            clock = self._clock()
+            self._db.executemany(
+                'UPDATE entries SET last_used = ? WHERE key = ?',
+                [(clock + i, key) for i, key in enumerate(found, start=1)]
+            )
+
+            for i, key in enumerate(keys):
+                if key in found:
+                    results[i] = self._read(found[key])
+                    self.hits += 1
+                else:
+                    self.misses += 1
+        return results
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        return self.get_many(model, [text])[0]
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        """Guardar vectores, desalojando por LRU si se supera max_entries"""
+        for vector in vectors:
+            if len(vector) != self.dimension:
+                raise ValueError(f'Se esperaba un vector de dimensión {self.dimension}, no {len(vector)}')
+
+        with self._lock, self._transaction():
+            clock = self._clock()
+            for text, vector in zip(texts, vectors):
+                clock += 1
+                key = cache_key(model, text)
+                row = self._db.execute('SELECT slot FROM entries WHERE key = ?', [key]).fetchone()
+                if row is not None:
+                    slot = row[0]
+                    self._db.execute('UPDATE entries SET last_used = ? WHERE key = ?', [clock, key])
+                else:
+                    slot = self._allocate_slot()
+                    self._db.execute(
+                        'INSERT INTO entries (key, slot, last_used) VALUES (?, ?, ?)',
+                        [key, slot, clock]
+                    )
+                self._write(slot, vector)
+            if self._mmap is not None:
+                self._mmap.flush()
+
+    def put(self, model: str, text: str, vector: Sequence[float]):
+        self.put_many(model, [text], [vector])
+
+    def _allocate_slot(self) -> int:
+        """Slot libre según la base (no según este proceso), dentro de la transacción de put_many"""
+        next_slot = self._db.execute('SELECT COALESCE(MAX(slot) + 1, 0) FROM entries').fetchone()[0]
+        if next_slot < self.max_entries:
+            return next_slot
+
+        key, slot = self._db.execute('SELECT key, slot FROM entries ORDER BY last_used LIMIT 1').fetchone()
+        self._db.execute('DELETE FROM entries WHERE key = ?', [key])
+        self.evictions += 1
+        return slot
+
+    def get_or_compute(
+        self,
+        model: str,
+        texts: Sequence[str],
+        compute: Callable[[List[str]], List[List[float]]]
+    ) -> List[List[float]]:
+        """
+        Devolver los embeddings de `texts` leyendo primero de la caché.
+        Solo los textos ausentes (sin duplicados) se pasan a `compute`.
+        """
+        results = self.get_many(model, texts)
+
+        missing: Dict[str, str] = {}
+        for text, vector in zip(texts, results):
+            if vector is None:
+                missing.setdefault(cache_key(model, text), text)
+
+        if missing:
+            missing_texts = list(missing.values())
+            vectors = compute(missing_texts)
+            self.put_many(model, missing_texts, vectors)
+            computed = dict(zip(missing.keys(), vectors))
+            results = [
+                vector if vector is not None else computed[cache_key(model, text)]
+                for text, vector in zip(texts, results)
+            ]
+        return results
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def close(self):
+        with self._lock:
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+            self._file.close()
+            self._db.close()
+
+
+def open_default_cache(dimension: int = EMBEDDING_DIMENSION) -> Optional[EmbeddingCache]:
+    """
+    Caché configurada por entorno: EMBEDDING_CACHE_DIR (vacío desactiva la caché)
+    y EMBEDDING_CACHE_MAX_ENTRIES.
+    """
+    path = os.environ.get('EMBEDDING_CACHE_DIR', '.cache/embeddings')
+    if not path:
+        return None
+    max_entries = int(os.environ.get('EMBEDDING_CACHE_MAX_ENTRIES', '100000'))
+    return EmbeddingCache(path, dimension=dimension, max_entries=max_entries)
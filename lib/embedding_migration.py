@@ -0,0 +1,295 @@
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from lib.embedding_cache import EmbeddingCache
+from lib.embedding_providers import EmbeddingProvider, get_provider
+from lib.query_cache import bump_corpus_generation
+from lib.rate_limiter import TokenBucketRateLimiter
+
+# Versión de los vectores de la tabla embeddings (la carga inicial, lib/gemini.py)
+LEGACY_MODEL_VERSION = 'models/embedding-001@768'
+
+MODEL_STATUSES = ('building', 'active', 'retired')
+
+DEFAULT_PAGE_SIZE = 500
+DEFAULT_MAX_PASSES = 3
+
+# Segundos que ActiveModelSearch confía en la versión activa antes de releerla
+DEFAULT_ACTIVE_TTL = 30.0
+
+Row = Dict[str, Any]
+
+
+def model_version(provider: EmbeddingProvider) -> str:
+    """Clave de versión de un proveedor: '<modelo>@<dimensión>'"""
+    return f'{provider.model}@{provider.dimension}'
+
+
+def get_model(supabase, version: str) -> Optional[Row]:
+    rows = supabase.table('embedding_models').select('*').eq('model_version', version).execute().data or []
+    return rows[0] if rows else None
+
+
+def list_models(supabase) -> List[Row]:
+    return supabase.table('embedding_models').select('*').order('created_at').execute().data or []
+
+
+def active_model(supabase) -> Optional[Row]:
+    rows = supabase.table('embedding_models').select('*').eq('status', 'active').execute().data or []
+    return rows[0] if rows else None
+
+
+def loading_models(supabase) -> List[Row]:
+    """
+    Versiones de chunk_embeddings que reciben los chunks nuevos al cargar
+    documentos: la activa, si no es la inicial, y las que se están construyendo
+    """
+    rows = supabase.table('embedding_models').select('*').in_('status', ['active', 'building']).execute().data or []
+    return [row for row in rows if row['source_table'] == 'chunk_embeddings']
+
+
+def register_model(supabase, provider: EmbeddingProvider) -> Row:
+    """Fila de embedding_models del proveedor; si no existe se crea en estado 'building'"""
+    version = model_version(provider)
+    model = get_model(supabase, version)
+    if model is None:
+        supabase.table('embedding_models').insert({
+            'model_version': version,
+            'provider': provider.name,
+            'model': provider.model,
+            'dimension': provider.dimension,
+            'status': 'building'
+        }).execute()
+        model = get_model(supabase, version)
+    return model
+
+
+def missing_chunks(supabase, version: str) -> int:
+    """Chunks del corpus sin vector en la versión (RPC embedding_model_missing)"""
+    return int(supabase.rpc('embedding_model_missing', {'p_model_version': version}).execute().data or 0)
+
+
+def activate(supabase, version: str, force: bool = False) -> Row:
+    """
+    Hacer activa una versión (RPC activate_embedding_model, atómica en
+    Postgres). Falla si le falta algún chunk, salvo con `force`. Las cachés
+    de consultas guardan resultados del modelo anterior, así que se invalidan.
+    """
+    rows = supabase.rpc('activate_embedding_model', {'p_model_version': version, 'p_force': force}).execute().data
+    bump_corpus_generation()
+    return rows[0] if isinstance(rows, list) else rows
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class ReembedJob:
+    """
+    Re-embedding del corpus con `provider` en chunk_embeddings, por páginas
+    y reanudable, mientras la recuperación sigue usando la versión activa.
+
+    Recorre chunks por chunk_id con paginación keyset (cada página pide los
+    chunk_id mayores que el último procesado, sin OFFSET), omite los que ya
+    tienen vector en la versión, calcula el resto con get_embeddings_batch
+    (lotes concurrentes, reintentos y el limitador compartido del proveedor
+    o `limiter`) y los escribe con upsert. Tras cada página el último chunk_id queda en
+    embedding_models.checkpoint_chunk_id: si el job se corta, la siguiente
+    ejecución sigue desde ahí. Al terminar una pasada se comprueba la
+    cobertura; los chunks cargados mientras tanto se recogen en otra pasada
+    (hasta `max_passes`).
+    """
+
+    def __init__(
+        self,
+        supabase,
+        provider: EmbeddingProvider,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        cache: Optional[EmbeddingCache] = None,
+        concurrency: Optional[int] = None,
+        limiter: Optional[TokenBucketRateLimiter] = None,
+        max_passes: int = DEFAULT_MAX_PASSES,
+        report: Callable[[str], None] = print
+    ):
+        if page_size <= 0:
+            raise ValueError('page_size debe ser mayor que 0')
+        self.supabase = supabase
+        self.provider = provider
+        self.version = model_version(provider)
+        self.page_size = page_size
+        self.cache = cache
+        self.concurrency = concurrency
+        self.limiter = limiter
+        self.max_passes = max_passes
+        self.report = report
+        self.stats = {'embedded': 0, 'skipped': 0, 'pages': 0, 'passes': 0, 'missing': None, 'seconds': 0.0}
+
+    def _page(self, cursor: Optional[str]) -> List[Row]:
+        query = self.supabase.table('chunks').select('chunk_id, chunk_text').order('chunk_id').limit(self.page_size)
+        if cursor is not None:
+            query = query.gt('chunk_id', cursor)
+        return query.execute().data or []
+
+    def _existing(self, chunk_ids: Sequence[str]) -> set:
+        data = self.supabase.table('chunk_embeddings').select('chunk_id') \
+            .eq('model_version', self.version).in_('chunk_id', list(chunk_ids)).execute().data or []
+        return {row['chunk_id'] for row in data}
+
+    def _checkpoint(self, cursor: Optional[str]):
+        self.supabase.table('embedding_models').update({
+            'checkpoint_chunk_id': cursor,
+            'updated_at': _now()
+        }).eq('model_version', self.version).execute()
+
+    def _embed_page(self, rows: List[Row]):
+        existing = self._existing([row['chunk_id'] for row in rows])
+        pending = [row for row in rows if row['chunk_id'] not in existing]
+        self.stats['skipped'] += len(rows) - len(pending)
+        if not pending:
+            return
+        vectors = self.provider.get_embeddings_batch(
+            [row['chunk_text'] for row in pending],
+            concurrency=self.concurrency,
+            limiter=self.limiter,
+            cache=self.cache
+        )
+        self.supabase.table('chunk_embeddings').upsert([
+            {'chunk_id': row['chunk_id'], 'model_version': self.version, 'embedding': list(vector)}
+            for row, vector in zip(pending, vectors)
+        ]).execute()
+        self.stats['embedded'] += len(pending)
+
+    def _progress(self, total: int, start: float):
+        elapsed = time.perf_counter() - start
+        done = self.stats['embedded']
+        rate = done / elapsed if elapsed > 0 else 0.0
+        remaining = max(0, total - done)
+        eta = f'{remaining / rate:.0f} s' if rate else '?'
+        self.report(f"   📈 {done}/{total} chunks ({done / max(1, total):.0%}), "
+                    f"{rate:.1f} chunks/s, ETA {eta}, omitidos {self.stats['skipped']}")
+
+    def run(self) -> Dict[str, Any]:
+        """Completar la versión; devuelve estadísticas ('missing' = chunks aún sin vector)"""
+        model = register_model(self.supabase, self.provider)
+        if model['source_table'] != 'chunk_embeddings':
+            raise ValueError(f"{self.version} son los vectores de la tabla embeddings (carga de documentos), no se re-embebe")
+
+        total = missing_chunks(self.supabase, self.version)
+        cursor = model.get('checkpoint_chunk_id')
+        self.report(f"🔁 Re-embedding con {self.version} ({model['status']}): faltan {total} chunks"
+                    + (f", se reanuda tras {cursor}" if cursor else ''))
+        start = time.perf_counter()
+        missing = total
+        while missing and self.stats['passes'] < self.max_passes:
+            self.stats['passes'] += 1
+            while True:
+                rows = self._page(cursor)
+                if not rows:
+                    break
+                self._embed_page(rows)
+                cursor = rows[-1]['chunk_id']
+                self._checkpoint(cursor)
+                self.stats['pages'] += 1
+                self._progress(total, start)
+                if len(rows) < self.page_size:
+                    break
+            cursor = None
+            self._checkpoint(None)
+            missing = missing_chunks(self.supabase, self.version)
+            if missing and self.stats['passes'] < self.max_passes:
+                self.report(f"↩️  Quedan {missing} chunks sin vector (cargados durante la pasada): otra pasada")
+                total = self.stats['embedded'] + missing
+
+        self.stats['missing'] = missing
+        self.stats['seconds'] = time.perf_counter() - start
+        return self.stats
+
+
+class VersionedEmbedding(list):
+    """Embedding de una consulta que recuerda la versión del modelo que lo calculó"""
+
+    model_version: Optional[str] = None
+
+
+class ActiveModelSearch:
+    """
+    Etapas embed y vector_search de HybridRetriever que siguen a la versión
+    activa de embedding_models.
+
+    La versión activa se relee cada `ttl` segundos. embed() calcula el
+    embedding de la consulta con el proveedor de esa versión y lo etiqueta
+    con ella; vector_search() busca en la versión de la etiqueta, así una
+    consulta en curso durante un cambio de versión nunca compara vectores
+    de dos modelos. La versión inicial busca con match_documents (tabla
+    embeddings) y las demás con match_chunk_embeddings; `searches` permite
+    sustituir la búsqueda de una versión (p. ej. local_vector_search sobre
+    un índice exportado con export_embeddings(model_version=...)).
+    """
+
+    def __init__(
+        self,
+        supabase,
+        providers: Optional[Dict[str, EmbeddingProvider]] = None,
+        searches: Optional[Dict[str, Callable[[Sequence[float], int], List[Row]]]] = None,
+        ttl: float = DEFAULT_ACTIVE_TTL
+    ):
+        self.supabase = supabase
+        self.providers = dict(providers or {})
+        self.searches = dict(searches or {})
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._models: Dict[str, Row] = {}
+        self._active: Optional[str] = None
+        self._checked = 0.0
+
+    def active_version(self) -> str:
+        with self._lock:
+            if self._active is None or time.monotonic() - self._checked > self.ttl:
+                model = active_model(self.supabase)
+                if model is None:
+                    raise ValueError('No hay ninguna versión de embeddings activa')
+                self._models[model['model_version']] = model
+                self._active = model['model_version']
+                self._checked = time.monotonic()
+            return self._active
+
+    def _model(self, version: str) -> Row:
+        with self._lock:
+            model = self._models.get(version)
+        if model is None:
+            model = get_model(self.supabase, version)
+            if model is None:
+                raise ValueError(f'Versión de embeddings desconocida: {version}')
+            with self._lock:
+                self._models[version] = model
+        return model
+
+    def _provider(self, version: str) -> EmbeddingProvider:
+        provider = self.providers.get(version)
+        if provider is None:
+            provider = get_provider(self._model(version)['provider'])
+            if model_version(provider) != version:
+                raise ValueError(f'El proveedor {provider.name} produce {model_version(provider)}, no {version}')
+            self.providers[version] = provider
+        return provider
+
+    def embed(self, query: str) -> VersionedEmbedding:
+        version = self.active_version()
+        embedding = VersionedEmbedding(self._provider(version).get_embeddings(query))
+        embedding.model_version = version
+        return embedding
+
+    def vector_search(self, embedding: Sequence[float], limit: int) -> List[Row]:
+        version = getattr(embedding, 'model_version', None) or self.active_version()
+        if version in self.searches:
+            return self.searches[version](embedding, limit)
+        model = self._model(version)
+        if len(embedding) != model['dimension']:
+            raise ValueError(f"El embedding tiene {len(embedding)} dimensiones; {version} usa {model['dimension']}")
+        if model['source_table'] == 'embeddings':
+            params = {'query_embedding': list(embedding), 'match_count': limit}
+            return self.supabase.rpc('match_documents', params).execute().data or []
+        params = {'query_embedding': list(embedding), 'p_model_version': version, 'match_count': limit}
+        return self.supabase.rpc('match_chunk_embeddings', params).execute().data or []
@@ -0,0 +1,183 @@
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Sequence
+
+from lib.embedding_batch import embed_in_batches
+from lib.embedding_cache import EmbeddingCache
+from lib.rate_limiter import TokenBucketRateLimiter
+
+# La columna embeddings.embedding es vector(768): la carga de documentos exige esta
+# dimensión. Otras dimensiones solo sirven para re-embeber en chunk_embeddings
+# (lib/embedding_migration.py)
+EMBEDDING_DIMENSION = 768
+
+DEFAULT_PROVIDER = 'gemini'
+DEFAULT_LOCAL_MODEL = 'sentence-transformers/paraphrase-multilingual-mpnet-base-v2'
+
+
+class EmbeddingProvider:
+    """
+    Proveedor de embeddings con inicialización perezosa.
+
+    Crear un proveedor no importa nada pesado: el SDK o el modelo se cargan
+    en `_load()`, una sola vez y en el primer embedding. Las subclases
+    definen `name`, `model` (también es la clave de la caché de embeddings)
+    y `_embed_batch(texts)`, una request multi-texto. get_embeddings_batch
+    reparte los textos en lotes concurrentes con reintentos y limitador, igual
+    que lib/gemini.py.
+    """
+
+    name = ''
+    model = ''
+    dimension = EMBEDDING_DIMENSION
+    batch_size = 100
+    concurrency = 4
+    base_delay = 1.0
+    max_delay = 60.0
+
+    def __init__(self, limiter: Optional[TokenBucketRateLimiter] = None):
+        self.limiter = limiter
+        self._loaded = False
+        self._load_lock = threading.Lock()
+
+    def _load(self):
+        pass
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        if not self._loaded:
+            with self._load_lock:
+                if not self._loaded:
+                    self._load()
+                    self._loaded = True
+        embeddings = self._embed_batch(texts)
+        for embedding in embeddings:
+            if len(embedding) != self.dimension:
+                raise ValueError(f'El embedding generado no tiene la dimensión correcta ({self.dimension})')
+        return embeddings
+
+    def get_embeddings(self, text: str) -> List[float]:
+        return self.embed_batch([text])[0]
+
+    def get_embeddings_batch(
+        self,
+        texts: Sequence[str],
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        limiter: Optional[TokenBucketRateLimiter] = None,
+        cache: Optional[EmbeddingCache] = None
+    ) -> List[List[float]]:
+        """Embeddings de varios textos; con `cache` solo se calculan los que faltan"""
+        def compute(pending: List[str]) -> List[List[float]]:
+            return embed_in_batches(
+                pending,
+                self.embed_batch,
+                batch_size=min(batch_size or self.batch_size, self.batch_size),
+                concurrency=concurrency or self.concurrency,
+                limiter=limiter or self.limiter,
+                base_delay=self.base_delay,
+                max_delay=self.max_delay
+            )
+
+        if cache is not None:
+            return cache.get_or_compute(self.model, texts, compute)
+        return compute(list(texts))
+
+
+class GeminiProvider(EmbeddingProvider):
+    """embedding-001 de Gemini (lib/gemini.py), con su limitador de cuota compartido"""
+
+    name = 'gemini'
+
+    def __init__(self):
+        from lib import gemini
+        super().__init__(limiter=gemini.rate_limiter)
+        self._gemini = gemini
+        self.model = gemini.EMBEDDING_MODEL
+        self.batch_size = gemini.EMBED_BATCH_SIZE
+        self.concurrency = gemini.EMBED_CONCURRENCY
+
+    def _load(self):
+        # Importa google.generativeai y falla aquí (no al importar) si falta GOOGLE_API_KEY
+        self._gemini._client()
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        return self._gemini._embed_batch(texts)
+
+
+class HashingProvider(EmbeddingProvider):
+    """Feature hashing determinista (lib/fake_embeddings.py): sin red, para pruebas y benchmarks"""
+
+    name = 'hashing'
+    base_delay = 0.05
+    max_delay = 1.0
+
+    def __init__(self):
+        from lib.fake_embeddings import EMBEDDING_MODEL, FakeEmbeddingBackend
+        super().__init__()
+        self.dimension = int(os.environ.get('HASHING_EMBEDDING_DIMENSION', EMBEDDING_DIMENSION))
+        self.backend = FakeEmbeddingBackend(dimension=self.dimension)
+        # Misma clave de caché que lib.fake_embeddings.get_embeddings_batch
+        self.model = f'{EMBEDDING_MODEL}-{self.dimension}'
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        return self.backend.embed_batch(texts)
+
+
+class LocalModelProvider(EmbeddingProvider):
+    """
+    Modelo local en CPU con sentence-transformers (dependencia opcional).
+    LOCAL_EMBEDDING_MODEL elige el modelo y LOCAL_EMBEDDING_DIMENSION la
+    dimensión que debe producir (768 por defecto, como la columna de Postgres).
+    """
+
+    name = 'local'
+    concurrency = 1
+
+    def __init__(self):
+        super().__init__()
+        self.model = os.environ.get('LOCAL_EMBEDDING_MODEL', DEFAULT_LOCAL_MODEL)
+        self.dimension = int(os.environ.get('LOCAL_EMBEDDING_DIMENSION', EMBEDDING_DIMENSION))
+        self._encoder = None
+
+    def _load(self):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError('El proveedor local requiere sentence-transformers: pip install sentence-transformers') from e
+        encoder = SentenceTransformer(self.model, device='cpu')
+        dimension = encoder.get_sentence_embedding_dimension()
+        if dimension != self.dimension:
+            raise ValueError(f'{self.model} produce vectores de {dimension} dimensiones, se esperaban {self.dimension}')
+        self._encoder = encoder
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        return self._encoder.encode(texts, normalize_embeddings=True).tolist()
+
+
+PROVIDERS: Dict[str, Callable[[], EmbeddingProvider]] = {
+    'gemini': GeminiProvider,
+    'hashing': HashingProvider,
+    'local': LocalModelProvider,
+}
+
+_instances: Dict[str, EmbeddingProvider] = {}
+_instances_lock = threading.Lock()
+
+
+def register_provider(name: str, factory: Callable[[], EmbeddingProvider]):
+    """Registrar un proveedor nuevo (la fábrica no debe importar nada pesado)"""
+    PROVIDERS[name] = factory
+
+
+def get_provider(name: Optional[str] = None) -> EmbeddingProvider:
+    """Proveedor por nombre o por EMBEDDING_PROVIDER (por defecto gemini); uno por proceso"""
+    name = name or os.environ.get('EMBEDDING_PROVIDER', DEFAULT_PROVIDER)
+    if name not in PROVIDERS:
+        raise ValueError(f"Proveedor de embeddings desconocido: {name} (opciones: {', '.join(PROVIDERS)})")
+    with _instances_lock:
+        if name not in _instances:
+            _instances[name] = PROVIDERS[name]()
+        return _instances[name]
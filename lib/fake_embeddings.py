@@ -0,0 +1,112 @@
+import hashlib
+import math
+import random
+import re
+import threading
+import time
+from typing import List, Optional, Sequence
+
+from lib.embedding_batch import embed_in_batches
+from lib.embedding_cache import EmbeddingCache
+from lib.rate_limiter import TokenBucketRateLimiter
+
+EMBEDDING_DIMENSION = 768
+EMBEDDING_MODEL = 'fake/feature-hashing'
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class FakeEmbeddingBackend:
+    """
+    Backend local de embeddings para pruebas y benchmarks sin red.
+
+    Los vectores son deterministas (feature hashing de las palabras del texto,
+    normalizado L2), así que textos parecidos producen vectores parecidos.
+    `latency` simula el tiempo de ida y vuelta de cada request y `rate_limit_rate`
+    la probabilidad de que una request falle con un 429.
+    """
+
+    def __init__(
+        self,
+        dimension: int = EMBEDDING_DIMENSION,
+        latency: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        seed: int = 0
+    ):
+        self.dimension = dimension
+        self.latency = latency
+        self.rate_limit_rate = rate_limit_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.texts = 0
+        self.rate_limited = 0
+
+    def embed_text(self, text: str) -> List[float]:
+        """Vector determinista para un texto"""
+        vector = [0.0] * self.dimension
+        for word in _WORD_RE.findall(text.lower()):
+            digest = hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest()
+            value = int.from_bytes(digest, 'little')
+            index = value % self.dimension
+            sign = 1.0 if (value >> 32) & 1 else -1.0
+            vector[index] += sign
+
+        norm = math.sqrt(sum(v * v for v in vector))
+        if norm == 0:
+            # Texto sin palabras: vector unitario fijo para no devolver ceros
+            vector[0] = 1.0
+            return vector
+        return [v / norm for v in vector]
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Simular una request multi-texto"""
+        with self._lock:
+            self.requests += 1
+            fail = self.rate_limit_rate > 0 and self._random.random() < self.rate_limit_rate
+            if fail:
+                self.rate_limited += 1
+
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise RuntimeError('429 Resource has been exhausted (e.g. check quota).')
+
+        with self._lock:
+            self.texts += len(texts)
+        return [self.embed_text(text) for text in texts]
+
+
+default_backend = FakeEmbeddingBackend()
+
+
+def get_embeddings(text: str) -> List[float]:
+    """Mismo contrato que lib.gemini.get_embeddings, sin red"""
+    return default_backend.embed_batch([text])[0]
+
+
+def get_embeddings_batch(
+    texts: Sequence[str],
+    batch_size: int = 100,
+    concurrency: int = 4,
+    limiter: Optional[TokenBucketRateLimiter] = None,
+    backend: Optional[FakeEmbeddingBackend] = None,
+    cache: Optional[EmbeddingCache] = None
+) -> List[List[float]]:
+    """Mismo contrato que lib.gemini.get_embeddings_batch, sin red"""
+    backend = backend or default_backend
+
+    def compute(pending: List[str]) -> List[List[float]]:
+        return embed_in_batches(
+            pending,
+            backend.embed_batch,
+            batch_size=batch_size,
+            concurrency=concurrency,
+            limiter=limiter,
+            base_delay=0.05,
+            max_delay=1.0
+        )
+
+    if cache is not None:
+        return cache.get_or_compute(f'{EMBEDDING_MODEL}-{backend.dimension}', texts, compute)
+    return compute(list(texts))
@@ -1,13 +1,42 @@
 import os
-from typing import List
-import google.generativeai as genai
+import threading
+from typing import List, Optional, Sequence
 
-# Configurar la API key
-api_key = os.environ.get('GOOGLE_API_KEY')
-if not api_key:
-    raise ValueError('GOOGLE_API_KEY no está configurada en las variables de entorno')
+from lib.embedding_batch import embed_in_batches
+from lib.embedding_cache import EmbeddingCache
+from lib.rate_limiter import TokenBucketRateLimiter
 
-genai.configure(api_key=api_key)
+# google.generativeai se importa y configura en el primer uso, no al importar
+# este módulo: así los scripts arrancan rápido y funcionan sin red ni API key
+_genai = None
+_genai_lock = threading.Lock()
+
+def _client():
+    """SDK de Gemini configurado con GOOGLE_API_KEY (se inicializa una sola vez)"""
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                api_key = os.environ.get('GOOGLE_API_KEY')
+                if not api_key:
+                    raise ValueError('GOOGLE_API_KEY no está configurada en las variables de entorno')
+                import google.generativeai as genai
+                genai.configure(api_key=api_key)
+                _genai = genai
+    return _genai
+
+EMBEDDING_MODEL = 'models/embedding-001'
+EMBEDDING_DIMENSION = 768
+
+# Límites de cuota (ajustables por entorno) y concurrencia por defecto
+EMBED_REQUESTS_PER_MINUTE = float(os.environ.get('GEMINI_EMBED_RPM', '1500'))
+EMBED_TOKENS_PER_MINUTE = float(os.environ.get('GEMINI_EMBED_TPM', '1000000'))
+EMBED_CONCURRENCY = int(os.environ.get('GEMINI_EMBED_CONCURRENCY', '4'))
+# batchEmbedContents acepta como máximo 100 textos por request
+EMBED_BATCH_SIZE = 100
+
+# Limitador compartido por todos los llamadores del proceso
+rate_limiter = TokenBucketRateLimiter(EMBED_REQUESTS_PER_MINUTE, EMBED_TOKENS_PER_MINUTE)
 
 def get_embeddings(text: str) -> List[float]:
     """
@@ -15,17 +44,60 @@ def get_embeddings(text: str) -> List[float]:
     """
     try:
         # Usar la función embed_content directamente
-        result = genai.embed_content(
-            model='models/embedding-001',
+        result = _client().embed_content(
+            model=EMBEDDING_MODEL,
             content=text
         )
         embedding = result['embedding']
         
-        if not embedding or len(embedding) != 768:
+        if not embedding or len(embedding) != EMBEDDING_DIMENSION:
             raise ValueError('El embedding generado no tiene la dimensión correcta (768)')
         
         return embedding
         
     except Exception as error:
         print(f'Error al obtener embeddings de Gemini: {error}')
-        raise error 
\ No newline at end of file
+        raise error
+
+def _embed_batch(texts: List[str]) -> List[List[float]]:
+    """Una sola request multi-texto a Gemini"""
+    result = _client().embed_content(
+        model=EMBEDDING_MODEL,
+        content=texts
+    )
+    embeddings = result['embedding']
+
+    for embedding in embeddings:
+        if not embedding or len(embedding) != EMBEDDING_DIMENSION:
+            raise ValueError('El embedding generado no tiene la dimensión correcta (768)')
+
+    return embeddings
+
+def get_embeddings_batch(
+    texts: Sequence[str],
+    batch_size: int = EMBED_BATCH_SIZE,
+    concurrency: int = EMBED_CONCURRENCY,
+    limiter: Optional[TokenBucketRateLimiter] = None,
+    cache: Optional[EmbeddingCache] = None
+) -> List[List[float]]:
+    """
+    Generar embeddings para varios textos con requests multi-texto concurrentes,
+    limitadas por el token-bucket compartido y con backoff exponencial ante 429.
+    Si se pasa `cache`, solo se piden a Gemini los textos que no están en ella.
+    """
+    def compute(pending: List[str]) -> List[List[float]]:
+        return embed_in_batches(
+            pending,
+            _embed_batch,
+            batch_size=min(batch_size, EMBED_BATCH_SIZE),
+            concurrency=concurrency,
+            limiter=limiter or rate_limiter
+        )
+
+    try:
+        if cache is not None:
+            return cache.get_or_compute(EMBEDDING_MODEL, texts, compute)
+        return compute(list(texts))
+    except Exception as error:
+        print(f'Error al obtener embeddings de Gemini: {error}')
+        raise error
@@ -0,0 +1,250 @@
+import heapq
+import json
+import math
+import os
+import random
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from lib.vector_index import EMBEDDING_DIMENSION, normalize_rows
+
+DEFAULT_M = 16
+DEFAULT_EF_CONSTRUCTION = 100
+DEFAULT_EF_SEARCH = 50
+
+
+class HNSWIndex:
+    """
+    Índice HNSW (Malkov y Yashunin, 2016) en Python + NumPy para búsqueda
+    aproximada por coseno en la ruta de recuperación local.
+
+    Cada nodo vive en varias capas; la capa 0 contiene a todos y cada capa
+    superior es una muestra geométrica de la anterior. Las búsquedas bajan
+    en greedy desde la capa más alta y exploran la capa 0 con una lista de
+    `ef` candidatos. Parámetros:
+      - M: vecinos por nodo en capas superiores (2·M en la capa 0)
+      - ef_construction: candidatos explorados al insertar (más = mejor grafo, inserción más lenta)
+      - ef_search: candidatos explorados al consultar (más = mejor recall, más latencia)
+
+    Los vectores se guardan normalizados L2 y la distancia es 1 - coseno.
+    Las inserciones son incrementales (`add`); `save`/`load` persisten el grafo.
+    """
+
+    def __init__(
+        self,
+        dimension: int = EMBEDDING_DIMENSION,
+        M: int = DEFAULT_M,
+        ef_construction: int = DEFAULT_EF_CONSTRUCTION,
+        ef_search: int = DEFAULT_EF_SEARCH,
+        seed: int = 0
+    ):
+        self.dimension = dimension
+        self.M = M
+        self.M0 = 2 * M
+        self.ef_construction = max(ef_construction, M)
+        self.ef_search = ef_search
+        self._level_mult = 1 / math.log(M)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self._vectors = np.zeros((0, dimension), dtype=np.float32)
+        self._count = 0
+        self.ids: List[str] = []
+        # _links[nodo][capa] = lista de vecinos
+        self._links: List[List[List[int]]] = []
+        self._entry_point: Optional[int] = None
+        self._max_level = -1
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _distances(self, query: np.ndarray, nodes) -> np.ndarray:
+        return 1.0 - self._vectors[nodes] @ query
+
+    def _search_layer(self, query: np.ndarray, entry_points: List[int], ef: int, level: int) -> List[Tuple[float, int]]:
+        """Búsqueda best-first en una capa; devuelve [(distancia, nodo)] ordenado"""
+        visited = set(entry_points)
+        distances = self._distances(query, entry_points).tolist()
+        candidates = list(zip(distances, entry_points))
+        heapq.heapify(candidates)
+        # Max-heap (distancia negada) con los ef mejores
+        results = [(-d, n) for d, n in candidates]
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+
+        while candidates:
+            distance, node = heapq.heappop(candidates)
+            if distance > -results[0][0] and len(results) >= ef:
+                break
+            new = [n for n in self._links[node][level] if n not in visited]
+            if not new:
+                continue
+            visited.update(new)
+            bound = -results[0][0]
+            for d, n in zip(self._distances(query, new).tolist(), new):
+                if len(results) < ef or d < bound:
+                    heapq.heappush(candidates, (d, n))
+                    heapq.heappush(results, (-d, n))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+                    bound = -results[0][0]
+        return sorted((-d, n) for d, n in results)
+
+    def _select_neighbors(self, candidates: List[Tuple[float, int]], m: int) -> List[int]:
+        """
+        Heurística de selección de vecinos: un candidato entra si está más
+        cerca de la consulta que de cualquier vecino ya elegido. Mantiene
+        conexiones hacia regiones distintas del espacio y mejora el recall.
+        """
+        if len(candidates) <= m:
+            return [n for _, n in candidates]
+        nodes = [n for _, n in candidates]
+        vectors = self._vectors[nodes]
+        pairwise = 1.0 - vectors @ vectors.T
+        selected: List[int] = []
+        for i, (distance, node) in enumerate(candidates):
+            if all(pairwise[i, j] > distance for j in selected):
+                selected.append(i)
+                if len(selected) == m:
+                    break
+        # Completar con los más cercanos descartados para no dejar nodos con pocos enlaces
+        if len(selected) < m:
+            chosen = set(selected)
+            selected.extend(i for i in range(len(candidates)) if i not in chosen)
+        return [nodes[i] for i in selected[:m]]
+
+    def _grow(self, extra: int):
+        needed = self._count + extra
+        if needed > len(self._vectors):
+            capacity = max(needed, 2 * len(self._vectors), 1024)
+            vectors = np.zeros((capacity, self.dimension), dtype=np.float32)
+            vectors[:self._count] = self._vectors[:self._count]
+            self._vectors = vectors
+
+    def add(self, chunk_ids: Sequence[str], vectors):
+        """Insertar vectores de forma incremental"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dimension:
+            raise ValueError(f'Se esperaban vectores de dimensión {self.dimension}, no {vectors.shape}')
+        if len(chunk_ids) != len(vectors):
+            raise ValueError(f'{len(chunk_ids)} ids para {len(vectors)} vectores')
+
+        rows = normalize_rows(vectors)
+        with self._lock:
+            self._grow(len(rows))
+            for chunk_id, vector in zip(chunk_ids, rows):
+                self._insert(str(chunk_id), vector)
+
+    def _insert(self, chunk_id: str, vector: np.ndarray):
+        node = self._count
+        self._vectors[node] = vector
+        self._count += 1
+        self.ids.append(chunk_id)
+        level = int(-math.log(1.0 - self._random.random()) * self._level_mult)
+        self._links.append([[] for _ in range(level + 1)])
+
+        if self._entry_point is None:
+            self._entry_point = node
+            self._max_level = level
+            return
+
+        entry = [self._entry_point]
+        for current in range(self._max_level, level, -1):
+            entry = [self._search_layer(vector, entry, 1, current)[0][1]]
+
+        for current in range(min(level, self._max_level), -1, -1):
+            candidates = self._search_layer(vector, entry, self.ef_construction, current)
+            m_max = self.M0 if current == 0 else self.M
+            neighbors = self._select_neighbors(candidates, self.M)
+            self._links[node][current] = neighbors
+            for neighbor in neighbors:
+                links = self._links[neighbor][current]
+                links.append(node)
+                if len(links) > m_max:
+                    distances = self._distances(self._vectors[neighbor], links).tolist()
+                    self._links[neighbor][current] = self._select_neighbors(sorted(zip(distances, links)), m_max)
+            entry = [n for _, n in candidates]
+
+        if level > self._max_level:
+            self._entry_point = node
+            self._max_level = level
+
+    def search(self, query, k: int = 10, ef: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Top-k aproximado (chunk_id, similitud coseno), misma forma que VectorIndex.search"""
+        if self._entry_point is None:
+            return []
+        query = normalize_rows(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+        ef = max(ef or self.ef_search, k)
+        entry = [self._entry_point]
+        for current in range(self._max_level, 0, -1):
+            entry = [self._search_layer(query, entry, 1, current)[0][1]]
+        nearest = self._search_layer(query, entry, ef, 0)[:k]
+        return [(self.ids[node], 1.0 - distance) for distance, node in nearest]
+
+    def search_batch(self, queries, k: int = 10, ef: Optional[int] = None) -> List[List[Tuple[str, float]]]:
+        return [self.search(query, k, ef) for query in np.atleast_2d(np.asarray(queries, dtype=np.float32))]
+
+    def save(self, path: str):
+        """
+        Guardar en `path` (directorio): meta.json con parámetros e ids y
+        graph.npz con los vectores y las listas de vecinos por capa (CSR).
+        """
+        os.makedirs(path, exist_ok=True)
+        with self._lock:
+            levels = np.array([len(links) - 1 for links in self._links], dtype=np.int32)
+            flat = [links[level] for links in self._links for level in range(len(links))]
+            offsets = np.zeros(len(flat) + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum([len(neighbors) for neighbors in flat])
+            neighbors = np.fromiter((n for links in flat for n in links), dtype=np.int32, count=int(offsets[-1]))
+            np.savez(
+                os.path.join(path, 'graph.npz'),
+                vectors=self._vectors[:self._count],
+                levels=levels,
+                offsets=offsets,
+                neighbors=neighbors
+            )
+            with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump({
+                    'dimension': self.dimension,
+                    'M': self.M,
+                    'ef_construction': self.ef_construction,
+                    'ef_search': self.ef_search,
+                    'entry_point': self._entry_point,
+                    'max_level': self._max_level,
+                    'ids': self.ids
+                }, f)
+
+    @classmethod
+    def load(cls, path: str) -> 'HNSWIndex':
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        index = cls(meta['dimension'], M=meta['M'], ef_construction=meta['ef_construction'], ef_search=meta['ef_search'])
+        data = np.load(os.path.join(path, 'graph.npz'))
+        index._vectors = data['vectors']
+        index._count = len(index._vectors)
+        index.ids = meta['ids']
+        index._entry_point = meta['entry_point']
+        index._max_level = meta['max_level']
+        offsets = data['offsets'].tolist()
+        neighbors = data['neighbors'].tolist()
+        index._links = []
+        position = 0
+        for level in data['levels'].tolist():
+            links = []
+            for _ in range(level + 1):
+                links.append(neighbors[offsets[position]:offsets[position + 1]])
+                position += 1
+            index._links.append(links)
+        return index
+
+
+def build_from_vector_index(vector_index, **params) -> HNSWIndex:
+    """Construir el grafo HNSW sobre los vectores de un VectorIndex (lib/vector_index.py)"""
+    index = HNSWIndex(vector_index.dimension, **params)
+    matrix = vector_index.matrix
+    for start in range(0, len(vector_index), 10000):
+        index.add(vector_index.ids[start:start + 10000], matrix[start:start + 10000])
+    return index
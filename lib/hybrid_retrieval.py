@@ -0,0 +1,272 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from lib.article_lookup import lookup_article_query
+
+# Constante k de RRF (Cormack et al.): amortigua el peso de los primeros puestos
+RRF_K = 60
+
+# Claves de score según el origen de la fila (search_chunks_bm25, search_bm25, match_documents)
+SCORE_KEYS = ('rank_score', 'bm25_score', 'similarity_score', 'score')
+
+Row = Dict[str, Any]
+
+
+def row_score(row: Row) -> float:
+    for key in SCORE_KEYS:
+        if row.get(key) is not None:
+            return float(row[key])
+    return 0.0
+
+
+def _base_row(row: Row) -> Row:
+    """Fila común a todos los métodos: content y chunk_text siempre presentes"""
+    content = row.get('chunk_text') or row.get('content') or ''
+    return dict(row, chunk_text=content, content=content)
+
+
+def reciprocal_rank_fusion(
+    result_lists: Dict[str, List[Row]],
+    weights: Optional[Dict[str, float]] = None,
+    k: int = RRF_K,
+    limit: int = 10
+) -> List[Row]:
+    """
+    Fusionar listas por posición: score = Σ peso / (k + rank). No depende de
+    que los scores de cada método sean comparables. Deduplica por chunk_id y
+    guarda en `ranks` la posición (desde 1) del chunk en cada método.
+    """
+    fused: Dict[str, Row] = {}
+    for method, rows in result_lists.items():
+        weight = (weights or {}).get(method, 1.0)
+        seen = set()
+        for rank, row in enumerate(rows, start=1):
+            chunk_id = str(row['chunk_id'])
+            if chunk_id in seen:
+                continue
+            seen.add(chunk_id)
+            entry = fused.get(chunk_id)
+            if entry is None:
+                entry = fused[chunk_id] = dict(_base_row(row), fused_score=0.0, ranks={})
+            entry['fused_score'] += weight / (k + rank)
+            entry['ranks'][method] = rank
+    return sorted(fused.values(), key=lambda row: row['fused_score'], reverse=True)[:limit]
+
+
+def normalized_score_fusion(
+    result_lists: Dict[str, List[Row]],
+    weights: Optional[Dict[str, float]] = None,
+    limit: int = 10
+) -> List[Row]:
+    """
+    Fusionar por score: cada método se normaliza min-max a [0, 1] y se suma
+    con su peso. Deduplica por chunk_id quedándose con el mejor score de cada método.
+    """
+    fused: Dict[str, Row] = {}
+    for method, rows in result_lists.items():
+        if not rows:
+            continue
+        weight = (weights or {}).get(method, 1.0)
+        best: Dict[str, float] = {}
+        for row in rows:
+            chunk_id = str(row['chunk_id'])
+            best[chunk_id] = max(best.get(chunk_id, float('-inf')), row_score(row))
+        low, high = min(best.values()), max(best.values())
+        for rank, row in enumerate(rows, start=1):
+            chunk_id = str(row['chunk_id'])
+            entry = fused.get(chunk_id)
+            if entry is None:
+                entry = fused[chunk_id] = dict(_base_row(row), fused_score=0.0, ranks={})
+            if method in entry['ranks']:
+                continue
+            normalized = (best[chunk_id] - low) / (high - low) if high > low else 1.0
+            entry['fused_score'] += weight * normalized
+            entry['ranks'][method] = rank
+    return sorted(fused.values(), key=lambda row: row['fused_score'], reverse=True)[:limit]
+
+
+FUSIONS = {
+    'rrf': reciprocal_rank_fusion,
+    'score': normalized_score_fusion,
+}
+
+
+class HybridRetriever:
+    """
+    Recuperación híbrida: embedding de la consulta, búsqueda léxica, búsqueda
+    vectorial y (opcional) búsqueda exacta de artículo, fusionadas en una lista.
+
+    Las etapas son funciones síncronas que se ejecutan en hilos con asyncio:
+    la búsqueda léxica y la exacta corren mientras se calcula el embedding y
+    la búsqueda vectorial, así la latencia total es la de la cadena más lenta
+    (max(léxica, embedding + vectorial)) en lugar de la suma de todas.
+
+      embed(query) -> vector
+      lexical_search(query, limit) -> filas
+      vector_search(embedding, limit) -> filas
+      exact_search(query, limit) -> filas, o None si la consulta no cita un artículo
+      expand(filas, limit) -> filas de los artículos que citan (lib/reference_graph.py)
+
+    Los resultados exactos van primero; el resto se fusiona con `fusion`
+    ('rrf' o 'score') y se deduplica por chunk_id. Con `expand`, detrás de
+    los `limit` resultados van hasta `expand_limit` chunks de los artículos
+    que ellos citan (ranks={'reference': n}), sin otro embedding ni búsqueda.
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[str], Sequence[float]],
+        lexical_search: Callable[[str, int], List[Row]],
+        vector_search: Callable[[Sequence[float], int], List[Row]],
+        exact_search: Optional[Callable[[str, int], Optional[List[Row]]]] = None,
+        fusion: str = 'rrf',
+        weights: Optional[Dict[str, float]] = None,
+        candidates: int = 30,
+        expand: Optional[Callable[[List[Row], int], List[Row]]] = None,
+        expand_limit: int = 5
+    ):
+        if fusion not in FUSIONS:
+            raise ValueError(f"Fusión desconocida: {fusion} (opciones: {', '.join(FUSIONS)})")
+        self.embed = embed
+        self.lexical_search = lexical_search
+        self.vector_search = vector_search
+        self.exact_search = exact_search
+        self.fusion = fusion
+        self.weights = weights
+        self.candidates = candidates
+        self.expand = expand
+        self.expand_limit = expand_limit
+
+    async def _timed(self, name: str, timings: Dict[str, float], errors: Dict[str, str], fn, *args):
+        start = time.perf_counter()
+        try:
+            return await asyncio.to_thread(fn, *args)
+        except Exception as e:
+            # Un método que falla no tumba la búsqueda: se fusiona con lo que haya
+            print(f"⚠️  Error en la etapa {name}: {e}")
+            errors[name] = str(e)
+            return None
+        finally:
+            timings[name] = time.perf_counter() - start
+
+    async def aretrieve(
+        self,
+        query: str,
+        limit: int = 10,
+        concurrent: bool = True,
+        embedding: Optional[Sequence[float]] = None
+    ) -> Dict[str, Any]:
+        """
+        Devuelve {'results', 'lexical', 'vector', 'exact', 'expanded', 'timings', 'errors'}.
+        `timings` tiene los segundos de cada etapa y el total; con
+        concurrent=False las etapas corren una detrás de otra (para comparar).
+        Si ya se tiene el embedding de la consulta (lib/query_cache.py), se
+        pasa en `embedding` y se omite esa etapa.
+        """
+        timings: Dict[str, float] = {}
+        errors: Dict[str, str] = {}
+        start = time.perf_counter()
+
+        async def vector_chain():
+            query_embedding = embedding
+            if query_embedding is None:
+                query_embedding = await self._timed('embedding', timings, errors, self.embed, query)
+            if query_embedding is None:
+                return None
+            return await self._timed('vector', timings, errors, self.vector_search, query_embedding, self.candidates)
+
+        lexical = self._timed('lexical', timings, errors, self.lexical_search, query, self.candidates)
+        exact = (self._timed('exact', timings, errors, self.exact_search, query, limit)
+                 if self.exact_search else asyncio.sleep(0))
+        if concurrent:
+            lexical_rows, vector_rows, exact_rows = await asyncio.gather(lexical, vector_chain(), exact)
+        else:
+            lexical_rows = await lexical
+            vector_rows = await vector_chain()
+            exact_rows = await exact
+
+        fusion_start = time.perf_counter()
+        lexical_rows, vector_rows, exact_rows = lexical_rows or [], vector_rows or [], exact_rows or []
+        pinned = [dict(_base_row(row), fused_score=None, ranks={'exact': rank})
+                  for rank, row in enumerate(exact_rows[:limit], start=1)]
+        pinned_ids = {str(row['chunk_id']) for row in pinned}
+        fused = FUSIONS[self.fusion](
+            {'lexical': lexical_rows, 'vector': vector_rows},
+            weights=self.weights,
+            limit=limit + len(pinned_ids)
+        )
+        results = (pinned + [row for row in fused if str(row['chunk_id']) not in pinned_ids])[:limit]
+        timings['fusion'] = time.perf_counter() - fusion_start
+
+        expanded = []
+        if self.expand and self.expand_limit and results:
+            cited = await self._timed('expansion', timings, errors, self.expand, results, self.expand_limit) or []
+            seen = {str(row['chunk_id']) for row in results}
+            expanded = [dict(_base_row(row), fused_score=None, ranks={'reference': rank})
+                        for rank, row in enumerate(cited, start=1) if str(row['chunk_id']) not in seen]
+        timings['total'] = time.perf_counter() - start
+
+        return {
+            'results': results + expanded,
+            'lexical': lexical_rows,
+            'vector': vector_rows,
+            'exact': exact_rows,
+            'expanded': expanded,
+            'timings': timings,
+            'errors': errors
+        }
+
+    def retrieve(self, query: str, limit: int = 10, concurrent: bool = True) -> Dict[str, Any]:
+        """Versión síncrona de aretrieve (no usar dentro de un event loop)"""
+        return asyncio.run(self.aretrieve(query, limit, concurrent))
+
+
+# Etapas sobre Supabase (las mismas RPC que usa /api/chat)
+
+def supabase_lexical_search(supabase) -> Callable[[str, int], List[Row]]:
+    def search(query: str, limit: int) -> List[Row]:
+        return supabase.rpc('search_chunks_bm25', {'search_query': query, 'result_limit': limit}).execute().data or []
+    return search
+
+
+def supabase_vector_search(supabase) -> Callable[[Sequence[float], int], List[Row]]:
+    def search(embedding: Sequence[float], limit: int) -> List[Row]:
+        return supabase.rpc('match_documents', {
+            'query_embedding': list(embedding),
+            'match_count': limit
+        }).execute().data or []
+    return search
+
+
+def supabase_exact_search(supabase) -> Callable[[str, int], Optional[List[Row]]]:
+    def search(query: str, limit: int) -> Optional[List[Row]]:
+        rows = lookup_article_query(supabase, query, limit=limit)
+        if rows is None:
+            return None
+        return [dict(row, similarity_score=1.0) for row in rows]
+    return search
+
+
+# Etapas locales (lib/bm25.py y lib/vector_index.py), sin Postgres
+
+def local_lexical_search(bm25_index) -> Callable[[str, int], List[Row]]:
+    def search(query: str, limit: int) -> List[Row]:
+        return bm25_index.search(query, limit)
+    return search
+
+
+def local_vector_search(vector_index, supabase=None, rows_by_id: Optional[Dict[str, Row]] = None) -> Callable[[Sequence[float], int], List[Row]]:
+    """
+    Búsqueda en el índice vectorial local. Las filas se completan desde
+    `rows_by_id` si se pasa (sin red) o desde la tabla chunks de `supabase`.
+    """
+    from lib.vector_index import results_to_rows
+
+    def search(embedding: Sequence[float], limit: int) -> List[Row]:
+        results = vector_index.search(embedding, limit)
+        if rows_by_id is not None:
+            return [dict(rows_by_id[chunk_id], chunk_id=chunk_id, similarity_score=score)
+                    for chunk_id, score in results if chunk_id in rows_by_id]
+        return results_to_rows(supabase, results)
+    return search
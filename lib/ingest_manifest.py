@@ -0,0 +1,152 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+from lib.embedding_cache import normalize_text
+
+STATUS_IN_PROGRESS = 'in_progress'
+STATUS_COMPLETE = 'complete'
+
+
+def file_hash(file_path: str) -> str:
+    """sha256 del contenido del archivo, leído por bloques"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_keys(texts: Sequence[str]) -> List[str]:
+    """
+    Claves estables por chunk: hash del texto normalizado más el número de
+    aparición, para que dos chunks con el mismo texto no colisionen. La
+    posición (chunk_order, páginas) no forma parte de la clave: un chunk que
+    solo se desplaza conserva su fila y se actualiza en el sitio.
+    """
+    seen: Dict[str, int] = {}
+    keys = []
+    for text in texts:
+        digest = hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        keys.append(f'{digest}:{occurrence}')
+    return keys
+
+
+class IngestManifest:
+    """
+    Manifiesto local de ingesta respaldado por SQLite.
+
+    Por archivo guarda el hash de contenido, el documento/sección creados y su
+    estado; por chunk guarda su clave de contenido, el chunk_id asignado y si
+    ya quedó escrito en la base de datos. Los chunk_id se registran como
+    pendientes antes de escribirse, así una ejecución interrumpida sabe qué
+    filas pudieron quedar a medias y debe borrar antes de reanudar.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+              path TEXT PRIMARY KEY NOT NULL,
+              content_hash TEXT NOT NULL,
+              document_id TEXT NOT NULL,
+              section_id TEXT NOT NULL,
+              status TEXT NOT NULL,
+              updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+              path TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+              chunk_key TEXT NOT NULL,
+              chunk_id TEXT NOT NULL,
+              committed INTEGER NOT NULL DEFAULT 0,
+              PRIMARY KEY (path, chunk_key)
+            );
+        """)
+        self._db.execute('PRAGMA foreign_keys = ON')
+
+    def get_file(self, path: str) -> Optional[Dict[str, str]]:
+        with self._lock:
+            row = self._db.execute('SELECT * FROM files WHERE path = ?', [path]).fetchone()
+        return dict(row) if row else None
+
+    def start_file(self, path: str, content_hash: str, document_id: str, section_id: str):
+        """Registrar (o reabrir) un archivo como en curso con su nuevo hash"""
+        with self._lock, self._db:
+            self._db.execute(
+                """INSERT INTO files (path, content_hash, document_id, section_id, status, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(path) DO UPDATE SET
+                     content_hash = excluded.content_hash,
+                     document_id = excluded.document_id,
+                     section_id = excluded.section_id,
+                     status = excluded.status,
+                     updated_at = excluded.updated_at""",
+                [path, content_hash, document_id, section_id, STATUS_IN_PROGRESS, time.time()]
+            )
+
+    def complete_file(self, path: str):
+        with self._lock, self._db:
+            self._db.execute(
+                'UPDATE files SET status = ?, updated_at = ? WHERE path = ?',
+                [STATUS_COMPLETE, time.time(), path]
+            )
+
+    def committed_chunks(self, path: str) -> Dict[str, str]:
+        """chunk_key -> chunk_id de los chunks ya escritos"""
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT chunk_key, chunk_id FROM chunks WHERE path = ? AND committed = 1', [path]
+            ).fetchall()
+        return {row['chunk_key']: row['chunk_id'] for row in rows}
+
+    def pending_chunks(self, path: str) -> Dict[str, str]:
+        """chunk_key -> chunk_id registrados pero sin confirmar (posible escritura a medias)"""
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT chunk_key, chunk_id FROM chunks WHERE path = ? AND committed = 0', [path]
+            ).fetchall()
+        return {row['chunk_key']: row['chunk_id'] for row in rows}
+
+    def add_pending(self, path: str, chunks: Dict[str, str]):
+        with self._lock, self._db:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO chunks (path, chunk_key, chunk_id, committed) VALUES (?, ?, ?, 0)',
+                [(path, key, chunk_id) for key, chunk_id in chunks.items()]
+            )
+
+    def mark_committed(self, path: str, keys: Sequence[str]):
+        with self._lock, self._db:
+            self._db.executemany(
+                'UPDATE chunks SET committed = 1 WHERE path = ? AND chunk_key = ?',
+                [(path, key) for key in keys]
+            )
+
+    def remove_chunks(self, path: str, keys: Sequence[str]):
+        with self._lock, self._db:
+            self._db.executemany(
+                'DELETE FROM chunks WHERE path = ? AND chunk_key = ?',
+                [(path, key) for key in keys]
+            )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def open_default_manifest() -> Optional[IngestManifest]:
+    """Manifiesto configurado por INGEST_MANIFEST_PATH (vacío lo desactiva)"""
+    path = os.environ.get('INGEST_MANIFEST_PATH', '.cache/ingest_manifest.sqlite3')
+    if not path:
+        return None
+    return IngestManifest(path)
@@ -0,0 +1,310 @@
+import cProfile
+import glob
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Etapas de la ingesta: las cuatro primeras corren en los procesos del pool
+# ('parse' es el total de extract + clean + chunk + detección de estructura)
+STAGES = ('parse', 'extract', 'clean', 'chunk', 'prepare', 'embed', 'insert')
+
+# Límites (segundos) de los buckets del histograma por documento y etapa
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+PROFILE_MODES = ('cprofile', 'tracemalloc')
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def timed_call(fn: Callable, timings: Dict[str, float], key: str) -> Callable:
+    """`fn` acumulando en timings[key] los segundos de cada llamada"""
+    def wrapped(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            timings[key] = timings.get(key, 0.0) + time.perf_counter() - start
+    return wrapped
+
+
+def timed_iter(iterable: Iterable, timings: Dict[str, float], key: str) -> Iterator:
+    """Iterar acumulando en timings[key] el tiempo que tarda cada elemento en llegar"""
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            timings[key] = timings.get(key, 0.0) + time.perf_counter() - start
+        yield item
+
+
+def _percentile(ordered: Sequence[float], q: float) -> float:
+    """Percentil con interpolación lineal sobre valores ya ordenados (sin numpy: arranque rápido)"""
+    position = (len(ordered) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def _escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape_label(v)}"' for k, v in pairs) + '}'
+
+
+class _Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.values: List[float] = []
+
+    def observe(self, value: float):
+        self.values.append(value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class IngestMetrics:
+    """
+    Métricas de la ingesta: histogramas de segundos por documento y etapa,
+    contadores y eventos.
+
+    Cada observación de etapa se escribe al momento como una línea JSON en
+    `jsonl_path` (si se pasa), así una carga lenta se puede seguir con
+    `tail -f`. Al terminar, write_prometheus() vuelca histogramas y
+    contadores en formato de texto de Prometheus (para el textfile
+    collector de node_exporter) y summary() resume cada etapa.
+    """
+
+    def __init__(self, jsonl_path: Optional[str] = None, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.profiler: Optional['StageProfiler'] = None
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, _Histogram] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._jsonl = None
+        if jsonl_path:
+            directory = os.path.dirname(jsonl_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._jsonl = open(jsonl_path, 'a', encoding='utf-8')
+
+    def event(self, event: str, **fields):
+        if self._jsonl is None:
+            return
+        line = json.dumps(dict(ts=time.time(), event=event, **fields), ensure_ascii=False, default=str)
+        with self._lock:
+            self._jsonl.write(line + '\n')
+            self._jsonl.flush()
+
+    def observe(self, stage: str, seconds: float, **fields):
+        """Registrar los segundos que un documento pasó en una etapa"""
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = _Histogram(self.buckets)
+            histogram.observe(seconds)
+        self.event('stage', stage=stage, seconds=seconds, **fields)
+
+    @contextmanager
+    def stage(self, stage: str, **fields):
+        """Medir (y perfilar, si hay perfilador) el bloque como una etapa"""
+        profile = self.profiler.span() if self.profiler else None
+        start = time.perf_counter()
+        try:
+            if profile is None:
+                yield
+            else:
+                with profile:
+                    yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, **fields)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def counters(self) -> Dict[str, float]:
+        with self._lock:
+            return {name + _format_labels(labels): value for (name, labels), value in sorted(self._counters.items())}
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Por etapa: documentos, segundos totales, p50, p95 y máximo"""
+        with self._lock:
+            report = {}
+            for stage in sorted(self._histograms, key=lambda s: (STAGES.index(s) if s in STAGES else len(STAGES), s)):
+                values = sorted(self._histograms[stage].values)
+                report[stage] = {
+                    'count': len(values),
+                    'total_s': sum(values),
+                    'p50_s': _percentile(values, 50),
+                    'p95_s': _percentile(values, 95),
+                    'max_s': values[-1]
+                }
+            return report
+
+    def write_prometheus(self, path: str, prefix: str = 'ingest'):
+        lines = [
+            f'# HELP {prefix}_stage_seconds Segundos por documento en cada etapa de la ingesta',
+            f'# TYPE {prefix}_stage_seconds histogram',
+        ]
+        with self._lock:
+            for stage, histogram in self._histograms.items():
+                labels = (('stage', stage),)
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f'{prefix}_stage_seconds_bucket{_format_labels(labels, ("le", repr(bound)))} {count}')
+                lines.append(f'{prefix}_stage_seconds_bucket{_format_labels(labels, ("le", "+Inf"))} {len(histogram.values)}')
+                lines.append(f'{prefix}_stage_seconds_sum{_format_labels(labels)} {sum(histogram.values)!r}')
+                lines.append(f'{prefix}_stage_seconds_count{_format_labels(labels)} {len(histogram.values)}')
+            names = sorted({name for name, _ in self._counters})
+            for name in names:
+                lines.append(f'# TYPE {prefix}_{name} counter')
+                for (counter, labels), value in sorted(self._counters.items()):
+                    if counter == name:
+                        lines.append(f'{prefix}_{name}{_format_labels(labels)} {value!r}')
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Escritura atómica: el collector nunca lee un archivo a medias
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, path)
+
+    def close(self):
+        if self._jsonl is not None:
+            self._jsonl.close()
+            self._jsonl = None
+
+
+class StageProfiler:
+    """
+    Perfilado opcional de una carga (--profile en load_documents.py).
+
+      - cprofile: perfil de CPU de las etapas. Antes de Python 3.12 cProfile
+        solo ve el hilo que lo activa, así que cada hilo de etapa usa su
+        propio perfil; los procesos del pool escriben parse-<pid>.prof en
+        `output_dir` y report() los combina todos en ingest.pstats.
+      - tracemalloc: las líneas que más memoria retienen al final de la
+        carga y el pico de memoria de Python.
+
+    El informe de texto queda en `output_dir/profile.txt`.
+    """
+
+    def __init__(self, mode: str, output_dir: str):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Perfilador desconocido: {mode} (opciones: {', '.join(PROFILE_MODES)})")
+        self.mode = mode
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        for old in glob.glob(os.path.join(output_dir, 'parse-*.prof')):
+            os.remove(old)
+        self._global = sys.version_info >= (3, 12)
+        self._local = threading.local()
+        self._profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self.mode == 'tracemalloc':
+            tracemalloc.start()
+        elif self._global:
+            # Desde 3.12 un único perfil activo ve todos los hilos
+            profile = cProfile.Profile()
+            profile.enable()
+            self._profiles.append(profile)
+
+    @contextmanager
+    def _thread_span(self):
+        profile = getattr(self._local, 'profile', None)
+        if profile is None:
+            profile = self._local.profile = cProfile.Profile()
+            with self._lock:
+                self._profiles.append(profile)
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+
+    def span(self):
+        """Contexto que perfila el bloque en el hilo actual (o None si no hace falta)"""
+        if self.mode != 'cprofile' or self._global:
+            return None
+        return self._thread_span()
+
+    def report(self, top: int = 40) -> str:
+        """Detener el perfilado, escribir el informe y devolver su ruta"""
+        out = io.StringIO()
+        if self.mode == 'tracemalloc':
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            out.write(f'Memoria de Python: actual {current / 1e6:.1f} MB, pico {peak / 1e6:.1f} MB\n\n')
+            out.write(f'Top {top} líneas por memoria retenida:\n')
+            for stat in snapshot.statistics('lineno')[:top]:
+                out.write(f'{stat}\n')
+        else:
+            if self._global:
+                self._profiles[0].disable()
+            parts = self._profiles + sorted(glob.glob(os.path.join(self.output_dir, 'parse-*.prof')))
+            if not parts:
+                out.write('Sin datos de perfil\n')
+            else:
+                stats = pstats.Stats(parts[0], stream=out)
+                for part in parts[1:]:
+                    stats.add(part)
+                stats.dump_stats(os.path.join(self.output_dir, 'ingest.pstats'))
+                stats.sort_stats('cumulative').print_stats(top)
+                stats.sort_stats('tottime').print_stats(top)
+        path = os.path.join(self.output_dir, 'profile.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(out.getvalue())
+        return path
+
+
+class WorkerProfiler:
+    """Perfilado dentro de un proceso del pool de parseo (ver StageProfiler)"""
+
+    def __init__(self, mode: Optional[str], output_dir: Optional[str]):
+        self.mode = mode
+        self.output_dir = output_dir
+        self._profile = cProfile.Profile() if mode == 'cprofile' else None
+        if mode == 'tracemalloc':
+            tracemalloc.start()
+
+    def run(self, fn: Callable, *args) -> Tuple[Any, Dict[str, float]]:
+        """Ejecutar fn; devuelve (resultado, métricas extra del proceso)"""
+        extra = {}
+        if self._profile is not None:
+            self._profile.enable()
+            try:
+                result = fn(*args)
+            finally:
+                self._profile.disable()
+                # Acumulado del proceso: se reescribe tras cada documento
+                self._profile.dump_stats(os.path.join(self.output_dir, f'parse-{os.getpid()}.prof'))
+        elif self.mode == 'tracemalloc':
+            tracemalloc.reset_peak()
+            result = fn(*args)
+            extra['parse_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        else:
+            result = fn(*args)
+        return result, extra
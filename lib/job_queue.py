@@ -0,0 +1,165 @@
+import hashlib
+import os
+import socket
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from lib.ingest_manifest import file_hash
+
+JOB_STATUSES = ('pending', 'running', 'done', 'failed', 'superseded')
+
+DEFAULT_LEASE_SECONDS = 60.0
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+def job_id(path: str, content_hash: str) -> str:
+    """Id estable de un trabajo: la misma versión de un archivo se encola una sola vez"""
+    return hashlib.sha256(f'{path}\0{content_hash}'.encode('utf-8')).hexdigest()[:32]
+
+
+def default_worker_id() -> str:
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+
+
+class Lease:
+    """
+    Trabajo tomado por un worker. `document_id` es el documento de este
+    intento; `lost` se activa si el heartbeat descubre que el lease venció y
+    otro worker reclamó el trabajo: a partir de ahí no se debe escribir nada.
+    """
+
+    def __init__(self, row: Dict[str, Any]):
+        self.job_id = row['job_id']
+        self.path = row['path']
+        self.content_hash = row['content_hash']
+        self.attempts = row['attempts']
+        self.token = str(row['lease_token'])
+        self.document_id = str(row['document_id'])
+        self.previous_document_id = row.get('previous_document_id')
+        self.lost = threading.Event()
+
+
+class JobQueue:
+    """
+    Cola de trabajos de ingesta sobre la tabla ingest_jobs
+    (supabase/migrations/20240628000000_add_ingest_jobs.sql).
+
+    Funciona igual contra Supabase que contra LocalSupabaseClient con la
+    base en un archivo (varios procesos de una máquina). Los workers toman
+    trabajos con claim(), mantienen el lease con keep_alive() y terminan con
+    complete() o fail(); las funciones de Postgres garantizan que un trabajo
+    lo tiene un solo worker y que se confirma una sola vez.
+    """
+
+    def __init__(
+        self,
+        supabase,
+        worker_id: Optional[str] = None,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS
+    ):
+        if lease_seconds <= 0:
+            raise ValueError('lease_seconds debe ser mayor que 0')
+        self.supabase = supabase
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    def _rpc(self, name: str, params: Dict[str, Any]):
+        return self.supabase.rpc(name, params).execute().data
+
+    def enqueue(self, files: Sequence[str], batch_size: int = 500) -> Tuple[int, int]:
+        """Encolar archivos (ruta + hash actual); devuelve (añadidos, ya encolados)"""
+        jobs = []
+        for path in files:
+            content_hash = file_hash(path)
+            jobs.append({'job_id': job_id(path, content_hash), 'path': path, 'content_hash': content_hash})
+        added = 0
+        for start in range(0, len(jobs), batch_size):
+            added += int(self._rpc('enqueue_ingest_jobs', {
+                'p_jobs': jobs[start:start + batch_size],
+                'p_max_attempts': self.max_attempts
+            }) or 0)
+        return added, len(jobs) - added
+
+    def claim(self) -> Optional[Lease]:
+        rows = self._rpc('claim_ingest_job', {'p_worker_id': self.worker_id, 'p_lease_seconds': self.lease_seconds})
+        return Lease(rows[0]) if rows else None
+
+    def heartbeat(self, lease: Lease) -> bool:
+        ok = bool(self._rpc('heartbeat_ingest_job', {
+            'p_job_id': lease.job_id,
+            'p_lease_token': lease.token,
+            'p_lease_seconds': self.lease_seconds
+        }))
+        if not ok:
+            lease.lost.set()
+        return ok
+
+    def complete(self, lease: Lease) -> bool:
+        """Confirmar el trabajo; False si el lease se perdió (otro worker lo tiene)"""
+        ok = bool(self._rpc('complete_ingest_job', {'p_job_id': lease.job_id, 'p_lease_token': lease.token}))
+        if not ok:
+            lease.lost.set()
+        return ok
+
+    def fail(self, lease: Lease, error: str) -> bool:
+        """Devolver el trabajo a la cola (o marcarlo failed sin intentos restantes) y borrar sus filas"""
+        return bool(self._rpc('fail_ingest_job', {
+            'p_job_id': lease.job_id,
+            'p_lease_token': lease.token,
+            'p_error': error[:1000]
+        }))
+
+    def discard(self, lease: Lease):
+        """
+        Borrar las filas de un intento que perdió el lease. Los lotes escritos
+        después de que otro worker lo reclamara (y borrara las de entonces)
+        quedarían como duplicados; el document_id es propio de este intento.
+        """
+        self._rpc('delete_ingest_document', {'p_document_id': lease.document_id})
+
+    @contextmanager
+    def keep_alive(self, lease: Lease) -> Iterator[Lease]:
+        """Renovar el lease en un hilo cada tercio de lease_seconds mientras dura el bloque"""
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(self.lease_seconds / 3):
+                try:
+                    if not self.heartbeat(lease):
+                        print(f"⚠️ Lease perdido: {lease.path} (lo reclamó otro worker)")
+                        return
+                except Exception as e:
+                    # Un heartbeat fallido no pierde el lease: aún queda tiempo hasta que venza
+                    print(f"⚠️ Error en el heartbeat de {lease.path}: {e}")
+
+        thread = threading.Thread(target=beat, daemon=True)
+        thread.start()
+        try:
+            yield lease
+        finally:
+            stop.set()
+            thread.join()
+
+    def counts(self) -> Dict[str, int]:
+        """Trabajos por estado"""
+        result = {}
+        for status in JOB_STATUSES:
+            response = self.supabase.table('ingest_jobs').select('job_id', count='exact') \
+                .eq('status', status).limit(1).execute()
+            result[status] = response.count or 0
+        return result
+
+    def drained(self) -> bool:
+        """Sin trabajos pendientes ni en curso"""
+        counts = self.counts()
+        return counts['pending'] == 0 and counts['running'] == 0
+
+    def jobs(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        query = self.supabase.table('ingest_jobs').select('*')
+        if status is not None:
+            query = query.eq('status', status)
+        return query.order('created_at').execute().data or []
@@ -0,0 +1,366 @@
+import re
+import unicodedata
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from lib.pdf_stream import iter_page_chunks
+
+# Nivel jerárquico de cada tipo de división (menor = más externo)
+SECTION_LEVELS = {
+    'libro': 1,
+    'titulo': 2,
+    'capitulo': 3,
+    'seccion': 4,
+}
+TRANSITORIOS_LEVEL = 1
+
+# Texto previo a un artículo (p. ej. el nombre de un capítulo) que se antepone
+# al artículo siguiente; si supera este tamaño se guarda como unidad propia
+MAX_HEADING_CARRY_CHARS = 300
+
+_ORDINAL_WORDS = (
+    r'PRIMER[OA]?|SEGUND[OA]|TERCER[OA]?|CUART[OA]|QUINT[OA]|SEXT[OA]|S[ÉE]PTIM[OA]|'
+    r'OCTAV[OA]|NOVEN[OA]|D[ÉE]CIM[OA](?:\s+(?:PRIMER[OA]|SEGUND[OA]|TERCER[OA]|CUART[OA]|QUINT[OA]|'
+    r'SEXT[OA]|S[ÉE]PTIM[OA]|OCTAV[OA]|NOVEN[OA]))?|[ÚU]NIC[OA]|PRELIMINAR'
+)
+_ROMAN = r'[IVXLC]+'
+_ARTICLE_SUFFIXES = r'bis|ter|qu[áa]ter|quinquies|sexies|septies|octies|nonies|decies'
+
+_SECTION_RE = re.compile(
+    rf'^(LIBRO|T[ÍI]TULO|CAP[ÍI]TULO|SECCI[ÓO]N|Libro|T[íi]tulo|Cap[íi]tulo|Secci[óo]n)\s+'
+    rf'((?i:{_ORDINAL_WORDS})|{_ROMAN}|\d+)\b\.?'
+)
+_TRANSITORIOS_RE = re.compile(r'^(?:ART[ÍI]CULOS\s+)?TRANSITORIOS?\b|^Transitorios?\s*$')
+_ARTICLE_RE = re.compile(
+    rf'^(?:ART[ÍI]CULO|Art[íi]culo)\s+'
+    rf'(?:(\d+)\s*(?:o\b|º|°)?\s*(?:\b((?i:{_ARTICLE_SUFFIXES}))\b)?|((?i:{_ORDINAL_WORDS})))'
+    # "Artículo 27.-", "ARTÍCULO 5o:" o el número solo al final de la línea ("Artículo 7")
+    rf'\s*(?:[\.\-:–]|$)',
+    re.MULTILINE
+)
+_CLAUSE_RE = re.compile(rf'^((?i:{_ORDINAL_WORDS}))\s*\.\s*-?')
+# Encabezados a media línea: PyPDF2 junta varios párrafos en una línea separados
+# por espacios ("...   ARTÍCULO 88.- ...   CAPÍTULO V") y pega al artículo las
+# notas de reforma ("(REFORMADO, G.O. 25 DE MAYO DE 2000) ARTÍCULO 1°.-") y
+# las notas del editor ("...DE 1995. ARTÍCULO 2344.-")
+_INLINE_HEADING_RE = re.compile(
+    r'\s{2,}(?=(?:ART[ÍI]CULOS?|Art[íi]culo|LIBRO|Libro|T[ÍI]TULO|T[íi]tulo|CAP[ÍI]TULO|Cap[íi]tulo|'
+    rf'SECCI[ÓO]N|Secci[óo]n|TRANSITORIOS?|Transitorios?)\b|(?:{_ORDINAL_WORDS})\s*\.)'
+    r'|(?<=\))\s+(?=(?:ART[ÍI]CULO|Art[íi]culo)\s)'
+    r'|(?<=[.}])\s*(?=ART[ÍI]CULO\s)'
+)
+
+_ARTICLE_QUERY_RE = re.compile(
+    rf'\b(?:art[íi]culo|art\.?)\s*(\d+)\s*(?:o\b|º|°)?\s*(?:\b({_ARTICLE_SUFFIXES})\b)?',
+    re.IGNORECASE
+)
+
+
+# Referencias a otros artículos dentro del texto ("conforme al artículo 27",
+# "artículos 21, párrafo noveno y 73, fracción XXI", "arts. 5o. a 9o.")
+_REFERENCE_START_RE = re.compile(r'\b(?:art[íi]culos?|arts?\.)\s*', re.IGNORECASE)
+_REFERENCE_ITEM_RE = re.compile(rf'(\d+)(?:o\b\.?|\s*[º°]\.?)?(?:\s+({_ARTICLE_SUFFIXES})\b)?', re.IGNORECASE)
+_REFERENCE_QUALIFIER_RE = re.compile(
+    r',?\s*(?:(?:primer|segundo|tercer|cuarto|quinto|pen[úu]ltimo|[úu]ltimo)\s+p[áa]rrafo'
+    r'|(?:p[áa]rrafos?|fracci[óo]n|fracciones|apartados?|incisos?|bases?)\s+[\w]+)(?=[\s,;.)])',
+    re.IGNORECASE
+)
+_REFERENCE_JOIN_RE = re.compile(r'\s*(?:,\s*|\s(y|e|o|u|a|al)\s+)(?=\d)', re.IGNORECASE)
+# "de la Ley ...", "del Código ...": artículos de otro ordenamiento ("de esta Ley" es el mismo)
+_EXTERNAL_REFERENCE_RE = re.compile(
+    r',?\s*(?:de|del)\s+(?:(?:la|el|los|las|dicha|dicho)\s+)?'
+    r'(?:Ley|C[óo]digo|Constituci[óo]n|Reglamento|Estatuto|Decreto|Tratado|Convenci[óo]n|Acuerdo)\b',
+    re.IGNORECASE
+)
+# Rangos "artículos 5 a 10" que se expanden; uno más largo se queda en sus extremos
+MAX_REFERENCE_RANGE = 20
+
+
+def strip_accents(text: str) -> str:
+    return ''.join(c for c in unicodedata.normalize('NFD', text) if unicodedata.category(c) != 'Mn')
+
+
+def normalize_article_number(number: str, suffix: Optional[str] = None) -> str:
+    """
+    Forma canónica de un número de artículo: '27', '274 bis', 'UNICO', 'PRIMERA'.
+    Es la que se guarda en chunks.article_number y la que usa la búsqueda exacta.
+    """
+    number = number.strip()
+    if number.isdigit():
+        number = str(int(number))
+    else:
+        number = ' '.join(strip_accents(number).upper().split())
+    if suffix:
+        number += ' ' + strip_accents(suffix).lower()
+    return number
+
+
+def parse_article_query(query: str) -> Optional[str]:
+    """Número de artículo canónico si la consulta cita uno ('artículo 27', 'art. 4o'), o None"""
+    match = _ARTICLE_QUERY_RE.search(query)
+    if not match:
+        return None
+    return normalize_article_number(match.group(1), match.group(2))
+
+
+def extract_article_references(text: str) -> List[str]:
+    """
+    Números canónicos de los artículos que cita el texto, en orden de
+    aparición y con repeticiones (cada mención cuenta). Se omiten los
+    encabezados ("Artículo 27.-" al inicio de línea) y las citas de otros
+    ordenamientos ("artículo 4 de la Ley Agraria").
+    """
+    references = []
+    for start in _REFERENCE_START_RE.finditer(text):
+        if (start.start() == 0 or text[start.start() - 1] == '\n') and _ARTICLE_RE.match(text, start.start()):
+            continue
+        numbers, pos, is_range = [], start.end(), False
+        while True:
+            item = _REFERENCE_ITEM_RE.match(text, pos)
+            if not item:
+                break
+            number = normalize_article_number(item.group(1), item.group(2))
+            if is_range and numbers and numbers[-1].isdigit() and number.isdigit():
+                low, high = int(numbers[-1]), int(number)
+                if 0 < high - low <= MAX_REFERENCE_RANGE:
+                    numbers.extend(str(n) for n in range(low + 1, high))
+            numbers.append(number)
+            pos = item.end()
+            # "21, párrafo noveno y 73": los calificativos no cortan la lista
+            for _ in range(3):
+                qualifier = _REFERENCE_QUALIFIER_RE.match(text, pos)
+                if not qualifier:
+                    break
+                pos = qualifier.end()
+            join = _REFERENCE_JOIN_RE.match(text, pos)
+            if not join:
+                break
+            is_range = (join.group(1) or '').lower() in ('a', 'al')
+            pos = join.end()
+        if numbers and not _EXTERNAL_REFERENCE_RE.match(text, pos):
+            references.extend(numbers)
+    return references
+
+
+def match_section_heading(line: str):
+    """
+    (section_type, número) si la línea abre una división (LIBRO, TÍTULO,
+    CAPÍTULO, SECCIÓN), 'transitorios' para un bloque de transitorios, o None
+    """
+    section_match = _SECTION_RE.match(line)
+    # "Libro Quinto de este Código" al inicio de línea es prosa, no encabezado
+    rest = line[section_match.end():].strip() if section_match else ''
+    if section_match and len(line) < 200 and not (rest and rest[0].islower()):
+        return _section_type(section_match.group(1)), normalize_article_number(section_match.group(2))
+    if _TRANSITORIOS_RE.match(line):
+        return 'transitorios'
+    return None
+
+
+def match_article_heading(line: str) -> Optional[str]:
+    """
+    Número canónico si la línea (sin espacios al inicio) abre un artículo o
+    cláusula ordinal. Formatos de los documentos de documents/:
+
+    >>> match_article_heading('Artículo 27.- La propiedad de las tierras')
+    '27'
+    >>> match_article_heading('ARTÍCULO 138 TER.- (ADICIONADO)')
+    '138 ter'
+    >>> match_article_heading('Artículo  7')  # constitucion-politica-de-la-ciudad-de-mexico.pdf
+    '7'
+    >>> match_article_heading('ARTÍCULO 10 Y SE ADICIONA UN PÁRRAFO') is None
+    True
+    >>> match_article_heading('DÉCIMO NOVENO. - El Congreso')
+    'DECIMO NOVENO'
+    """
+    article_match = _ARTICLE_RE.match(line)
+    if article_match:
+        if article_match.group(1):
+            return normalize_article_number(article_match.group(1), article_match.group(2))
+        return normalize_article_number(article_match.group(3))
+    clause_match = _CLAUSE_RE.match(line)
+    if clause_match:
+        return normalize_article_number(clause_match.group(1))
+    return None
+
+
+def split_headings(line: str) -> List[str]:
+    """
+    Partir una línea antes de cada encabezado que aparece a media línea (ver
+    _INLINE_HEADING_RE); las citas en prosa ("Artículo 2 de esta ley") no la parten.
+
+    >>> split_headings('LEY DE SOCIEDAD  CAPÍTULO I Disposiciones Generales  Artículo 1. Las '
+    ...                'disposiciones   Artículo 2 de esta ley   (REFORMADO, G.O. 2000) ARTÍCULO 3°.- Las leyes')
+    ['LEY DE SOCIEDAD', 'CAPÍTULO I Disposiciones Generales', 'Artículo 1. Las disposiciones   Artículo 2 de esta ley   (REFORMADO, G.O. 2000)', 'ARTÍCULO 3°.- Las leyes']
+    """
+    pieces, start = [], 0
+    for match in _INLINE_HEADING_RE.finditer(line):
+        if match.start() < start:
+            continue
+        rest = line[match.end():]
+        # Un encabezado de división termina donde empieza el párrafo siguiente
+        heading = _PAGE_HEADER_SPLIT_RE.split(rest, maxsplit=1)[0]
+        inner = _INLINE_HEADING_RE.search(heading)
+        if inner:
+            heading = heading[:inner.start()]
+        if match_section_heading(heading) is not None:
+            pieces.extend([line[start:match.start()], heading])
+            start = match.end() + len(heading)
+        elif match_article_heading(rest) is not None:
+            pieces.append(line[start:match.start()])
+            start = match.end()
+    pieces.append(line[start:])
+    return [piece.strip() for piece in pieces if piece.strip()]
+
+
+def _section_type(keyword: str) -> str:
+    return strip_accents(keyword).lower()
+
+
+# Encabezado corrido que algunos PDFs pegan a la primera línea de cada página
+# ("CONSEJERÍA JURÍDICA Y DE SERVICIOS LEGALES  Artículo  52")
+_PAGE_HEADER_SPLIT_RE = re.compile(r'\s{2,}')
+MIN_PAGE_HEADER_CHARS = 20
+
+
+def _split_page_header(line: str, previous: Optional[str]) -> Tuple[str, str]:
+    """
+    (encabezado, resto de la línea): el texto antes del primer doble espacio
+    se quita si ya abría la página anterior y no es un encabezado legal
+
+    >>> _split_page_header('CONSEJERÍA JURÍDICA Y DE SERVICIOS LEGALES  Artículo  52',
+    ...                    'CONSEJERÍA JURÍDICA Y DE SERVICIOS LEGALES')
+    ('CONSEJERÍA JURÍDICA Y DE SERVICIOS LEGALES', 'Artículo  52')
+    """
+    parts = _PAGE_HEADER_SPLIT_RE.split(line, maxsplit=1)
+    header = parts[0]
+    if (header == previous and len(header) >= MIN_PAGE_HEADER_CHARS
+            and match_article_heading(line) is None and match_section_heading(line) is None):
+        return header, parts[1].strip() if len(parts) > 1 else ''
+    return header, line
+
+
+class _Unit:
+    """Texto de un artículo (o de un tramo sin artículo) con las páginas que ocupa"""
+
+    def __init__(self, section_key: Optional[str], article_number: Optional[str]):
+        self.section_key = section_key
+        self.article_number = article_number
+        # [(página, [líneas])]
+        self.segments: List[Tuple[int, List[str]]] = []
+        self.chars = 0
+
+    def add_line(self, page: int, line: str):
+        if not self.segments or self.segments[-1][0] != page:
+            self.segments.append((page, []))
+        self.segments[-1][1].append(line)
+        self.chars += len(line) + 1
+
+    def pages(self) -> List[Tuple[int, str]]:
+        return [(page, '\n'.join(lines)) for page, lines in self.segments]
+
+
+def iter_structure(pages: Iterable[Tuple[int, str]]) -> Iterator[Tuple[str, Any]]:
+    """
+    Recorrer el texto una sola vez, línea a línea, y emitir en orden:
+      ('section', {'key', 'parent_key', 'section_type', 'section_number'})
+      ('unit', _Unit)  — un artículo, cláusula ordinal o tramo sin artículo
+    Las secciones se emiten antes que cualquier unidad que cuelgue de ellas.
+    """
+    # Pila de (nivel, clave) de las divisiones abiertas
+    stack: List[Tuple[int, str]] = []
+    seen_keys: Dict[str, int] = {}
+    current = _Unit(None, None)
+    transitorios = 0
+    page_header = None
+
+    def open_section(level: int, section_type: str, number: str):
+        while stack and stack[-1][0] >= level:
+            stack.pop()
+        parent_key = stack[-1][1] if stack else None
+        base = f"{parent_key + '/' if parent_key else ''}{section_type}:{number}"
+        # Las divisiones repetidas (varios TRANSITORIOS) se distinguen por aparición
+        occurrence = seen_keys.get(base, 0)
+        seen_keys[base] = occurrence + 1
+        key = base if occurrence == 0 else f'{base}#{occurrence + 1}'
+        stack.append((level, key))
+        return {'key': key, 'parent_key': parent_key, 'section_type': section_type, 'section_number': number}
+
+    for page, text in pages:
+        first_line = True
+        for raw_line in text.split('\n'):
+            line = raw_line.strip()
+            if not line:
+                continue
+            if first_line:
+                first_line = False
+                page_header, line = _split_page_header(line, page_header)
+                if not line:
+                    continue
+
+            for line in split_headings(line):
+                section = None
+                heading = match_section_heading(line)
+                if heading == 'transitorios':
+                    transitorios += 1
+                    section = (TRANSITORIOS_LEVEL, 'transitorios', str(transitorios))
+                elif heading:
+                    section = (SECTION_LEVELS[heading[0]], heading[0], heading[1])
+
+                if section:
+                    if current.article_number is not None or current.chars > MAX_HEADING_CARRY_CHARS:
+                        if current.chars:
+                            yield 'unit', current
+                        current = _Unit(None, None)
+                    yield 'section', open_section(*section)
+                    # El encabezado se antepone al primer artículo de la división
+                    current.section_key = stack[-1][1]
+                    current.add_line(page, line)
+                    continue
+
+                article = match_article_heading(line)
+                if article is not None:
+                    section_key = stack[-1][1] if stack else None
+                    if current.article_number is not None:
+                        yield 'unit', current
+                        current = _Unit(section_key, article)
+                    elif current.chars > MAX_HEADING_CARRY_CHARS:
+                        yield 'unit', current
+                        current = _Unit(section_key, article)
+                    else:
+                        # Encabezados pendientes pasan a formar parte del artículo
+                        current.article_number = article
+                        current.section_key = section_key
+
+                current.add_line(page, line)
+
+    if current.chars:
+        yield 'unit', current
+
+
+def iter_structured_chunks(
+    pages: Iterable[Tuple[int, str]],
+    chunk_text: Callable[[str], List[Any]],
+    clean: Optional[Callable[[str], str]] = None
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Chunking jerárquico en una pasada: cada artículo se chunkea por separado,
+    así ningún chunk cruza el límite de un artículo. Emite
+    ('section', fila de sección) y ('chunk', chunk con article_number,
+    section_key, chunk_order dentro del artículo y start_page/end_page).
+    """
+    offset = 0
+    for kind, item in iter_structure(pages):
+        if kind == 'section':
+            yield 'section', item
+            continue
+
+        end = offset
+        for order, chunk in enumerate(iter_page_chunks(item.pages(), chunk_text, clean=clean)):
+            chunk['start_index'] += offset
+            chunk['end_index'] += offset
+            end = chunk['end_index']
+            chunk['article_number'] = item.article_number
+            chunk['section_key'] = item.section_key
+            chunk['chunk_order'] = order
+            yield 'chunk', chunk
+        offset = end + 1
@@ -0,0 +1,167 @@
+import hashlib
+import os
+import re
+import threading
+import zlib
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from lib.legal_structure import strip_accents
+
+DEFAULT_NUM_PERM = 128
+DEFAULT_BANDS = 16
+DEFAULT_THRESHOLD = 0.9
+SHINGLE_WORDS = 5
+
+# Primo de Mersenne 2^61 - 1 para las permutaciones (a·x + b) mod p
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+_WORD_RE = re.compile(r'\w+')
+
+# 'reuse': el duplicado se embebe con el texto de su canónico y tiene su propia
+# fila de embeddings con el mismo vector (match_documents une por chunk_id)
+DEDUP_MODES = ('off', 'reuse')
+
+
+class DuplicateMatch(NamedTuple):
+    """Chunk canónico al que equivale un chunk"""
+    canonical_id: str
+    canonical_text: str
+    similarity: float
+    exact: bool
+    payload: Any
+
+
+def normalize_for_dedup(text: str) -> str:
+    """Minúsculas, sin acentos y sin puntuación: solo las palabras cuentan"""
+    return ' '.join(_WORD_RE.findall(strip_accents(text.lower())))
+
+
+def shingles(normalized: str, size: int = SHINGLE_WORDS) -> List[str]:
+    words = normalized.split()
+    if len(words) <= size:
+        return [normalized]
+    return [' '.join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+class MinHasher:
+    """Firmas MinHash de `num_perm` valores de 32 bits sobre shingles de palabras"""
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        # a, b < 2^32 y hashes de 32 bits: a·x + b no desborda uint64
+        self._a = rng.integers(1, 1 << 32, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 32, num_perm, dtype=np.uint64)
+
+    def signature(self, normalized: str) -> np.ndarray:
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode('utf-8')) for shingle in set(shingles(normalized))),
+            dtype=np.uint64
+        )
+        permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) % _MERSENNE_PRIME
+        return (permuted & _MAX_HASH).min(axis=1).astype(np.uint32)
+
+
+def estimate_jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.mean(a == b))
+
+
+class NearDuplicateIndex:
+    """
+    Detección de duplicados exactos y casi exactos entre chunks.
+
+    Los exactos se detectan por el hash del texto normalizado. Para los casi
+    exactos, cada firma MinHash se parte en `bands` bandas y los chunks que
+    coinciden en alguna banda (LSH) son candidatos; un candidato es duplicado
+    si su Jaccard estimado es >= threshold. El primer chunk visto de cada
+    grupo es el canónico.
+    """
+
+    def __init__(
+        self,
+        threshold: float = DEFAULT_THRESHOLD,
+        num_perm: int = DEFAULT_NUM_PERM,
+        bands: int = DEFAULT_BANDS,
+        seed: int = 1
+    ):
+        if num_perm % bands:
+            raise ValueError(f'num_perm ({num_perm}) debe ser múltiplo de bands ({bands})')
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm, seed)
+        self._lock = threading.Lock()
+        self._exact: Dict[bytes, str] = {}
+        self._buckets: List[Dict[bytes, List[str]]] = [{} for _ in range(bands)]
+        self._entries: Dict[str, Tuple[str, np.ndarray, Any]] = {}
+        self.stats = {'checked': 0, 'exact': 0, 'near': 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def _find(self, digest: bytes, signature: np.ndarray, keys: List[bytes]) -> Optional[DuplicateMatch]:
+        canonical_id = self._exact.get(digest)
+        if canonical_id is not None:
+            text, _, payload = self._entries[canonical_id]
+            return DuplicateMatch(canonical_id, text, 1.0, True, payload)
+
+        best_id, best_similarity = None, self.threshold
+        seen = set()
+        for bucket, key in zip(self._buckets, keys):
+            for candidate in bucket.get(key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                similarity = estimate_jaccard(signature, self._entries[candidate][1])
+                if similarity >= best_similarity:
+                    best_id, best_similarity = candidate, similarity
+        if best_id is None:
+            return None
+        text, _, payload = self._entries[best_id]
+        return DuplicateMatch(best_id, text, best_similarity, False, payload)
+
+    def check(self, chunk_id: str, text: str, payload: Any = None) -> Optional[DuplicateMatch]:
+        """
+        Devolver el canónico si `text` duplica un chunk ya visto; si no,
+        registrar el chunk como canónico (con `payload`) y devolver None.
+        """
+        normalized = normalize_for_dedup(text)
+        digest = hashlib.sha256(normalized.encode('utf-8')).digest()
+        signature = self.hasher.signature(normalized)
+        keys = self._band_keys(signature)
+
+        with self._lock:
+            self.stats['checked'] += 1
+            match = self._find(digest, signature, keys)
+            if match is not None:
+                self.stats['exact' if match.exact else 'near'] += 1
+                return match
+            self._exact[digest] = chunk_id
+            self._entries[chunk_id] = (text, signature, payload)
+            for bucket, key in zip(self._buckets, keys):
+                bucket.setdefault(key, []).append(chunk_id)
+            return None
+
+    def check_many(self, items: Sequence[Tuple[str, str, Any]]) -> List[Optional[DuplicateMatch]]:
+        """check() para una lista de (chunk_id, texto, payload), en orden"""
+        return [self.check(chunk_id, text, payload) for chunk_id, text, payload in items]
+
+
+def open_default_dedup(mode: Optional[str] = None) -> Tuple[str, Optional[NearDuplicateIndex]]:
+    """
+    Modo (DEDUP_MODE: off o reuse; por defecto reuse) e índice de
+    duplicados con el umbral de DEDUP_THRESHOLD (por defecto 0.9).
+    """
+    mode = mode or os.environ.get('DEDUP_MODE', 'reuse')
+    if mode not in DEDUP_MODES:
+        raise ValueError(f"DEDUP_MODE desconocido: {mode} (opciones: {', '.join(DEDUP_MODES)})")
+    if mode == 'off':
+        return mode, None
+    threshold = float(os.environ.get('DEDUP_THRESHOLD', DEFAULT_THRESHOLD))
+    return mode, NearDuplicateIndex(threshold=threshold)
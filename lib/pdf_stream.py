@@ -0,0 +1,126 @@
+from bisect import bisect_right
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from lib.text_normalizer import iter_clean_pages
+
+# Caracteres por ventana que se pasan al chunker de una vez
+DEFAULT_WINDOW_CHARS = 200000
+
+# Separador entre páginas en el texto limpio: un cambio de página casi siempre
+# cae dentro de un párrafo, así que no es un salto de línea
+PAGE_SEPARATOR = ' '
+
+
+def iter_pdf_pages(file_path: str) -> Iterator[Tuple[int, str]]:
+    """
+    Leer un PDF página a página: (número de página desde 1, texto).
+    PyPDF2 solo interpreta el contenido de cada página cuando se le pide.
+    """
+    import PyPDF2
+
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        for number, page in enumerate(pdf_reader.pages, start=1):
+            yield number, page.extract_text() or ''
+
+
+class PageOffsetMap:
+    """Offsets de inicio de cada página en el texto concatenado, para mapear carácter -> página"""
+
+    def __init__(self):
+        self._starts: List[int] = []
+        self._pages: List[int] = []
+        self.length = 0
+
+    def add_page(self, page_number: int, text_length: int) -> str:
+        """
+        Registrar una página y devolver el separador que hay que anteponer a su
+        texto. El separador cuenta como parte de la página nueva; las páginas
+        vacías no añaden nada.
+        """
+        separator = PAGE_SEPARATOR if self.length and text_length else ''
+        self._starts.append(self.length)
+        self._pages.append(page_number)
+        self.length += len(separator) + text_length
+        return separator
+
+    def page_at(self, offset: int) -> int:
+        """Página que contiene el carácter en `offset`"""
+        if not self._starts:
+            return 1
+        index = bisect_right(self._starts, offset) - 1
+        return self._pages[max(index, 0)]
+
+    def page_range(self, start: int, end: int) -> Tuple[int, int]:
+        """(página inicial, página final) del tramo [start, end)"""
+        return self.page_at(start), self.page_at(max(start, end - 1))
+
+
+def iter_page_chunks(
+    pages: Iterable[Tuple[int, str]],
+    chunk_text: Callable[[str], List[Any]],
+    clean: Optional[Callable[[str], str]] = None,
+    window_chars: int = DEFAULT_WINDOW_CHARS
+) -> Iterator[Dict[str, Any]]:
+    """
+    Chunkear un documento paginado en ventanas acotadas.
+
+    Las páginas se limpian por separado (uniendo las palabras cortadas con
+    guion entre una página y la siguiente) y se acumulan hasta `window_chars`;
+    cada ventana se pasa a `chunk_text` (que devuelve objetos con text,
+    start_index, end_index, token_count y sentences, como los de Chonkie).
+    El último chunk de cada ventana puede estar cortado, así que su texto se
+    arrastra al inicio de la siguiente. Los offsets se traducen a posiciones
+    globales y, con el mapa de páginas, a start_page/end_page.
+    """
+    page_map = PageOffsetMap()
+    window: List[str] = []
+    window_len = 0
+    # Offset global del primer carácter de la ventana actual
+    window_start = 0
+
+    def flush(final: bool):
+        nonlocal window, window_len, window_start
+        text = ''.join(window)
+        chunks = [c for c in chunk_text(text) if c.text.strip()] if text.strip() else []
+        if not final and len(chunks) > 1:
+            carry_from = chunks[-1].start_index
+            chunks = chunks[:-1]
+        elif not final:
+            # Un solo chunk: seguir acumulando hasta que haya un corte claro
+            return []
+        else:
+            carry_from = len(text)
+
+        results = []
+        for chunk in chunks:
+            start = window_start + chunk.start_index
+            end = window_start + chunk.end_index
+            start_page, end_page = page_map.page_range(start, end)
+            results.append({
+                'text': chunk.text,
+                'start_index': start,
+                'end_index': end,
+                'token_count': chunk.token_count,
+                'sentences': len(chunk.sentences),
+                'start_page': start_page,
+                'end_page': end_page
+            })
+
+        tail = text[carry_from:]
+        window = [tail] if tail else []
+        window_len = len(tail)
+        window_start += carry_from
+        return results
+
+    if clean is not None:
+        pages = iter_clean_pages(pages, clean)
+    for page_number, page_text in pages:
+        separator = page_map.add_page(page_number, len(page_text))
+        window.append(separator + page_text)
+        window_len += len(separator) + len(page_text)
+
+        if window_len >= window_chars:
+            yield from flush(final=False)
+
+    yield from flush(final=True)
@@ -0,0 +1,205 @@
+import json
+import os
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from lib.vector_index import EMBEDDING_DIMENSION, VectorIndex, normalize_rows
+
+QUANTIZATION_MODES = ('int8', 'binary')
+
+# Candidatos que se re-puntúan en float32 por cada resultado pedido (k)
+DEFAULT_RESCORE_FACTOR = {'int8': 4, 'binary': 20}
+
+# Filas de códigos que se procesan de una vez en la primera pasada
+DEFAULT_BLOCK_ROWS = 16384
+
+if hasattr(np, 'bitwise_count'):
+    _popcount = np.bitwise_count
+else:
+    _POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def _popcount(values):
+        return _POPCOUNT_TABLE[values]
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Cuantización int8 con escala por vector: x ≈ codes * scale"""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def quantize_binary(vectors: np.ndarray) -> np.ndarray:
+    """1 bit por dimensión (signo), empaquetado en bytes"""
+    return np.packbits(vectors > 0, axis=1)
+
+
+class QuantizedIndex:
+    """
+    Índice cuantizado sobre un VectorIndex (lib/vector_index.py).
+
+    En el mismo directorio que vectors.f32 se guardan los códigos:
+      - int8: codes.int8 (n, dimension) + scales.f32 (n,) → 4x menos que float32
+      - binary: codes.bin (n, dimension / 8) → 32x menos que float32
+
+    La búsqueda tiene dos pasadas: primero se puntúa todo el corpus con los
+    códigos (producto int8 o distancia de Hamming, vectorizados por bloques)
+    y luego los `k * rescore_factor` mejores candidatos se re-puntúan con los
+    vectores float32. Esos vectores se leen del archivo mapeado solo para los
+    candidatos, así que en memoria residente quedan únicamente los códigos.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        mode: str = 'int8',
+        dimension: int = EMBEDDING_DIMENSION,
+        rescore_factor: Optional[int] = None,
+        block_rows: int = DEFAULT_BLOCK_ROWS
+    ):
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"Modo de cuantización desconocido: {mode} (opciones: {', '.join(QUANTIZATION_MODES)})")
+        self.mode = mode
+        self.path = path
+        self.rescore_factor = rescore_factor or DEFAULT_RESCORE_FACTOR[mode]
+        self.block_rows = block_rows
+        self.vectors = VectorIndex(path, dimension=dimension)
+        self.dimension = dimension
+        self._lock = threading.Lock()
+        self._code_width = dimension if mode == 'int8' else (dimension + 7) // 8
+        self._codes_path = os.path.join(path, 'codes.int8' if mode == 'int8' else 'codes.bin')
+        self._scales_path = os.path.join(path, 'scales.f32')
+        self._meta_path = os.path.join(path, f'quantized-{mode}.json')
+
+        count = 0
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path) as f:
+                count = json.load(f)['count']
+        self._count = min(count, len(self.vectors))
+        self._truncate()
+        # Códigos de vectores añadidos al VectorIndex después de cuantizar
+        if self._count < len(self.vectors):
+            self._quantize_rows(self._count, len(self.vectors))
+        self._remap()
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def ids(self) -> List[str]:
+        return self.vectors.ids
+
+    def _truncate(self):
+        # Igual que VectorIndex: descartar códigos no confirmados en el meta
+        files = [(self._codes_path, self._code_width)]
+        if self.mode == 'int8':
+            files.append((self._scales_path, 4))
+        for file_path, width in files:
+            if os.path.exists(file_path) and os.path.getsize(file_path) > self._count * width:
+                with open(file_path, 'r+b') as f:
+                    f.truncate(self._count * width)
+
+    def _remap(self):
+        if not self._count:
+            self._codes = np.zeros((0, self._code_width), dtype=np.int8 if self.mode == 'int8' else np.uint8)
+            self._scales = np.zeros(0, dtype=np.float32)
+            return
+        dtype = np.int8 if self.mode == 'int8' else np.uint8
+        self._codes = np.memmap(self._codes_path, dtype=dtype, mode='r', shape=(self._count, self._code_width))
+        if self.mode == 'int8':
+            self._scales = np.memmap(self._scales_path, dtype=np.float32, mode='r', shape=(self._count,))
+
+    def _write_codes(self, rows: np.ndarray):
+        if self.mode == 'int8':
+            codes, scales = quantize_int8(rows)
+            with open(self._scales_path, 'ab') as f:
+                f.write(scales.tobytes())
+        else:
+            codes = quantize_binary(rows)
+        with open(self._codes_path, 'ab') as f:
+            f.write(codes.tobytes())
+        self._count += len(rows)
+        tmp_path = self._meta_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'count': self._count, 'dimension': self.dimension}, f)
+        os.replace(tmp_path, self._meta_path)
+
+    def _quantize_rows(self, start: int, end: int):
+        matrix = self.vectors.matrix
+        for offset in range(start, end, self.block_rows):
+            self._write_codes(np.asarray(matrix[offset:min(end, offset + self.block_rows)]))
+
+    def append(self, chunk_ids: Sequence[str], vectors) -> int:
+        """Añadir vectores (float32 al VectorIndex y sus códigos)"""
+        with self._lock:
+            start = len(self.vectors)
+            self.vectors.append(chunk_ids, vectors)
+            self._quantize_rows(start, len(self.vectors))
+            self._remap()
+        return self._count
+
+    def _first_pass(self, queries: np.ndarray, candidates: int) -> np.ndarray:
+        """Filas candidatas (len(queries), candidates) según los códigos"""
+        if self.mode == 'int8':
+            query_codes = queries
+        else:
+            query_codes = quantize_binary(queries)
+
+        best_scores = np.zeros((len(queries), 0), dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        for start in range(0, self._count, self.block_rows):
+            block = self._codes[start:start + self.block_rows]
+            if self.mode == 'int8':
+                scores = (query_codes @ block.astype(np.float32).T) * self._scales[start:start + len(block)]
+            else:
+                # Menos bits distintos = más parecido
+                xor = np.bitwise_xor(query_codes[:, None, :], block[None, :, :])
+                scores = -_popcount(xor).sum(axis=2, dtype=np.int32).astype(np.float32)
+            if scores.shape[1] > candidates:
+                top = np.argpartition(-scores, candidates - 1, axis=1)[:, :candidates]
+            else:
+                top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+            best_rows = np.concatenate([best_rows, top + start], axis=1)
+            if best_scores.shape[1] > candidates:
+                keep = np.argpartition(-best_scores, candidates - 1, axis=1)[:, :candidates]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+        return best_rows
+
+    def search_batch(self, queries, k: int = 10, rescore: bool = True) -> List[List[Tuple[str, float]]]:
+        """
+        Top-k por similitud coseno. Con rescore=False se devuelven los scores
+        aproximados de la primera pasada (solo para medir su recall).
+        """
+        queries = normalize_rows(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        k = min(k, self._count)
+        if k == 0:
+            return [[] for _ in range(len(queries))]
+        candidates = min(self._count, k * self.rescore_factor if rescore else k)
+        rows = self._first_pass(queries, candidates)
+
+        results = []
+        for query, candidate_rows in zip(queries, rows):
+            candidate_rows = np.sort(candidate_rows)
+            if rescore:
+                # Lectura perezosa: solo las filas candidatas del archivo mapeado
+                scores = np.asarray(self.vectors.matrix[candidate_rows]) @ query
+            elif self.mode == 'int8':
+                scores = (self._codes[candidate_rows].astype(np.float32) @ query) * self._scales[candidate_rows]
+            else:
+                xor = np.bitwise_xor(quantize_binary(query[None, :]), self._codes[candidate_rows])
+                scores = 1.0 - 2.0 * _popcount(xor).sum(axis=1) / self.dimension
+            order = np.argsort(-scores)[:k]
+            results.append([(self.ids[candidate_rows[i]], float(scores[i])) for i in order])
+        return results
+
+    def search(self, query, k: int = 10, rescore: bool = True) -> List[Tuple[str, float]]:
+        return self.search_batch([query], k, rescore)[0]
+
+    def code_bytes(self) -> int:
+        """Bytes de los códigos (lo que debe quedar residente en memoria)"""
+        return self._count * (self._code_width + (4 if self.mode == 'int8' else 0))
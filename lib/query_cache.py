@@ -0,0 +1,318 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Dict, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from lib.legal_structure import parse_article_query
+from lib.near_duplicates import normalize_for_dedup
+from lib.vector_index import EMBEDDING_DIMENSION
+
+DEFAULT_THRESHOLD = 0.95
+DEFAULT_TTL = 3600.0
+DEFAULT_MAX_ENTRIES = 1000
+
+CACHE_OUTCOMES = ('exact', 'semantic', 'miss')
+
+# Latencias que se guardan por resultado para los percentiles
+_LATENCY_WINDOW = 2000
+
+
+def corpus_generation_path() -> str:
+    """Archivo marcador de la versión del corpus (CORPUS_GENERATION_PATH; vacío lo desactiva)"""
+    return os.environ.get('CORPUS_GENERATION_PATH', '.cache/corpus_generation')
+
+
+def bump_corpus_generation(path: Optional[str] = None):
+    """
+    Marcar que el corpus cambió. Lo llama la ingesta después de escribir o
+    borrar chunks; las cachés de consultas de cualquier proceso lo detectan
+    en su siguiente búsqueda y se vacían.
+    """
+    path = corpus_generation_path() if path is None else path
+    if not path:
+        return
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(uuid.uuid4().hex)
+    # os.replace crea un inodo nuevo: basta un stat para ver el cambio
+    os.replace(tmp_path, path)
+
+
+def corpus_generation(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def normalize_query(query: str) -> str:
+    """Clave del nivel exacto: minúsculas, sin acentos ni puntuación"""
+    return normalize_for_dedup(query)
+
+
+class _Entry(NamedTuple):
+    result: Dict[str, Any]
+    limit: int
+    article: Optional[str]
+    created: float
+    slot: Optional[int]
+
+
+class QueryCache:
+    """
+    Caché de resultados de recuperación en dos niveles.
+
+      - exacto: clave = (consulta normalizada, limit); no hace falta ni el
+        embedding de la consulta
+      - semántico: si el embedding de una consulta nueva tiene similitud
+        coseno >= threshold con el de una consulta en caché (mismo limit y
+        mismo artículo citado, si cita uno), se reutilizan sus resultados
+
+    Los embeddings viven en una matriz de `max_entries` filas, así el nivel
+    semántico es un único producto matriz-vector. Las entradas caducan a los
+    `ttl` segundos y, al llenarse, se desaloja la usada hace más tiempo (LRU).
+    Toda la caché se vacía cuando cambia el marcador de versión del corpus
+    (bump_corpus_generation) o con invalidate().
+    """
+
+    def __init__(
+        self,
+        threshold: float = DEFAULT_THRESHOLD,
+        ttl: float = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        dimension: int = EMBEDDING_DIMENSION,
+        generation_path: Optional[str] = None
+    ):
+        if max_entries <= 0:
+            raise ValueError('max_entries debe ser mayor que 0')
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.dimension = dimension
+        self.generation_path = corpus_generation_path() if generation_path is None else generation_path
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Tuple[str, int], _Entry]' = OrderedDict()
+        self._matrix = np.zeros((max_entries, dimension), dtype=np.float32)
+        self._slot_keys = [None] * max_entries
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+        self._generation = corpus_generation(self.generation_path) if self.generation_path else None
+        self.stats = {outcome: 0 for outcome in CACHE_OUTCOMES}
+        self.stats.update(evictions=0, expirations=0, invalidations=0)
+        self._latencies = {outcome: deque(maxlen=_LATENCY_WINDOW) for outcome in CACHE_OUTCOMES}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _clear(self):
+        self._entries.clear()
+        self._slot_keys = [None] * self.max_entries
+        self._free_slots = list(range(self.max_entries - 1, -1, -1))
+
+    def _check_generation(self):
+        if not self.generation_path:
+            return
+        generation = corpus_generation(self.generation_path)
+        if generation != self._generation:
+            self._generation = generation
+            if self._entries:
+                self.stats['invalidations'] += 1
+            self._clear()
+
+    def _remove(self, key: Tuple[str, int]):
+        entry = self._entries.pop(key)
+        if entry.slot is not None:
+            self._slot_keys[entry.slot] = None
+            self._free_slots.append(entry.slot)
+
+    def _expired(self, entry: _Entry, now: float) -> bool:
+        return now - entry.created > self.ttl
+
+    def invalidate(self):
+        """Vaciar la caché (p. ej. tras cambiar el corpus en este proceso)"""
+        with self._lock:
+            if self._entries:
+                self.stats['invalidations'] += 1
+            self._clear()
+
+    def get(self, query: str, limit: int) -> Optional[Dict[str, Any]]:
+        """Nivel exacto: resultado en caché para la consulta normalizada, o None"""
+        key = (normalize_query(query), limit)
+        with self._lock:
+            self._check_generation()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry, time.time()):
+                self._remove(key)
+                self.stats['expirations'] += 1
+                return None
+            self._entries.move_to_end(key)
+            return entry.result
+
+    def get_similar(self, query: str, embedding: Sequence[float], limit: int) -> Optional[Tuple[Dict[str, Any], float]]:
+        """
+        Nivel semántico: (resultado, similitud) de la consulta en caché más
+        parecida, o None. En un acierto la redacción nueva queda guardada en
+        el nivel exacto, con la misma antigüedad que la entrada original.
+        """
+        vector = np.asarray(embedding, dtype=np.float32)
+        # Un embedding de otra dimensión (otro modelo, lib/embedding_migration.py) no se compara
+        if vector.shape != (self.dimension,):
+            return None
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        article = parse_article_query(query)
+        with self._lock:
+            self._check_generation()
+            if not self._entries:
+                return None
+            scores = self._matrix @ (vector / norm)
+            now = time.time()
+            # Mejor candidato válido: los slots libres, caducados o de otro limit/artículo no cuentan
+            for slot in np.argsort(-scores):
+                if scores[slot] < self.threshold:
+                    return None
+                key = self._slot_keys[slot]
+                if key is None:
+                    continue
+                entry = self._entries[key]
+                if self._expired(entry, now):
+                    self._remove(key)
+                    self.stats['expirations'] += 1
+                    continue
+                if entry.limit != limit or entry.article != article:
+                    continue
+                self._entries.move_to_end(key)
+                self._insert((normalize_query(query), limit), entry._replace(slot=None), None)
+                return entry.result, float(scores[slot])
+        return None
+
+    def _insert(self, key: Tuple[str, int], entry: _Entry, vector: Optional[np.ndarray]):
+        if key in self._entries:
+            self._remove(key)
+        while len(self._entries) >= self.max_entries or (vector is not None and not self._free_slots):
+            self._remove(next(iter(self._entries)))
+            self.stats['evictions'] += 1
+        if vector is not None:
+            slot = self._free_slots.pop()
+            self._matrix[slot] = vector
+            self._slot_keys[slot] = key
+            entry = entry._replace(slot=slot)
+        self._entries[key] = entry
+
+    def put(self, query: str, limit: int, result: Dict[str, Any], embedding: Optional[Sequence[float]] = None):
+        """Guardar un resultado; sin `embedding` la entrada solo sirve al nivel exacto"""
+        vector = None
+        if embedding is not None:
+            vector = np.asarray(embedding, dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            vector = vector / norm if norm and vector.shape == (self.dimension,) else None
+        entry = _Entry(result, limit, parse_article_query(query), time.time(), None)
+        with self._lock:
+            self._check_generation()
+            self._insert((normalize_query(query), limit), entry, vector)
+
+    def record(self, outcome: str, seconds: float):
+        with self._lock:
+            self.stats[outcome] += 1
+            self._latencies[outcome].append(seconds)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Tasa de aciertos por nivel y latencia p50/p95 (ms) por resultado"""
+        with self._lock:
+            requests = sum(self.stats[outcome] for outcome in CACHE_OUTCOMES)
+            latency = {}
+            for outcome, values in self._latencies.items():
+                if values:
+                    p50, p95 = np.percentile(np.fromiter(values, dtype=np.float64), [50, 95]) * 1000
+                    latency[outcome] = {'p50_ms': float(p50), 'p95_ms': float(p95)}
+            return dict(
+                self.stats,
+                entries=len(self._entries),
+                requests=requests,
+                hit_rate=(self.stats['exact'] + self.stats['semantic']) / requests if requests else 0.0,
+                exact_hit_rate=self.stats['exact'] / requests if requests else 0.0,
+                semantic_hit_rate=self.stats['semantic'] / requests if requests else 0.0,
+                latency=latency
+            )
+
+
+class CachedRetriever:
+    """
+    HybridRetriever (lib/hybrid_retrieval.py) con QueryCache delante.
+
+    Un acierto exacto no calcula embedding ni toca la base de datos. Si no,
+    se calcula el embedding de la consulta (retriever.embed, p. ej.
+    lib/gemini.get_embeddings) y se busca en el nivel semántico; en un fallo
+    ese mismo embedding se pasa al retriever, así nunca se calcula dos veces.
+    Los resultados con errores en alguna etapa no se guardan.
+    """
+
+    def __init__(self, retriever, cache: Optional[QueryCache] = None):
+        self.retriever = retriever
+        self.cache = cache if cache is not None else QueryCache()
+
+    def _hit(self, result: Dict[str, Any], outcome: str, start: float, timings: Dict[str, float], **extra) -> Dict[str, Any]:
+        timings['total'] = time.perf_counter() - start
+        self.cache.record(outcome, timings['total'])
+        return dict(result, cache=outcome, timings=timings, errors={}, **extra)
+
+    async def aretrieve(self, query: str, limit: int = 10) -> Dict[str, Any]:
+        """Como HybridRetriever.aretrieve, más 'cache' ('exact', 'semantic' o 'miss')"""
+        start = time.perf_counter()
+        cached = self.cache.get(query, limit)
+        if cached is not None:
+            return self._hit(cached, 'exact', start, {})
+
+        embed_start = time.perf_counter()
+        try:
+            embedding = await asyncio.to_thread(self.retriever.embed, query)
+        except Exception as e:
+            # El retriever reintenta el embedding y reporta el error en su resultado
+            print(f"⚠️  Error en el embedding de la consulta: {e}")
+            embedding = None
+        embed_seconds = time.perf_counter() - embed_start
+
+        if embedding is not None:
+            match = self.cache.get_similar(query, embedding, limit)
+            if match is not None:
+                result, similarity = match
+                return self._hit(result, 'semantic', start, {'embedding': embed_seconds}, similarity=similarity)
+
+        result = await self.retriever.aretrieve(query, limit, embedding=embedding)
+        if embedding is not None:
+            result['timings']['embedding'] = embed_seconds
+        result['timings']['total'] = time.perf_counter() - start
+        if not result['errors']:
+            self.cache.put(query, limit, {k: v for k, v in result.items() if k not in ('timings', 'errors')}, embedding)
+        self.cache.record('miss', result['timings']['total'])
+        return dict(result, cache='miss')
+
+    def retrieve(self, query: str, limit: int = 10) -> Dict[str, Any]:
+        """Versión síncrona de aretrieve (no usar dentro de un event loop)"""
+        return asyncio.run(self.aretrieve(query, limit))
+
+
+def open_default_query_cache() -> Optional[QueryCache]:
+    """
+    Caché configurada por entorno: QUERY_CACHE_MAX_ENTRIES (0 la desactiva),
+    QUERY_CACHE_TTL (segundos) y QUERY_CACHE_THRESHOLD (coseno mínimo).
+    """
+    max_entries = int(os.environ.get('QUERY_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES))
+    if max_entries <= 0:
+        return None
+    return QueryCache(
+        threshold=float(os.environ.get('QUERY_CACHE_THRESHOLD', DEFAULT_THRESHOLD)),
+        ttl=float(os.environ.get('QUERY_CACHE_TTL', DEFAULT_TTL)),
+        max_entries=max_entries
+    )
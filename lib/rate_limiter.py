@@ -0,0 +1,75 @@
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucketRateLimiter:
+    """
+    Limitador token-bucket compartido entre hilos.
+
+    Mantiene dos cubetas que se rellenan de forma continua: una de requests
+    por minuto y otra (opcional) de tokens por minuto. `acquire` bloquea hasta
+    que ambas tienen saldo suficiente para la petición.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: Optional[float] = None):
+        if requests_per_minute <= 0:
+            raise ValueError('requests_per_minute debe ser mayor que 0')
+        if tokens_per_minute is not None and tokens_per_minute <= 0:
+            raise ValueError('tokens_per_minute debe ser mayor que 0')
+
+        self.requests_per_minute = float(requests_per_minute)
+        self.tokens_per_minute = float(tokens_per_minute) if tokens_per_minute else None
+
+        self._request_level = self.requests_per_minute
+        self._token_level = self.tokens_per_minute or 0.0
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+        # Tiempo total que los llamadores han esperado en el limitador
+        self.waited_seconds = 0.0
+
+    def _refill(self, now: float):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._request_level = min(
+            self.requests_per_minute,
+            self._request_level + elapsed * self.requests_per_minute / 60.0
+        )
+        if self.tokens_per_minute:
+            self._token_level = min(
+                self.tokens_per_minute,
+                self._token_level + elapsed * self.tokens_per_minute / 60.0
+            )
+
+    def _wait_time(self, tokens: float) -> float:
+        """Segundos que faltan para poder consumir la petición (0 si ya se puede)"""
+        wait = 0.0
+        if self._request_level < 1:
+            wait = (1 - self._request_level) * 60.0 / self.requests_per_minute
+        if self.tokens_per_minute and self._token_level < tokens:
+            wait = max(wait, (tokens - self._token_level) * 60.0 / self.tokens_per_minute)
+        return wait
+
+    def acquire(self, tokens: int = 0) -> float:
+        """
+        Reservar una request y `tokens` tokens, esperando si es necesario.
+        Devuelve los segundos esperados.
+        """
+        # Una petición mayor que la cubeta completa nunca podría pasar
+        if self.tokens_per_minute:
+            tokens = min(tokens, self.tokens_per_minute)
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                wait = self._wait_time(tokens)
+                if wait <= 0:
+                    self._request_level -= 1
+                    if self.tokens_per_minute:
+                        self._token_level -= tokens
+                    self.waited_seconds += waited
+                    return waited
+            time.sleep(wait)
+            waited += wait
@@ -0,0 +1,347 @@
+import json
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from lib.legal_structure import extract_article_references
+
+# Artículos citados que se siguen por resultado, chunks que se toman de cada
+# uno y chunks añadidos en total: la expansión cuesta lo mismo con cualquier
+# tamaño de corpus
+DEFAULT_FAN_OUT = 3
+DEFAULT_CHUNKS_PER_ARTICLE = 2
+DEFAULT_EXPAND_LIMIT = 5
+
+DEFAULT_PAGE_SIZE = 1000
+# section_id por consulta de chunks (la lista va en la URL de PostgREST)
+SECTION_BATCH_SIZE = 100
+
+ARTICLE_COLUMNS = 'document_id, section_id, article_number, referenced_articles, referenced_sections, chunk_ids'
+
+Row = Dict[str, Any]
+
+
+def _array(value) -> List[str]:
+    """Arreglo tal como lo devuelve PostgREST: lista, o texto JSON (LocalSupabaseClient)"""
+    if isinstance(value, str):
+        return json.loads(value)
+    return list(value or [])
+
+
+def _id(value) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def _scopes(sections: Iterable[Row]) -> Dict[str, Tuple[str, str]]:
+    """
+    Ámbito de numeración de cada sección: (ámbito, raíz). Cada bloque
+    TRANSITORIOS numera sus artículos aparte (cada decreto de reforma trae
+    su PRIMERO, SEGUNDO...), así que su ámbito es el propio bloque; el resto
+    del documento comparte el de la sección raíz.
+    """
+    parents = {_id(row['section_id']): _id(row.get('parent_section_id')) for row in sections}
+    types = {_id(row['section_id']): row.get('section_type') for row in sections}
+    scopes = {}
+    for section_id in parents:
+        scope, current = None, section_id
+        while parents.get(current) is not None and parents[current] in parents:
+            if scope is None and types[current] == 'transitorios':
+                scope = current
+            current = parents[current]
+        if scope is None and types[current] == 'transitorios':
+            scope = current
+        scopes[section_id] = (scope or current, current)
+    return scopes
+
+
+def build_article_rows(document_id: str, chunks: Iterable[Row], sections: Iterable[Row] = ()) -> List[Row]:
+    """
+    Filas de article_references de un documento a partir de sus chunks
+    (chunk_id, section_id, article_number, chunk_order, chunk_text) y
+    secciones (section_id, section_type, parent_section_id): por artículo,
+    los artículos del documento que cita, de más a menos mencionado (a
+    igualdad, por orden de aparición), y sus chunk_id en orden.
+
+    Un artículo es el par (ámbito, número), con section_id = ámbito: los
+    transitorios de dos decretos no se mezclan. Una cita se resuelve en el
+    ámbito del artículo y, desde un transitorio, en el articulado principal.
+
+    >>> sections = [
+    ...     {'section_id': 'raiz', 'section_type': 'main', 'parent_section_id': None},
+    ...     {'section_id': 't1', 'section_type': 'transitorios', 'parent_section_id': 'raiz'},
+    ...     {'section_id': 't2', 'section_type': 'transitorios', 'parent_section_id': 'raiz'},
+    ... ]
+    >>> chunks = [
+    ...     {'chunk_id': 'a', 'section_id': 'raiz', 'article_number': '2', 'chunk_text': 'Artículo 2. Texto.'},
+    ...     {'chunk_id': 'b', 'section_id': 't1', 'article_number': '1', 'chunk_text': 'Artículo 1. Conforme al artículo 2.'},
+    ...     {'chunk_id': 'c', 'section_id': 't1', 'article_number': '2', 'chunk_text': 'Artículo 2. Vigencia.'},
+    ...     {'chunk_id': 'd', 'section_id': 't2', 'article_number': '1', 'chunk_text': 'Artículo 1. Reforma el artículo 2.'},
+    ... ]
+    >>> [(row['section_id'], row['article_number'], row['referenced_sections'], row['chunk_ids'])
+    ...  for row in build_article_rows('doc', chunks, sections)]
+    [('raiz', '2', [], ['a']), ('t1', '1', ['t1'], ['b']), ('t1', '2', [], ['c']), ('t2', '1', ['raiz'], ['d'])]
+    """
+    scopes = _scopes(sections)
+    articles: Dict[Tuple[Optional[str], str], List[Row]] = {}
+    roots: Dict[Optional[str], Optional[str]] = {}
+    for chunk in chunks:
+        if chunk.get('article_number'):
+            section_id = _id(chunk.get('section_id'))
+            scope, root = scopes.get(section_id, (section_id, section_id))
+            roots[scope] = root
+            articles.setdefault((scope, chunk['article_number']), []).append(chunk)
+
+    rows = []
+    for (scope, article_number), article_chunks in articles.items():
+        article_chunks.sort(key=lambda chunk: chunk.get('chunk_order') or 0)
+        mentions: Dict[Tuple[Optional[str], str], int] = {}
+        for chunk in article_chunks:
+            for reference in extract_article_references(chunk.get('chunk_text') or ''):
+                # Solo artículos del mismo documento, sin la autorreferencia
+                if reference == article_number:
+                    continue
+                for target in ((scope, reference), (roots[scope], reference)):
+                    if target in articles:
+                        mentions[target] = mentions.get(target, 0) + 1
+                        break
+        # sorted es estable: a igual número de menciones queda el orden de aparición
+        cited = sorted(mentions, key=mentions.get, reverse=True)
+        rows.append({
+            'document_id': document_id,
+            'section_id': scope,
+            'article_number': article_number,
+            'referenced_articles': [reference for _, reference in cited],
+            'referenced_sections': [section_id for section_id, _ in cited],
+            'chunk_ids': [str(chunk['chunk_id']) for chunk in article_chunks]
+        })
+    return rows
+
+
+def fetch_document_sections(supabase, document_id: str) -> List[Row]:
+    return supabase.table('sections').select('section_id, section_type, parent_section_id') \
+        .eq('document_id', document_id).execute().data or []
+
+
+def fetch_document_chunks(supabase, section_ids: Sequence[str], page_size: int = DEFAULT_PAGE_SIZE) -> List[Row]:
+    """
+    Chunks de las secciones de un documento, por grupos de secciones y por
+    páginas (keyset por chunk_id). Se llega a ellos por section_id, como en
+    match_documents: así no dependen de chunks.document_id.
+    """
+    chunks = []
+    section_ids = [str(section_id) for section_id in section_ids]
+    for start in range(0, len(section_ids), SECTION_BATCH_SIZE):
+        batch, cursor = section_ids[start:start + SECTION_BATCH_SIZE], None
+        while True:
+            query = supabase.table('chunks').select('chunk_id, section_id, article_number, chunk_order, chunk_text') \
+                .in_('section_id', batch)
+            if cursor is not None:
+                query = query.gt('chunk_id', cursor)
+            rows = query.order('chunk_id').limit(page_size).execute().data or []
+            chunks.extend(rows)
+            if len(rows) < page_size:
+                break
+            cursor = rows[-1]['chunk_id']
+    return chunks
+
+
+def update_document_references(supabase, document_id: str, page_size: int = DEFAULT_PAGE_SIZE) -> List[Row]:
+    """
+    Recalcular las filas de article_references de un documento desde sus
+    chunks en la base. Se hace upsert de las filas actuales y después se
+    borran las de artículos que ya no existen, así un lector nunca ve el
+    documento sin grafo. Devuelve las filas escritas.
+    """
+    sections = fetch_document_sections(supabase, document_id)
+    chunks = fetch_document_chunks(supabase, [section['section_id'] for section in sections], page_size)
+    rows = build_article_rows(document_id, chunks, sections)
+    for start in range(0, len(rows), page_size):
+        supabase.table('article_references').upsert(rows[start:start + page_size]).execute()
+
+    current = {(row['section_id'], row['article_number']) for row in rows}
+    existing = supabase.table('article_references').select('section_id, article_number') \
+        .eq('document_id', document_id).execute().data or []
+    stale: Dict[str, List[str]] = {}
+    for row in existing:
+        if (_id(row['section_id']), row['article_number']) not in current:
+            stale.setdefault(_id(row['section_id']), []).append(row['article_number'])
+    for section_id, articles in stale.items():
+        for start in range(0, len(articles), page_size):
+            supabase.table('article_references').delete().eq('document_id', document_id).eq('section_id', section_id) \
+                .in_('article_number', articles[start:start + page_size]).execute()
+    return rows
+
+
+class _DocumentGraph:
+    """Artículos (ámbito, número) de un documento con sus adyacencias en formato CSR"""
+
+    def __init__(self, document_id: str, rows: Sequence[Row]):
+        self.document_id = document_id
+        self.articles = [row['article_number'] for row in rows]
+        index = {(_id(row.get('section_id')), row['article_number']): i for i, row in enumerate(rows)}
+
+        ref_offsets, ref_targets = [0], []
+        chunk_offsets, self.chunk_ids = [0], []
+        for row in rows:
+            referenced = _array(row['referenced_articles'])
+            sections = [_id(section_id) for section_id in _array(row.get('referenced_sections'))] \
+                or [_id(row.get('section_id'))] * len(referenced)
+            ref_targets.extend(index[key] for key in zip(sections, referenced) if key in index)
+            ref_offsets.append(len(ref_targets))
+            self.chunk_ids.extend(str(chunk_id) for chunk_id in _array(row['chunk_ids']))
+            chunk_offsets.append(len(self.chunk_ids))
+        self.ref_offsets = np.asarray(ref_offsets, dtype=np.int32)
+        self.ref_targets = np.asarray(ref_targets, dtype=np.int32)
+        self.chunk_offsets = np.asarray(chunk_offsets, dtype=np.int32)
+
+    def chunk_nodes(self) -> Iterable[Tuple[str, int]]:
+        for node in range(len(self.articles)):
+            for chunk_id in self.chunk_ids[self.chunk_offsets[node]:self.chunk_offsets[node + 1]]:
+                yield chunk_id, node
+
+    def cited(self, node: int, fan_out: int, chunks_per_article: int) -> Iterable[Tuple[str, str]]:
+        """(chunk_id, artículo) de los primeros `fan_out` artículos que cita el nodo"""
+        start = self.ref_offsets[node]
+        for target in self.ref_targets[start:min(start + fan_out, self.ref_offsets[node + 1])]:
+            first = self.chunk_offsets[target]
+            last = min(first + chunks_per_article, self.chunk_offsets[target + 1])
+            for chunk_id in self.chunk_ids[first:last]:
+                yield chunk_id, self.articles[target]
+
+
+class CrossReferenceGraph:
+    """
+    Grafo de referencias entre artículos en memoria: artículo -> artículos
+    que cita -> chunk_id, con las adyacencias de cada documento en arreglos
+    CSR (offsets y destinos int32) y un diccionario chunk_id -> artículo.
+
+    expand() va de los chunks de un resultado a los chunks de los artículos
+    que citan con un acceso a diccionario y dos cortes de arreglo por
+    resultado, acotado por fan_out, chunks_per_article y limit. Cada
+    documento se reemplaza por separado (set_document / refresh_document)
+    cuando la ingesta lo reescribe, sin reconstruir el resto.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._documents: Dict[str, _DocumentGraph] = {}
+        self._chunk_nodes: Dict[str, Tuple[_DocumentGraph, int]] = {}
+
+    def __len__(self) -> int:
+        """Artículos en el grafo"""
+        return sum(len(graph.articles) for graph in self._documents.values())
+
+    @property
+    def edges(self) -> int:
+        return sum(len(graph.ref_targets) for graph in self._documents.values())
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes de los arreglos de adyacencia (sin los chunk_id)"""
+        return sum(graph.ref_offsets.nbytes + graph.ref_targets.nbytes + graph.chunk_offsets.nbytes
+                   for graph in self._documents.values())
+
+    def set_document(self, document_id: str, rows: Sequence[Row]):
+        """Reemplazar el grafo de un documento por sus filas de article_references"""
+        graph = _DocumentGraph(document_id, rows)
+        with self._lock:
+            self._remove(document_id)
+            if graph.articles:
+                self._documents[document_id] = graph
+                for chunk_id, node in graph.chunk_nodes():
+                    self._chunk_nodes[chunk_id] = (graph, node)
+
+    def remove_document(self, document_id: str):
+        with self._lock:
+            self._remove(document_id)
+
+    def _remove(self, document_id: str):
+        graph = self._documents.pop(document_id, None)
+        if graph is not None:
+            for chunk_id, _ in graph.chunk_nodes():
+                if self._chunk_nodes.get(chunk_id, (None,))[0] is graph:
+                    del self._chunk_nodes[chunk_id]
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Row]) -> 'CrossReferenceGraph':
+        by_document: Dict[str, List[Row]] = {}
+        for row in rows:
+            by_document.setdefault(str(row['document_id']), []).append(row)
+        graph = cls()
+        for document_id, document_rows in by_document.items():
+            graph.set_document(document_id, document_rows)
+        return graph
+
+    @classmethod
+    def from_supabase(cls, supabase, page_size: int = DEFAULT_PAGE_SIZE) -> 'CrossReferenceGraph':
+        """Cargar la tabla article_references completa por páginas"""
+        rows, start = [], 0
+        while True:
+            result = supabase.table('article_references').select(ARTICLE_COLUMNS) \
+                .order('document_id').order('section_id').order('article_number').range(start, start + page_size - 1).execute()
+            rows.extend(result.data or [])
+            if len(result.data or []) < page_size:
+                break
+            start += page_size
+        return cls.from_rows(rows)
+
+    def refresh_document(self, supabase, document_id: str):
+        """Releer de la base las filas de un documento (tras reingerirlo o borrarlo)"""
+        rows = supabase.table('article_references').select(ARTICLE_COLUMNS) \
+            .eq('document_id', document_id).order('section_id').order('article_number').execute().data or []
+        self.set_document(document_id, rows)
+
+    def expand(
+        self,
+        chunk_ids: Sequence[str],
+        fan_out: int = DEFAULT_FAN_OUT,
+        chunks_per_article: int = DEFAULT_CHUNKS_PER_ARTICLE,
+        limit: int = DEFAULT_EXPAND_LIMIT
+    ) -> List[Row]:
+        """
+        Chunks de los artículos que citan `chunk_ids` (en su orden), sin los
+        propios `chunk_ids` ni repetidos: [{chunk_id, article_number, referenced_by}].
+        """
+        seen = {str(chunk_id) for chunk_id in chunk_ids}
+        expanded = []
+        for chunk_id in chunk_ids:
+            node = self._chunk_nodes.get(str(chunk_id))
+            if node is None:
+                continue
+            graph, index = node
+            for cited_id, article_number in graph.cited(index, fan_out, chunks_per_article):
+                if cited_id in seen:
+                    continue
+                seen.add(cited_id)
+                expanded.append({'chunk_id': cited_id, 'article_number': article_number, 'referenced_by': str(chunk_id)})
+                if len(expanded) >= limit:
+                    return expanded
+        return expanded
+
+
+def reference_expansion(
+    graph: CrossReferenceGraph,
+    supabase=None,
+    rows_by_id: Optional[Dict[str, Row]] = None,
+    fan_out: int = DEFAULT_FAN_OUT,
+    chunks_per_article: int = DEFAULT_CHUNKS_PER_ARTICLE
+) -> Callable[[List[Row], int], List[Row]]:
+    """
+    Etapa expand de HybridRetriever. Las filas de los chunks citados salen
+    de `rows_by_id` si se pasa (sin red) o de una lectura por chunk_id de
+    la tabla chunks de `supabase` (sin embedding ni búsqueda).
+    """
+    def expand(rows: List[Row], limit: int) -> List[Row]:
+        cited = graph.expand([row['chunk_id'] for row in rows], fan_out=fan_out,
+                             chunks_per_article=chunks_per_article, limit=limit)
+        if not cited:
+            return []
+        if rows_by_id is not None:
+            found = rows_by_id
+        else:
+            data = supabase.table('chunks').select('chunk_id, chunk_text, document_id, article_number') \
+                .in_('chunk_id', [item['chunk_id'] for item in cited]).execute().data or []
+            found = {str(row['chunk_id']): row for row in data}
+        return [dict(found[item['chunk_id']], **item) for item in cited if item['chunk_id'] in found]
+    return expand
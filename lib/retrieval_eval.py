@@ -0,0 +1,127 @@
+import json
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from lib.legal_structure import iter_structure
+
+DEFAULT_K_VALUES = (1, 5, 10)
+
+# Espacio de nombres para chunk_id deterministas: mismos ids en cada ejecución
+EVAL_NAMESPACE = uuid.UUID('6f1c1c52-3b0e-4a8f-9d8e-2f4b7b1f0e11')
+
+
+def load_gold(path: str) -> Dict[str, Any]:
+    """Conjunto gold: {'document', 'queries': [{'query', 'articles'}]}"""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def split_paragraphs(text: str, max_chars: int) -> List[str]:
+    """Agrupar párrafos (líneas) hasta `max_chars` caracteres por chunk"""
+    chunks, current = [], ''
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        if current and len(current) + len(line) + 1 > max_chars:
+            chunks.append(current)
+            current = ''
+        current = f'{current}\n{line}' if current else line
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def build_eval_chunks(
+    text: str,
+    document_id: str,
+    chunk_text: Optional[Callable[[str], List[str]]] = None,
+    max_chars: int = 1500
+) -> List[Dict[str, Any]]:
+    """
+    Chunks del documento con la misma estructura que el loader: un artículo
+    nunca se parte entre chunks y cada chunk lleva su article_number. Por
+    defecto se chunkea por párrafos (determinista y sin tokenizer), así los
+    resultados son comparables entre commits; `chunk_text` permite usar otro chunker.
+    """
+    rows = []
+    for kind, unit in iter_structure([(1, text)]):
+        if kind != 'unit':
+            continue
+        unit_text = '\n'.join(segment for _, segment in unit.pages())
+        pieces = chunk_text(unit_text) if chunk_text else split_paragraphs(unit_text, max_chars)
+        for order, piece in enumerate(pieces):
+            rows.append({
+                'chunk_id': str(uuid.uuid5(EVAL_NAMESPACE, f'{document_id}:{len(rows)}')),
+                'document_id': document_id,
+                'chunk_text': piece,
+                'char_count': len(piece),
+                'article_number': unit.article_number,
+                'chunk_order': order
+            })
+    return rows
+
+
+def percentile_ms(latencies: Sequence[float], q: float) -> float:
+    return float(np.percentile(latencies, q) * 1000) if latencies else 0.0
+
+
+def evaluate_method(
+    search: Callable[[str, int], List[Dict[str, Any]]],
+    queries: Iterable[Dict[str, Any]],
+    article_of: Dict[str, Optional[str]],
+    k_values: Sequence[int] = DEFAULT_K_VALUES
+) -> Dict[str, Any]:
+    """
+    Ejecutar `search(query, k)` sobre el gold set y calcular:
+      - recall@k: fracción de artículos gold presentes en los k primeros chunks
+      - mrr: media de 1/posición del primer chunk de un artículo gold (0 si no aparece)
+      - latencia p50/p95/p99 en ms
+    `article_of` mapea chunk_id -> article_number.
+    """
+    max_k = max(k_values)
+    recalls = {k: [] for k in k_values}
+    reciprocal_ranks, latencies, per_query = [], [], []
+
+    for item in queries:
+        gold = set(item['articles'])
+        start = time.perf_counter()
+        rows = search(item['query'], max_k)
+        latencies.append(time.perf_counter() - start)
+
+        articles = [article_of.get(str(row['chunk_id'])) for row in rows[:max_k]]
+        first = next((rank for rank, article in enumerate(articles, start=1) if article in gold), None)
+        reciprocal_ranks.append(1.0 / first if first else 0.0)
+        for k in k_values:
+            recalls[k].append(len(gold & set(articles[:k])) / len(gold))
+        per_query.append({'query': item['query'], 'articles': item['articles'], 'retrieved': articles, 'first_hit': first})
+
+    return {
+        **{f'recall@{k}': float(np.mean(values)) for k, values in recalls.items()},
+        'mrr': float(np.mean(reciprocal_ranks)),
+        'latency_ms': {
+            'p50': percentile_ms(latencies, 50),
+            'p95': percentile_ms(latencies, 95),
+            'p99': percentile_ms(latencies, 99)
+        },
+        'queries': per_query
+    }
+
+
+def compare_reports(previous: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+    """Diferencias de métricas de calidad entre dos reportes, método a método"""
+    lines = []
+    for method, metrics in current['methods'].items():
+        before = previous.get('methods', {}).get(method)
+        if not before:
+            continue
+        for name, value in metrics.items():
+            if name in ('latency_ms', 'queries') or name not in before:
+                continue
+            delta = value - before[name]
+            if abs(delta) > 1e-9:
+                lines.append(f'{method} {name}: {before[name]:.3f} → {value:.3f} ({delta:+.3f})')
+    return lines
@@ -1,12 +1,26 @@
 import os
-from supabase import create_client as supa_create_client, Client
 
-def create_client() -> Client:
-    """Crear cliente de Supabase para Python"""
+def create_client():
+    """Crear cliente de Supabase para Python (el SDK se importa aquí, no al importar el módulo)"""
     url = os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
     key = os.environ.get("NEXT_PUBLIC_SUPABASE_ANON_KEY")
     
     if not url or not key:
         raise ValueError("NEXT_PUBLIC_SUPABASE_URL y NEXT_PUBLIC_SUPABASE_ANON_KEY deben estar configurados")
     
-    return supa_create_client(url, key) 
\ No newline at end of file
+    from supabase import create_client as supa_create_client
+    return supa_create_client(url, key)
+
+
+def document_ids_by_section(supabase, section_ids, batch_size: int = 100):
+    """
+    section_id -> document_id de las secciones dadas. Los chunks llegan a su
+    documento por la sección, como en match_documents y search_chunks_bm25.
+    """
+    section_ids = list(dict.fromkeys(str(section_id) for section_id in section_ids if section_id))
+    documents = {}
+    for start in range(0, len(section_ids), batch_size):
+        rows = supabase.table('sections').select('section_id, document_id') \
+            .in_('section_id', section_ids[start:start + batch_size]).execute().data or []
+        documents.update({str(row['section_id']): row['document_id'] for row in rows})
+    return documents
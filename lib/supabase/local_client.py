@@ -0,0 +1,529 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+# Esquema equivalente al de lib/db/schema.ts (solo las tablas que usa el loader)
+LOCAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+  document_id TEXT PRIMARY KEY NOT NULL,
+  source TEXT NOT NULL,
+  doc_type TEXT,
+  jurisdiction TEXT,
+  publication_date TEXT,
+  last_reform_date TEXT,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS sections (
+  section_id TEXT PRIMARY KEY NOT NULL,
+  document_id TEXT REFERENCES documents(document_id) ON DELETE CASCADE,
+  parent_section_id TEXT REFERENCES sections(section_id) ON DELETE SET NULL,
+  section_type TEXT NOT NULL,
+  section_number TEXT NOT NULL,
+  content_hash TEXT,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS chunks (
+  chunk_id TEXT PRIMARY KEY NOT NULL,
+  section_id TEXT REFERENCES sections(section_id) ON DELETE CASCADE,
+  document_id TEXT REFERENCES documents(document_id) ON DELETE CASCADE,
+  chunk_text TEXT NOT NULL,
+  char_count INTEGER NOT NULL,
+  start_page INTEGER,
+  end_page INTEGER,
+  vector_id TEXT,
+  hierarchy_id TEXT,
+  legal_document_name TEXT,
+  legal_document_code TEXT,
+  article_number TEXT,
+  section_number TEXT,
+  paragraph_number TEXT,
+  chunk_order INTEGER,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_chunks_article ON chunks(article_number);
+CREATE INDEX IF NOT EXISTS idx_chunks_section ON chunks(section_id);
+CREATE INDEX IF NOT EXISTS idx_chunks_document_article ON chunks(document_id, article_number, chunk_order);
+
+-- Como chunks_fill_document_id en Postgres: sin document_id se toma el de la sección
+CREATE TRIGGER IF NOT EXISTS chunks_fill_document_id AFTER INSERT ON chunks
+WHEN NEW.document_id IS NULL AND NEW.section_id IS NOT NULL
+BEGIN
+  UPDATE chunks SET document_id = (SELECT document_id FROM sections WHERE section_id = NEW.section_id)
+  WHERE chunk_id = NEW.chunk_id;
+END;
+
+CREATE TABLE IF NOT EXISTS embeddings (
+  vector_id TEXT PRIMARY KEY NOT NULL,
+  chunk_id TEXT REFERENCES chunks(chunk_id) ON DELETE CASCADE,
+  embedding TEXT NOT NULL,
+  embeddings_order INTEGER,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_embeddings_chunk ON embeddings(chunk_id);
+
+CREATE TABLE IF NOT EXISTS embedding_models (
+  model_version TEXT PRIMARY KEY NOT NULL,
+  provider TEXT NOT NULL,
+  model TEXT NOT NULL,
+  dimension INTEGER NOT NULL,
+  status TEXT NOT NULL DEFAULT 'building',
+  source_table TEXT NOT NULL DEFAULT 'chunk_embeddings',
+  checkpoint_chunk_id TEXT,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP NOT NULL,
+  updated_at TEXT DEFAULT CURRENT_TIMESTAMP NOT NULL,
+  activated_at TEXT
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS embedding_models_one_active_idx ON embedding_models(status) WHERE status = 'active';
+
+INSERT OR IGNORE INTO embedding_models (model_version, provider, model, dimension, status, source_table, activated_at)
+VALUES ('models/embedding-001@768', 'gemini', 'models/embedding-001', 768, 'active', 'embeddings', CURRENT_TIMESTAMP);
+
+CREATE TABLE IF NOT EXISTS chunk_embeddings (
+  chunk_id TEXT NOT NULL REFERENCES chunks(chunk_id) ON DELETE CASCADE,
+  model_version TEXT NOT NULL REFERENCES embedding_models(model_version) ON DELETE CASCADE,
+  embedding TEXT NOT NULL,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP NOT NULL,
+  PRIMARY KEY (model_version, chunk_id)
+);
+
+CREATE TABLE IF NOT EXISTS ingest_jobs (
+  job_id TEXT PRIMARY KEY NOT NULL,
+  path TEXT NOT NULL,
+  content_hash TEXT NOT NULL,
+  status TEXT NOT NULL DEFAULT 'pending',
+  attempts INTEGER NOT NULL DEFAULT 0,
+  max_attempts INTEGER NOT NULL DEFAULT 3,
+  worker_id TEXT,
+  lease_token TEXT,
+  lease_expires_at REAL,
+  document_id TEXT,
+  error TEXT,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP NOT NULL,
+  started_at TEXT,
+  finished_at TEXT
+);
+
+CREATE INDEX IF NOT EXISTS ingest_jobs_claim_idx ON ingest_jobs(status, created_at);
+CREATE INDEX IF NOT EXISTS ingest_jobs_path_idx ON ingest_jobs(path);
+
+CREATE TABLE IF NOT EXISTS article_references (
+  document_id TEXT NOT NULL REFERENCES documents(document_id) ON DELETE CASCADE,
+  section_id TEXT NOT NULL REFERENCES sections(section_id) ON DELETE CASCADE,
+  article_number TEXT NOT NULL,
+  referenced_articles TEXT NOT NULL DEFAULT '[]',
+  referenced_sections TEXT NOT NULL DEFAULT '[]',
+  chunk_ids TEXT NOT NULL DEFAULT '[]',
+  updated_at TEXT DEFAULT CURRENT_TIMESTAMP NOT NULL,
+  PRIMARY KEY (document_id, section_id, article_number)
+);
+"""
+
+
+class LocalAPIError(Exception):
+    """Error equivalente a postgrest.APIError para el cliente local"""
+
+
+class LocalResponse:
+    def __init__(self, data: Any, count: Optional[int] = None):
+        self.data = data
+        # Las funciones RPC escalares devuelven un valor, no filas
+        self.count = count if count is not None else (len(data) if isinstance(data, list) else None)
+        self.error = None
+
+
+class LocalQuery:
+    """Subconjunto del query builder de supabase-py sobre SQLite"""
+
+    def __init__(self, client: 'LocalSupabaseClient', table: str):
+        self._client = client
+        self._table = table
+        self._op = 'select'
+        self._columns = '*'
+        self._payload: Any = None
+        self._filters: List[tuple] = []
+        self._order: List[tuple] = []
+        self._limit: Optional[int] = None
+        self._offset = 0
+        self._count: Optional[str] = None
+
+    # Operaciones
+    def select(self, columns: str = '*', count: Optional[str] = None):
+        self._op = 'select'
+        self._columns = columns
+        # Como count='exact' en PostgREST: response.count es el total sin limit
+        self._count = count
+        return self
+
+    def insert(self, rows):
+        self._op = 'insert'
+        self._payload = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def upsert(self, rows):
+        self._op = 'upsert'
+        self._payload = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def update(self, values: Dict[str, Any]):
+        self._op = 'update'
+        self._payload = values
+        return self
+
+    def delete(self):
+        self._op = 'delete'
+        return self
+
+    # Filtros y modificadores
+    def eq(self, column: str, value):
+        self._filters.append((column, '=', value))
+        return self
+
+    def neq(self, column: str, value):
+        self._filters.append((column, '!=', value))
+        return self
+
+    def gt(self, column: str, value):
+        self._filters.append((column, '>', value))
+        return self
+
+    def in_(self, column: str, values):
+        self._filters.append((column, 'IN', list(values)))
+        return self
+
+    def is_(self, column: str, value):
+        self._filters.append((column, 'IS', None if value in (None, 'null') else value))
+        return self
+
+    def order(self, column: str, desc: bool = False):
+        self._order.append((column, 'DESC' if desc else 'ASC'))
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def range(self, start: int, end: int):
+        # Como en PostgREST, ambos extremos incluidos
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+
+    def _where(self):
+        clauses, params = [], []
+        for column, op, value in self._filters:
+            if op == 'IN':
+                if not value:
+                    clauses.append('0')
+                    continue
+                clauses.append(f'{column} IN ({",".join("?" for _ in value)})')
+                params.extend(_to_sql(v) for v in value)
+            elif op == 'IS':
+                clauses.append(f'{column} IS NULL' if value is None else f'{column} IS ?')
+                if value is not None:
+                    params.append(value)
+            else:
+                clauses.append(f'{column} {op} ?')
+                params.append(_to_sql(value))
+        sql = f' WHERE {" AND ".join(clauses)}' if clauses else ''
+        return sql, params
+
+    def execute(self) -> LocalResponse:
+        return self._client._execute(self)
+
+
+def _to_sql(value):
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return value
+
+
+class LocalSupabaseClient:
+    """
+    Sustituto local del cliente de Supabase respaldado por SQLite.
+
+    Implementa las operaciones de tabla que usa DocumentLoader (insert, upsert,
+    update, delete, select con filtros) con la misma semántica transaccional
+    de PostgREST: un insert multi-fila falla completo si una fila es inválida.
+    `latency` simula el tiempo de ida y vuelta HTTP de cada request.
+    """
+
+    def __init__(self, path: str = ':memory:', latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA foreign_keys = ON')
+        self._conn.executescript(LOCAL_SCHEMA)
+        self._lock = threading.Lock()
+        # Equivalentes de las funciones de supabase/migrations que usan los scripts
+        self._rpcs: Dict[str, Callable[..., Any]] = {
+            'embedding_model_missing': self._embedding_model_missing,
+            'activate_embedding_model': self._activate_embedding_model,
+            'enqueue_ingest_jobs': self._enqueue_ingest_jobs,
+            'claim_ingest_job': self._claim_ingest_job,
+            'heartbeat_ingest_job': self._heartbeat_ingest_job,
+            'complete_ingest_job': self._complete_ingest_job,
+            'fail_ingest_job': self._fail_ingest_job,
+            'delete_ingest_document': self._delete_ingest_document,
+        }
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        return self._conn
+
+    def table(self, name: str) -> LocalQuery:
+        return LocalQuery(self, name)
+
+    def register_rpc(self, name: str, fn: Callable[..., List[Dict[str, Any]]]):
+        """Registrar una implementación Python de una función RPC de Postgres"""
+        self._rpcs[name] = fn
+
+    def rpc(self, name: str, params: Optional[Dict[str, Any]] = None):
+        client = self
+
+        class _RpcCall:
+            def execute(self_inner):
+                if name not in client._rpcs:
+                    raise LocalAPIError(f'Función RPC no registrada: {name}')
+                client._simulate_round_trip()
+                return LocalResponse(client._rpcs[name](**(params or {})))
+
+        return _RpcCall()
+
+    def _missing_embeddings(self, model_version: str) -> int:
+        row = self._conn.execute(
+            'SELECT source_table FROM embedding_models WHERE model_version = ?', [model_version]
+        ).fetchone()
+        if row is None:
+            raise LocalAPIError(f'Versión de embeddings desconocida: {model_version}')
+        if row['source_table'] == 'embeddings':
+            sql = ('SELECT count(*) FROM chunks c WHERE NOT EXISTS '
+                   '(SELECT 1 FROM embeddings e WHERE e.chunk_id = c.chunk_id AND e.embedding IS NOT NULL)')
+            return self._conn.execute(sql).fetchone()[0]
+        sql = ('SELECT count(*) FROM chunks c WHERE NOT EXISTS '
+               '(SELECT 1 FROM chunk_embeddings ce WHERE ce.model_version = ? AND ce.chunk_id = c.chunk_id)')
+        return self._conn.execute(sql, [model_version]).fetchone()[0]
+
+    def _embedding_model_missing(self, p_model_version: str) -> int:
+        with self._lock:
+            return self._missing_embeddings(p_model_version)
+
+    def _activate_embedding_model(self, p_model_version: str, p_force: bool = False) -> List[Dict[str, Any]]:
+        """Como activate_embedding_model en Postgres: comprobar cobertura y cambiar la versión activa en una transacción"""
+        with self._lock:
+            missing = self._missing_embeddings(p_model_version)
+            if missing and not p_force:
+                raise LocalAPIError(f'La versión {p_model_version} no cubre el corpus: faltan {missing} chunks')
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE embedding_models SET status = 'retired', updated_at = CURRENT_TIMESTAMP "
+                    "WHERE status = 'active' AND model_version != ?", [p_model_version]
+                )
+                self._conn.execute(
+                    "UPDATE embedding_models SET status = 'active', activated_at = CURRENT_TIMESTAMP, "
+                    "updated_at = CURRENT_TIMESTAMP WHERE model_version = ?", [p_model_version]
+                )
+            row = self._conn.execute('SELECT * FROM embedding_models WHERE model_version = ?', [p_model_version]).fetchone()
+            return [dict(row)]
+
+    @contextmanager
+    def _immediate(self):
+        """
+        Transacción que toma el lock de escritura de SQLite al empezar: con la
+        base en un archivo, varios procesos (workers de la cola de ingesta)
+        nunca leen y actualizan la misma fila a la vez.
+        """
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.rollback()
+                raise
+            self._conn.commit()
+
+    def _delete_document(self, conn: sqlite3.Connection, document_id: Optional[str]):
+        if document_id is None:
+            return
+        # Secciones, chunks y embeddings se borran en cascada
+        conn.execute('DELETE FROM documents WHERE document_id = ?', [document_id])
+
+    def _enqueue_ingest_jobs(self, p_jobs: List[Dict[str, Any]], p_max_attempts: int = 3) -> int:
+        with self._immediate() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                'INSERT OR IGNORE INTO ingest_jobs (job_id, path, content_hash, max_attempts) VALUES (?, ?, ?, ?)',
+                [[job['job_id'], job['path'], job['content_hash'], p_max_attempts] for job in p_jobs]
+            )
+            return conn.total_changes - before
+
+    def _claim_ingest_job(self, p_worker_id: str, p_lease_seconds: float = 60) -> List[Dict[str, Any]]:
+        """Como claim_ingest_job en Postgres; el lock de escritura hace de SKIP LOCKED"""
+        now = time.time()
+        with self._immediate() as conn:
+            stale = conn.execute(
+                "SELECT job_id, document_id FROM ingest_jobs "
+                "WHERE status = 'running' AND lease_expires_at < ? AND attempts >= max_attempts", [now]
+            ).fetchall()
+            for row in stale:
+                conn.execute(
+                    "UPDATE ingest_jobs SET status = 'failed', error = 'Lease vencido en el último intento', "
+                    "lease_token = NULL, finished_at = CURRENT_TIMESTAMP WHERE job_id = ?", [row['job_id']]
+                )
+                self._delete_document(conn, row['document_id'])
+
+            job = conn.execute(
+                "SELECT * FROM ingest_jobs WHERE status = 'pending' "
+                "OR (status = 'running' AND lease_expires_at < ? AND attempts < max_attempts) "
+                "ORDER BY created_at, job_id LIMIT 1", [now]
+            ).fetchone()
+            if job is None:
+                return []
+            self._delete_document(conn, job['document_id'])
+            lease = {
+                'lease_token': str(uuid.uuid4()),
+                'lease_expires_at': now + p_lease_seconds,
+                'document_id': str(uuid.uuid4())
+            }
+            conn.execute(
+                "UPDATE ingest_jobs SET status = 'running', attempts = attempts + 1, worker_id = ?, lease_token = ?, "
+                "lease_expires_at = ?, document_id = ?, error = NULL, started_at = COALESCE(started_at, CURRENT_TIMESTAMP) "
+                "WHERE job_id = ?",
+                [p_worker_id, lease['lease_token'], lease['lease_expires_at'], lease['document_id'], job['job_id']]
+            )
+            return [dict(
+                job_id=job['job_id'],
+                path=job['path'],
+                content_hash=job['content_hash'],
+                attempts=job['attempts'] + 1,
+                previous_document_id=job['document_id'],
+                **lease
+            )]
+
+    def _heartbeat_ingest_job(self, p_job_id: str, p_lease_token: str, p_lease_seconds: float = 60) -> bool:
+        with self._immediate() as conn:
+            cursor = conn.execute(
+                "UPDATE ingest_jobs SET lease_expires_at = ? WHERE job_id = ? AND lease_token = ? AND status = 'running'",
+                [time.time() + p_lease_seconds, p_job_id, p_lease_token]
+            )
+            return cursor.rowcount > 0
+
+    def _complete_ingest_job(self, p_job_id: str, p_lease_token: str) -> bool:
+        with self._immediate() as conn:
+            job = conn.execute(
+                "SELECT path FROM ingest_jobs WHERE job_id = ? AND lease_token = ? AND status = 'running'",
+                [p_job_id, p_lease_token]
+            ).fetchone()
+            if job is None:
+                return False
+            conn.execute(
+                "UPDATE ingest_jobs SET status = 'done', lease_token = NULL, finished_at = CURRENT_TIMESTAMP WHERE job_id = ?",
+                [p_job_id]
+            )
+            old = conn.execute(
+                "SELECT job_id, document_id FROM ingest_jobs WHERE path = ? AND job_id != ? AND status = 'done'",
+                [job['path'], p_job_id]
+            ).fetchall()
+            for row in old:
+                conn.execute("UPDATE ingest_jobs SET status = 'superseded' WHERE job_id = ?", [row['job_id']])
+                self._delete_document(conn, row['document_id'])
+            return True
+
+    def _fail_ingest_job(self, p_job_id: str, p_lease_token: str, p_error: str) -> bool:
+        with self._immediate() as conn:
+            job = conn.execute(
+                "SELECT attempts, max_attempts, document_id FROM ingest_jobs "
+                "WHERE job_id = ? AND lease_token = ? AND status = 'running'",
+                [p_job_id, p_lease_token]
+            ).fetchone()
+            if job is None:
+                return False
+            final = job['attempts'] >= job['max_attempts']
+            conn.execute(
+                "UPDATE ingest_jobs SET status = ?, error = ?, lease_token = NULL, "
+                "finished_at = CASE WHEN ? THEN CURRENT_TIMESTAMP END WHERE job_id = ?",
+                ['failed' if final else 'pending', p_error, final, p_job_id]
+            )
+            self._delete_document(conn, job['document_id'])
+            return True
+
+    def _delete_ingest_document(self, p_document_id: str) -> None:
+        with self._immediate() as conn:
+            self._delete_document(conn, p_document_id)
+
+    def _simulate_round_trip(self):
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _execute(self, query: LocalQuery) -> LocalResponse:
+        self._simulate_round_trip()
+        with self._lock:
+            try:
+                return self._run(query)
+            except sqlite3.Error as e:
+                self._conn.rollback()
+                raise LocalAPIError(str(e)) from e
+
+    def _primary_key(self, table: str) -> List[str]:
+        """Columnas de la clave primaria, en orden (chunk_embeddings tiene una compuesta)"""
+        columns = sorted((row['pk'], row['name']) for row in self._conn.execute(f'PRAGMA table_info({table})') if row['pk'])
+        if not columns:
+            raise LocalAPIError(f'La tabla {table} no tiene clave primaria')
+        return [name for _, name in columns]
+
+    def _run(self, query: LocalQuery) -> LocalResponse:
+        table = query._table
+        where, params = query._where()
+
+        if query._op in ('insert', 'upsert'):
+            rows = query._payload
+            if not rows:
+                return LocalResponse([])
+            columns = list(rows[0].keys())
+            sql = f'INSERT INTO {table} ({",".join(columns)}) VALUES ({",".join("?" for _ in columns)})'
+            if query._op == 'upsert':
+                # ON CONFLICT ... DO UPDATE en lugar de REPLACE para no disparar cascadas
+                pk = self._primary_key(table)
+                updates = ','.join(f'{c} = excluded.{c}' for c in columns if c not in pk)
+                sql += f' ON CONFLICT({",".join(pk)}) DO ' + (f'UPDATE SET {updates}' if updates else 'NOTHING')
+            with self._conn:
+                self._conn.executemany(sql, [[_to_sql(row.get(c)) for c in columns] for row in rows])
+            return LocalResponse([dict(row) for row in rows])
+
+        if query._op == 'update':
+            values = query._payload
+            assignments = ','.join(f'{c} = ?' for c in values)
+            with self._conn:
+                self._conn.execute(
+                    f'UPDATE {table} SET {assignments}{where}',
+                    [_to_sql(v) for v in values.values()] + params
+                )
+            return LocalResponse([])
+
+        if query._op == 'delete':
+            with self._conn:
+                cursor = self._conn.execute(f'SELECT * FROM {table}{where}', params)
+                deleted = [dict(r) for r in cursor.fetchall()]
+                self._conn.execute(f'DELETE FROM {table}{where}', params)
+            return LocalResponse(deleted)
+
+        count = None
+        if query._count:
+            count = self._conn.execute(f'SELECT count(*) FROM {table}{where}', params).fetchone()[0]
+        sql = f'SELECT {query._columns} FROM {table}{where}'
+        if query._order:
+            sql += ' ORDER BY ' + ','.join(f'{c} {d}' for c, d in query._order)
+        if query._limit is not None:
+            sql += f' LIMIT {int(query._limit)} OFFSET {int(query._offset)}'
+        return LocalResponse([dict(r) for r in self._conn.execute(sql, params).fetchall()], count)
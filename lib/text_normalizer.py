@@ -0,0 +1,148 @@
+import re
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# Puntuación que sobrevive a la limpieza, además de letras, dígitos, '_' y espacios
+ALLOWED_PUNCTUATION = '.,;:!?-()[]{}"\''
+
+# Ligaduras y signos tipográficos frecuentes en PDFs, con su equivalente ASCII
+_REPLACEMENTS = {
+    'ﬀ': 'ff', 'ﬁ': 'fi', 'ﬂ': 'fl', 'ﬃ': 'ffi', 'ﬄ': 'ffl', 'ﬅ': 'st', 'ﬆ': 'st',
+    '“': '"', '”': '"', '„': '"', '«': '"', '»': '"',
+    '‘': "'", '’': "'", '‚': "'",
+    '‐': '-', '‑': '-', '‒': '-', '–': '-', '—': '-', '―': '-',
+    # Guion blando y caracteres de ancho cero: se eliminan
+    '\u00ad': None, '\u200b': None, '\u200c': None, '\u200d': None, '\u2060': None, '\ufeff': None,
+}
+
+# Cualquier salto de línea o de párrafo Unicode cuenta como '\n'
+_LINE_BREAKS = '\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029'
+
+# Caracteres que quizá haya que traducir: controles, símbolos ASCII fuera de
+# ALLOWED_PUNCTUATION y todo lo no ASCII salvo las letras de Latin-1 (acentos,
+# ñ, ü, º, ª). Es una clase positiva, así que re la busca sin consultar la base
+# de datos Unicode en cada carácter; el texto legal casi nunca la toca.
+_SPECIAL_RE = re.compile(
+    '[\x00-\x09\x0b-\x1f#$%&*+/<=>@\\\\^`|~\x7f-\xa9\xab-\xb4\xb6-\xb9\xbb-\xbf\xd7\xf7Ā-\U0010ffff]+'
+)
+_SPACES_RE = re.compile(' {2,}')
+_SOFT_HYPHEN_BREAK_RE = re.compile('\u00ad *\n *')
+
+# Minúscula al inicio de línea (sin la letra de un inciso "a)"): la línea continúa la anterior
+_CONTINUATION_RE = re.compile(r'[a-zß-öø-ÿ](?!\))')
+_SENTENCE_END = '.:;!?'
+
+
+class _CleanTable(dict):
+    """
+    Tabla de str.translate para todo Unicode: cada carácter se clasifica la
+    primera vez que aparece (permitido, espacio, salto de línea o basura) y
+    el resultado queda memorizado en el propio dict.
+    """
+
+    def __missing__(self, codepoint: int):
+        char = chr(codepoint)
+        if char in _LINE_BREAKS:
+            value = '\n'
+        elif char.isspace():
+            value = ' '
+        elif char.isalnum() or char == '_' or char in ALLOWED_PUNCTUATION:
+            value = codepoint
+        else:
+            value = ' '
+        self[codepoint] = value
+        return value
+
+
+_TABLE = _CleanTable({ord(char): value for char, value in _REPLACEMENTS.items()})
+
+
+def _translate(match: re.Match) -> str:
+    return match.group().translate(_TABLE)
+
+
+def _continues(previous: str, line: str) -> Optional[str]:
+    """Cómo unir `line` a la línea anterior: '' (palabra cortada), ' ' (mismo párrafo) o None"""
+    if not _CONTINUATION_RE.match(line):
+        return None
+    last = previous[-1]
+    if last == '-':
+        return '' if len(previous) > 1 and previous[-2].isalnum() else None
+    return None if last in _SENTENCE_END else ' '
+
+
+def clean_text(text: str) -> str:
+    """
+    Limpiar y normalizar texto en una sola pasada por línea.
+
+    Conserva letras, dígitos, espacios y ALLOWED_PUNCTUATION (lo demás pasa
+    a espacio), expande ligaduras y comillas/guiones tipográficos y colapsa
+    los espacios. Los saltos de línea se conservan como límites de párrafo
+    (el chunker usa '\\n' como delimitador), salvo dentro de un párrafo:
+    una palabra cortada con guion se une ("constitu-\\nción") y una línea
+    que sigue en minúscula tras otra sin fin de frase se une con espacio.
+    """
+    if '\u00ad' in text:
+        text = _SOFT_HYPHEN_BREAK_RE.sub('', text)
+    text = _SPECIAL_RE.sub(_translate, text)
+    if '  ' in text:
+        text = _SPACES_RE.sub(' ', text)
+
+    parts: List[str] = []
+    previous = ''
+    for line in text.split('\n'):
+        line = line.strip(' ')
+        if not line:
+            continue
+        if previous:
+            joint = _continues(previous, line)
+            if joint == '':
+                parts[-1] = previous[:-1]
+            else:
+                parts.append('\n' if joint is None else joint)
+        parts.append(line)
+        previous = line
+    return ''.join(parts)
+
+
+class PageNormalizer:
+    """
+    Limpieza de páginas que llegan una a una.
+
+    Cada página se limpia con `clean` (por defecto clean_text) y, si termina
+    en una palabra cortada con guion que sigue en minúscula en la página
+    siguiente, el fragmento pasa al inicio de esa página y la palabra se
+    une. Por eso cada página se emite al llegar la siguiente (o en flush()).
+    """
+
+    def __init__(self, clean=clean_text):
+        self.clean = clean
+        self._pending: Optional[Tuple[int, str]] = None
+
+    def feed(self, page_number: int, text: str) -> Iterator[Tuple[int, str]]:
+        """Añadir una página; emite la anterior, ya completa"""
+        text = self.clean(text)
+        if self._pending is not None:
+            previous_number, previous = self._pending
+            if previous.endswith('-') and _CONTINUATION_RE.match(text):
+                # Última palabra de la página: desde el último espacio o salto de línea
+                cut = max(previous.rfind(' '), previous.rfind('\n')) + 1
+                fragment = previous[cut:-1]
+                if fragment.isalnum():
+                    previous = previous[:cut].rstrip()
+                    text = fragment + text
+            yield previous_number, previous
+        self._pending = (page_number, text)
+
+    def flush(self) -> Iterator[Tuple[int, str]]:
+        """Emitir la última página"""
+        if self._pending is not None:
+            yield self._pending
+            self._pending = None
+
+
+def iter_clean_pages(pages: Iterable[Tuple[int, str]], clean=clean_text) -> Iterator[Tuple[int, str]]:
+    """(página, texto limpio) de cada página, uniendo las palabras cortadas entre páginas"""
+    normalizer = PageNormalizer(clean)
+    for page_number, text in pages:
+        yield from normalizer.feed(page_number, text)
+    yield from normalizer.flush()
@@ -0,0 +1,236 @@
+import json
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from lib.supabase.client import document_ids_by_section
+
+EMBEDDING_DIMENSION = 768
+
+# Filas de la matriz que se multiplican de una vez en cada búsqueda
+DEFAULT_BLOCK_ROWS = 65536
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Normalizar L2 por filas (las filas nulas se dejan en cero)"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def parse_vector(value) -> List[float]:
+    """Vector tal como lo devuelve PostgREST: lista, o texto '[0.1,0.2,...]' de pgvector/TEXT"""
+    if isinstance(value, str):
+        return json.loads(value)
+    return value
+
+
+class VectorIndex:
+    """
+    Índice vectorial local sobre una matriz float32 contigua mapeada en memoria.
+
+    En el directorio del índice hay tres archivos:
+      - vectors.f32: filas float32 normalizadas L2, una por chunk, en orden de inserción
+      - ids.txt: chunk_id de cada fila (sidecar, una línea por fila)
+      - meta.json: dimensión y número de filas confirmadas
+
+    Como las filas están normalizadas, la similitud coseno es un producto
+    punto: las búsquedas son productos de matrices por bloques y top-k con
+    argpartition. `append` escribe al final de ambos archivos y solo después
+    actualiza meta.json, así un corte a mitad deja el índice en su estado previo.
+    """
+
+    def __init__(self, path: str, dimension: int = EMBEDDING_DIMENSION, block_rows: int = DEFAULT_BLOCK_ROWS):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.block_rows = block_rows
+        self._lock = threading.Lock()
+        self._vectors_path = os.path.join(path, 'vectors.f32')
+        self._ids_path = os.path.join(path, 'ids.txt')
+        self._meta_path = os.path.join(path, 'meta.json')
+
+        meta = {'dimension': dimension, 'count': 0}
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path) as f:
+                meta = json.load(f)
+            if meta['dimension'] != dimension:
+                raise ValueError(f"El índice en {path} tiene dimensión {meta['dimension']}, no {dimension}")
+        self.dimension = dimension
+        self._count = meta['count']
+
+        # Descartar restos de un append interrumpido (más allá de lo confirmado)
+        row_bytes = self.dimension * 4
+        if os.path.exists(self._vectors_path) and os.path.getsize(self._vectors_path) > self._count * row_bytes:
+            with open(self._vectors_path, 'r+b') as f:
+                f.truncate(self._count * row_bytes)
+        self.ids: List[str] = []
+        if os.path.exists(self._ids_path):
+            with open(self._ids_path, encoding='utf-8') as f:
+                self.ids = [line.rstrip('\n') for _, line in zip(range(self._count), f)]
+            with open(self._ids_path, 'w', encoding='utf-8') as f:
+                f.writelines(chunk_id + '\n' for chunk_id in self.ids)
+
+        self._matrix: Optional[np.ndarray] = None
+        self._remap()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _remap(self):
+        if self._count:
+            self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode='r',
+                                     shape=(self._count, self.dimension))
+        else:
+            self._matrix = np.zeros((0, self.dimension), dtype=np.float32)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Matriz (n, dimension) de solo lectura"""
+        return self._matrix
+
+    def append(self, chunk_ids: Sequence[str], vectors) -> int:
+        """Añadir filas al final del índice; devuelve el nuevo número de filas"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dimension:
+            raise ValueError(f'Se esperaban vectores de dimensión {self.dimension}, no {vectors.shape}')
+        if len(chunk_ids) != len(vectors):
+            raise ValueError(f'{len(chunk_ids)} ids para {len(vectors)} vectores')
+        if not len(chunk_ids):
+            return self._count
+
+        rows = normalize_rows(vectors).astype(np.float32, copy=False)
+        with self._lock:
+            with open(self._vectors_path, 'ab') as f:
+                f.write(rows.tobytes())
+            with open(self._ids_path, 'a', encoding='utf-8') as f:
+                f.writelines(str(chunk_id) + '\n' for chunk_id in chunk_ids)
+
+            self._count += len(chunk_ids)
+            self.ids.extend(str(chunk_id) for chunk_id in chunk_ids)
+            tmp_path = self._meta_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump({'dimension': self.dimension, 'count': self._count}, f)
+            os.replace(tmp_path, self._meta_path)
+            self._remap()
+        return self._count
+
+    def _blocks(self) -> Iterator[Tuple[int, np.ndarray, Optional[np.ndarray]]]:
+        """(primera fila, bloque de filas, inversas de sus normas o None si ya están normalizadas)"""
+        for start in range(0, self._count, self.block_rows):
+            yield start, self._matrix[start:start + self.block_rows], None
+
+    def search_batch(self, queries, k: int = 10) -> List[List[Tuple[str, float]]]:
+        """
+        Top-k por similitud coseno para varias consultas a la vez: una sola
+        pasada por la matriz, por bloques de `block_rows` filas.
+        """
+        queries = normalize_rows(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        n = self._count
+        k = min(k, n)
+        if k == 0:
+            return [[] for _ in range(len(queries))]
+
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        for start, block, inv_norms in self._blocks():
+            scores = queries @ block.T
+            if inv_norms is not None:
+                scores *= inv_norms
+            # Candidatos del bloque y fusión con los mejores hasta ahora
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            else:
+                top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+            block_scores = np.take_along_axis(scores, top, axis=1)
+            best_scores = np.concatenate([best_scores, block_scores], axis=1)
+            best_rows = np.concatenate([best_rows, top + start], axis=1)
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        return [
+            [(self.ids[row], float(score)) for row, score in zip(rows, scores)]
+            for rows, scores in zip(best_rows, best_scores)
+        ]
+
+    def search(self, query, k: int = 10) -> List[Tuple[str, float]]:
+        """Top-k (chunk_id, similitud coseno) para una consulta"""
+        return self.search_batch([query], k)[0]
+
+
+def iter_supabase_embeddings(
+    supabase,
+    page_size: int = 1000,
+    model_version: Optional[str] = None
+) -> Iterator[Tuple[List[str], List[List[float]]]]:
+    """
+    Recorrer la tabla embeddings por páginas: (chunk_ids, vectores). Con
+    `model_version` se recorren los vectores de esa versión en chunk_embeddings
+    (lib/embedding_migration.py).
+    """
+    start = 0
+    while True:
+        if model_version is None:
+            query = supabase.table('embeddings').select('chunk_id, embedding').order('vector_id')
+        else:
+            query = supabase.table('chunk_embeddings').select('chunk_id, embedding') \
+                .eq('model_version', model_version).order('chunk_id')
+        result = query.range(start, start + page_size - 1).execute()
+        rows = [row for row in (result.data or []) if row.get('embedding')]
+        if rows:
+            yield [row['chunk_id'] for row in rows], [parse_vector(row['embedding']) for row in rows]
+        if len(result.data or []) < page_size:
+            return
+        start += page_size
+
+
+def export_embeddings(
+    supabase,
+    path: str,
+    dimension: int = EMBEDDING_DIMENSION,
+    page_size: int = 1000,
+    model_version: Optional[str] = None
+) -> VectorIndex:
+    """
+    Exportar los embeddings del corpus (o los de `model_version`) a un índice
+    local. Si el índice ya existe solo se añaden los chunk_id que aún no contiene.
+    """
+    index = VectorIndex(path, dimension=dimension)
+    known = set(index.ids)
+    for chunk_ids, vectors in iter_supabase_embeddings(supabase, page_size=page_size, model_version=model_version):
+        new = [(chunk_id, vector) for chunk_id, vector in zip(chunk_ids, vectors) if chunk_id not in known]
+        if new:
+            index.append([chunk_id for chunk_id, _ in new], [vector for _, vector in new])
+            known.update(chunk_id for chunk_id, _ in new)
+    return index
+
+
+def results_to_rows(supabase, results: List[Tuple[str, float]]) -> List[Dict[str, Any]]:
+    """
+    Completar resultados (chunk_id, score) con los datos del chunk, en la forma
+    de match_documents (content, chunk_id, similarity_score, ...).
+    """
+    if not results:
+        return []
+    chunk_ids = [chunk_id for chunk_id, _ in results]
+    data = supabase.table('chunks').select(
+        'chunk_id, chunk_text, section_id, article_number'
+    ).in_('chunk_id', chunk_ids).execute().data or []
+    by_id = {row['chunk_id']: row for row in data}
+    documents = document_ids_by_section(supabase, [row.get('section_id') for row in data])
+    return [
+        {
+            'chunk_id': chunk_id,
+            'document_id': documents.get(str(by_id[chunk_id].get('section_id'))),
+            'content': by_id[chunk_id]['chunk_text'],
+            'article_number': by_id[chunk_id].get('article_number'),
+            'similarity_score': score
+        }
+        for chunk_id, score in results if chunk_id in by_id
+    ]
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark de búsqueda aproximada (lib/hnsw_index.py) contra búsqueda exacta
+(lib/vector_index.py): recall@k y latencia p50/p99 según tamaño del corpus y ef.
+
+Los datos son sintéticos pero con estructura de clusters (como los
+embeddings reales de un corpus temático): centros aleatorios más ruido.
+Las consultas son puntos nuevos generados igual. El grafo HNSW se construye
+en Python puro, así que con 1M de chunks la construcción tarda horas;
+--sizes permite elegir los tamaños a medir.
+
+Uso:
+    python scripts/benchmark_ann.py --sizes 10000,100000 --ef 16,50,100 -M 16
+    python scripts/benchmark_ann.py --sizes 1000000 --dimension 768 --ef 50,100
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+# Agregar el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.hnsw_index import HNSWIndex
+from lib.vector_index import VectorIndex
+
+
+def clustered(rng, count: int, centers: np.ndarray, noise: float) -> np.ndarray:
+    labels = rng.integers(0, len(centers), count)
+    return centers[labels] + noise * rng.standard_normal((count, centers.shape[1]), dtype=np.float32)
+
+
+def percentiles_ms(latencies):
+    return np.percentile(latencies, 50) * 1000, np.percentile(latencies, 99) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark HNSW vs búsqueda exacta')
+    parser.add_argument('--sizes', default='10000,100000', help='Tamaños de corpus (p. ej. 10000,100000,1000000)')
+    parser.add_argument('--dimension', type=int, default=768)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('-M', type=int, default=16)
+    parser.add_argument('--ef-construction', type=int, default=100)
+    parser.add_argument('--ef', default='16,50,100', help='Valores de ef_search a medir')
+    parser.add_argument('--clusters', type=int, default=256)
+    parser.add_argument('--noise', type=float, default=0.6)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    centers = rng.standard_normal((args.clusters, args.dimension), dtype=np.float32) / np.sqrt(args.dimension) * 4
+    queries = clustered(rng, args.queries, centers, args.noise / np.sqrt(args.dimension) * 4)
+
+    print(f"📊 HNSW vs exacto: dimensión {args.dimension}, {args.queries} consultas, top-{args.k}, "
+          f"M={args.M}, ef_construction={args.ef_construction}")
+    print("=" * 80)
+    print(f"{'Corpus':<10} {'Modo':<14} {'Recall@k':<10} {'p50 (ms)':<10} {'p99 (ms)':<10} {'Construcción (s)':<16}")
+    print("-" * 80)
+
+    for size in (int(s) for s in args.sizes.split(',')):
+        data = clustered(rng, size, centers, args.noise / np.sqrt(args.dimension) * 4)
+        ids = [str(i) for i in range(size)]
+
+        with tempfile.TemporaryDirectory() as path:
+            exact_index = VectorIndex(path, dimension=args.dimension)
+            exact_index.append(ids, data)
+            truth, latencies = [], []
+            for query in queries:
+                start = time.perf_counter()
+                truth.append({chunk_id for chunk_id, _ in exact_index.search(query, args.k)})
+                latencies.append(time.perf_counter() - start)
+            p50, p99 = percentiles_ms(latencies)
+            print(f"{size:<10} {'exacto':<14} {1.0:<10.3f} {p50:<10.2f} {p99:<10.2f} {'-':<16}")
+
+        start = time.perf_counter()
+        ann = HNSWIndex(args.dimension, M=args.M, ef_construction=args.ef_construction)
+        ann.add(ids, data)
+        build_time = time.perf_counter() - start
+
+        for ef in (int(e) for e in args.ef.split(',')):
+            hits, latencies = 0, []
+            for query, expected in zip(queries, truth):
+                start = time.perf_counter()
+                found = ann.search(query, args.k, ef=ef)
+                latencies.append(time.perf_counter() - start)
+                hits += len(expected & {chunk_id for chunk_id, _ in found})
+            p50, p99 = percentiles_ms(latencies)
+            print(f"{size:<10} {f'hnsw ef={ef}':<14} {hits / (args.k * len(queries)):<10.3f} "
+                  f"{p50:<10.2f} {p99:<10.2f} {build_time:<16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark del motor BM25 local (lib/bm25.py), sin Postgres.
+
+Construye el índice sobre los párrafos de los .txt del corpus (repetidos
+hasta --chunks si hace falta), lo guarda y lo vuelve a cargar, y mide la
+latencia de consultas típicas.
+
+Uso:
+    python scripts/benchmark_bm25.py --chunks 50000 --queries 200
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+
+# Agregar el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.bm25 import BM25Index
+
+QUERIES = [
+    'derecho a la propiedad',
+    'pensión alimenticia de los hijos',
+    'requisitos para el matrimonio',
+    'plazo para interponer el recurso de apelación',
+    'obligaciones del arrendatario',
+    'divorcio incausado',
+    'prescripción de la acción',
+    'testamento ológrafo',
+]
+
+
+def corpus_rows(documents_dir: str, count: int):
+    paragraphs = []
+    for name in sorted(os.listdir(documents_dir)):
+        if name.endswith('.txt'):
+            with open(os.path.join(documents_dir, name), encoding='utf-8', errors='replace') as f:
+                paragraphs.extend(p.strip() for p in f.read().split('\n\n') if p.strip())
+    if not paragraphs:
+        raise SystemExit(f"❌ No hay archivos .txt en {documents_dir}")
+    count = count or len(paragraphs)
+    return [
+        {'chunk_id': f'chunk-{i}', 'chunk_text': paragraphs[i % len(paragraphs)], 'char_count': 0}
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del motor BM25 local')
+    parser.add_argument('--chunks', type=int, default=0, help='Chunks a indexar (por defecto, los párrafos del corpus)')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=30)
+    parser.add_argument('--documents-dir', default='documents')
+    args = parser.parse_args()
+
+    rows = corpus_rows(args.documents_dir, args.chunks)
+    print(f"📊 Benchmark BM25: {len(rows)} chunks, {args.queries} consultas, top-{args.limit}")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    index = BM25Index()
+    index.add(rows)
+    index.compact()
+    print(f"🔨 Construcción: {time.perf_counter() - start:.2f}s")
+
+    with tempfile.TemporaryDirectory() as path:
+        start = time.perf_counter()
+        index.save(path)
+        print(f"💾 Guardado: {time.perf_counter() - start:.2f}s "
+              f"({sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) / 1e6:.1f} MB)")
+        start = time.perf_counter()
+        index = BM25Index.load(path)
+        print(f"📂 Carga: {time.perf_counter() - start:.3f}s")
+
+    for match_all in (False, True):
+        latencies = []
+        for i in range(args.queries):
+            start = time.perf_counter()
+            index.search(QUERIES[i % len(QUERIES)], args.limit, match_all=match_all)
+            latencies.append(time.perf_counter() - start)
+        ordered = sorted(latencies)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        label = 'todos los términos' if match_all else 'cualquier término'
+        print(f"🔍 {label:<20} mediana {statistics.median(latencies) * 1000:.2f} ms, "
+              f"p95 {p95 * 1000:.2f} ms, {len(latencies) / sum(latencies):.0f} consultas/s")
+
+
+if __name__ == "__main__":
+    main()
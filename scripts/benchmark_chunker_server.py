@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark de latencia de chonkie_chunker.py: un proceso por documento contra
+el worker persistente (--serve).
+
+Para el modo one-shot la latencia de cada documento incluye el arranque del
+intérprete, el import de chonkie y la carga del tokenizer. Para el worker se
+mide aparte el arranque (hasta la línea {"ready": true}) y luego la latencia
+de cada petición.
+
+Uso:
+    python scripts/benchmark_chunker_server.py --docs 20 --chars 20000
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+CHUNKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chonkie_chunker.py')
+
+
+def sample_documents(documents_dir: str, count: int, chars: int):
+    """Fragmentos de `chars` caracteres tomados de los .txt del corpus"""
+    corpus = ''
+    for name in sorted(os.listdir(documents_dir)):
+        if name.endswith('.txt'):
+            with open(os.path.join(documents_dir, name), encoding='utf-8', errors='replace') as f:
+                corpus += f.read()
+    if not corpus:
+        raise SystemExit(f"❌ No hay archivos .txt en {documents_dir}")
+    step = max(1, (len(corpus) - chars) // max(1, count))
+    return [corpus[i * step:i * step + chars] for i in range(count)]
+
+
+def summarize(latencies):
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return statistics.mean(latencies) * 1000, statistics.median(latencies) * 1000, p95 * 1000
+
+
+def run_oneshot(documents):
+    latencies = []
+    for text in documents:
+        start = time.perf_counter()
+        subprocess.run([sys.executable, CHUNKER], input=text, capture_output=True, text=True, check=True)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def run_server(documents, batch: int):
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, CHUNKER, '--serve'],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, encoding='utf-8'
+    )
+    ready = json.loads(process.stdout.readline())
+    startup = time.perf_counter() - start
+    if not ready.get('ready'):
+        raise RuntimeError(f'El worker no arrancó: {ready}')
+
+    latencies = []
+    try:
+        for i in range(0, len(documents), batch):
+            group = documents[i:i + batch]
+            start = time.perf_counter()
+            process.stdin.write(json.dumps({'id': i, 'documents': group}, ensure_ascii=False) + '\n')
+            process.stdin.flush()
+            response = json.loads(process.stdout.readline())
+            elapsed = time.perf_counter() - start
+            if 'error' in response:
+                raise RuntimeError(response['error'])
+            # Latencia por documento dentro del lote
+            latencies.extend([elapsed / len(group)] * len(group))
+    finally:
+        process.stdin.close()
+        process.wait()
+    return startup, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark one-shot vs worker persistente de chunking')
+    parser.add_argument('--docs', type=int, default=20)
+    parser.add_argument('--chars', type=int, default=20000, help='Caracteres por documento')
+    parser.add_argument('--batch', type=int, default=1, help='Documentos por petición al worker')
+    parser.add_argument('--documents-dir', default='documents')
+    args = parser.parse_args()
+
+    documents = sample_documents(args.documents_dir, args.docs, args.chars)
+
+    print(f"📊 Benchmark de chunking: {len(documents)} documentos de {args.chars} caracteres")
+    print("=" * 78)
+    print(f"{'Modo':<22} {'Arranque (ms)':<15} {'Media (ms)':<12} {'Mediana (ms)':<14} {'p95 (ms)':<10}")
+    print("-" * 78)
+
+    start = time.perf_counter()
+    latencies = run_oneshot(documents)
+    total = time.perf_counter() - start
+    mean, median, p95 = summarize(latencies)
+    print(f"{'one-shot':<22} {'-':<15} {mean:<12.1f} {median:<14.1f} {p95:<10.1f}")
+    oneshot_total = total
+
+    start = time.perf_counter()
+    startup, latencies = run_server(documents, args.batch)
+    total = time.perf_counter() - start
+    mean, median, p95 = summarize(latencies)
+    print(f"{f'worker (lote {args.batch})':<22} {startup * 1000:<15.1f} {mean:<12.1f} {median:<14.1f} {p95:<10.1f}")
+
+    print("-" * 78)
+    print(f"Tiempo total: one-shot {oneshot_total:.2f}s, worker {total:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
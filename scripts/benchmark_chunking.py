@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Benchmark de chunkers: throughput y calidad de límites sobre documentos reales.
+
+Configuraciones:
+  - legacy-chars: ventana de 512 caracteres con solape de 50 (el chunking previo a Chonkie)
+  - loader: SentenceChunker con los parámetros de load_documents.py (lib/chunker_params.py)
+  - worker: SentenceChunker con DEFAULT_PARAMS de chonkie_chunker.py
+  - loader+structure: el chunking de la ingesta, artículo por artículo (lib/legal_structure.py)
+  - paragraphs: párrafos agrupados hasta 1500 caracteres, por artículo (lib/retrieval_eval.py)
+
+Para cada una se mide el tiempo de construcción del chunker, caracteres/s,
+tokens/s (si el chunker cuenta tokens) y el pico de RSS; cada configuración
+corre en un proceso nuevo para que los picos sean comparables. Calidad:
+  - cruza artículos: % de chunks con texto de dos o más artículos
+  - empieza a mitad de oración: % de chunks cuyo texto empieza en minúscula
+
+Para añadir un chunker nuevo basta con registrarlo en CHUNKERS.
+
+Uso:
+    python scripts/benchmark_chunking.py
+    python scripts/benchmark_chunking.py documents/CodigoFederalProcedimientoCiviles.doc.txt --configs loader,worker --output chunking.json
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+import argparse
+import resource
+import multiprocessing
+
+# Agregar el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.chunker_params import LOADER_CHUNKER_PARAMS
+from lib.legal_structure import iter_structured_chunks, match_article_heading, match_section_heading
+from lib.retrieval_eval import build_eval_chunks
+
+
+def legacy_chars(chunk_size: int = 512, overlap: int = 50):
+    def chunk(text):
+        chunks, start = [], 0
+        while start < len(text):
+            end = start + chunk_size
+            if end < len(text):
+                last_space = text.rfind(' ', start, end)
+                if last_space > start:
+                    end = last_space
+            piece = text[start:end].strip()
+            if piece:
+                chunks.append({'text': piece})
+            start = max(start + 1, end - overlap)
+        return chunks
+    return chunk
+
+
+def sentence_chunker(params):
+    from chonkie import SentenceChunker
+
+    chunker = SentenceChunker(**params)
+
+    def chunk(text):
+        return [{'text': c.text, 'token_count': c.token_count} for c in chunker.chunk(text)]
+    return chunk
+
+
+def worker_chunker():
+    # scripts/ está en sys.path al ejecutar este archivo
+    from chonkie_chunker import DEFAULT_PARAMS
+    return sentence_chunker(DEFAULT_PARAMS)
+
+
+def structured_chunker(params):
+    from chonkie import SentenceChunker
+
+    chunker = SentenceChunker(**params)
+
+    def chunk(text):
+        return [
+            {'text': item['text'], 'token_count': item.get('token_count')}
+            for kind, item in iter_structured_chunks([(1, text)], chunker.chunk)
+            if kind == 'chunk'
+        ]
+    return chunk
+
+
+def paragraphs_chunker(max_chars: int = 1500):
+    def chunk(text):
+        return [{'text': row['chunk_text']} for row in build_eval_chunks(text, 'benchmark', max_chars=max_chars)]
+    return chunk
+
+
+CHUNKERS = {
+    'legacy-chars': legacy_chars,
+    'loader': lambda: sentence_chunker(LOADER_CHUNKER_PARAMS),
+    'worker': worker_chunker,
+    'loader+structure': lambda: structured_chunker(LOADER_CHUNKER_PARAMS),
+    'paragraphs': paragraphs_chunker,
+}
+
+
+def boundary_quality(chunks):
+    """
+    Contar chunks que mezclan artículos y chunks que empiezan a mitad de
+    oración. El artículo "en curso" al empezar un chunk es el último
+    encabezado visto en los chunks anteriores (los chunks llegan en orden).
+    """
+    crossing = mid_sentence = 0
+    current = None
+    for chunk in chunks:
+        articles = set()
+        continuation = True
+        for line in chunk['text'].split('\n'):
+            line = line.strip()
+            if not line:
+                continue
+            article = match_article_heading(line)
+            if article is not None:
+                articles.add(article)
+                current = article
+                continuation = False
+            elif continuation and current is not None and not match_section_heading(line):
+                # Texto antes del primer encabezado: cola del artículo anterior
+                articles.add(('cola', current))
+                continuation = False
+        if len(articles) > 1:
+            crossing += 1
+        text = chunk['text'].lstrip()
+        if text and text[0].islower():
+            mid_sentence += 1
+    return crossing, mid_sentence
+
+
+def measure(config: str, files, results):
+    start = time.perf_counter()
+    chunk = CHUNKERS[config]()
+    construction = time.perf_counter() - start
+
+    chars = tokens = count = crossing = mid_sentence = 0
+    has_tokens = True
+    elapsed = 0.0
+    for file_path in files:
+        with open(file_path, encoding='utf-8', errors='replace') as f:
+            text = f.read()
+        start = time.perf_counter()
+        chunks = chunk(text)
+        elapsed += time.perf_counter() - start
+        chars += len(text)
+        count += len(chunks)
+        if any(c.get('token_count') is None for c in chunks):
+            has_tokens = False
+        else:
+            tokens += sum(c['token_count'] for c in chunks)
+        doc_crossing, doc_mid = boundary_quality(chunks)
+        crossing += doc_crossing
+        mid_sentence += doc_mid
+
+    results.put({
+        'construction_s': construction,
+        'chunking_s': elapsed,
+        'chars': chars,
+        'chunks': count,
+        'chars_per_s': chars / elapsed if elapsed else 0.0,
+        'tokens_per_s': tokens / elapsed if has_tokens and elapsed else None,
+        # ru_maxrss está en KB en Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'cross_article_pct': 100 * crossing / count if count else 0.0,
+        'mid_sentence_start_pct': 100 * mid_sentence / count if count else 0.0,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de chunkers (throughput y calidad de límites)')
+    parser.add_argument('files', nargs='*', help='Archivos de texto (por defecto, los .txt de documents/)')
+    parser.add_argument('--configs', default=','.join(CHUNKERS), help='Configuraciones separadas por coma')
+    parser.add_argument('--output', help='Guardar los resultados en JSON')
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob(os.path.join('documents', '*.txt')))
+    if not files:
+        raise SystemExit("❌ No hay documentos de texto para el benchmark")
+    configs = args.configs.split(',')
+    unknown = set(configs) - set(CHUNKERS)
+    if unknown:
+        raise SystemExit(f"❌ Configuraciones desconocidas: {', '.join(sorted(unknown))}")
+
+    context = multiprocessing.get_context('spawn')
+    report = {'files': files, 'configs': {}}
+
+    print(f"📊 Benchmark de chunking: {len(files)} documentos")
+    print("=" * 112)
+    print(f"{'Config':<18} {'Chunks':<8} {'Constr. (s)':<12} {'Chars/s':<11} {'Tokens/s':<10} "
+          f"{'Pico RSS (MB)':<14} {'Cruza art. %':<13} {'Mitad oración %':<15}")
+    print("-" * 112)
+    for config in configs:
+        results = context.Queue()
+        process = context.Process(target=measure, args=(config, files, results))
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            print(f"{config:<18} error (código {process.exitcode})")
+            report['configs'][config] = {'error': f'exit code {process.exitcode}'}
+            continue
+        stats = results.get()
+        report['configs'][config] = stats
+        tokens_per_s = f"{stats['tokens_per_s']:.0f}" if stats['tokens_per_s'] is not None else '-'
+        print(f"{config:<18} {stats['chunks']:<8} {stats['construction_s']:<12.3f} {stats['chars_per_s']:<11.0f} "
+              f"{tokens_per_s:<10} {stats['peak_rss_mb']:<14.1f} {stats['cross_article_pct']:<13.1f} "
+              f"{stats['mid_sentence_start_pct']:<15.1f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Resultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la limpieza de texto de la ingesta: MB/s y calidad.
+
+Modos:
+  - legacy: las tres pasadas de regex que usaba DocumentParser.clean_text
+  - fast: clean_text de lib/text_normalizer.py sobre el documento entero
+  - fast-pages: iter_clean_pages, página a página como llegan de un PDF
+
+El corpus son los .txt de documents/ (o los archivos indicados) repetidos
+hasta --size-mb. Con --pdf-like el texto se reparte además en líneas de
+ancho fijo con palabras cortadas con guion, ligaduras y páginas, como lo
+devuelve PyPDF2. Calidad:
+  - saltos: '\\n' que quedan en la salida (límites de párrafo para el chunker)
+  - palabras: % de las palabras del texto original que sobreviven enteras
+
+Uso:
+    python scripts/benchmark_clean_text.py --size-mb 8
+    python scripts/benchmark_clean_text.py --pdf-like --width 90 --runs 5
+"""
+
+import os
+import re
+import sys
+import glob
+import time
+import argparse
+from collections import Counter
+
+# Agregar el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.text_normalizer import clean_text, iter_clean_pages
+
+LIGATURES = {'fi': 'ﬁ', 'fl': 'ﬂ'}
+LINES_PER_PAGE = 50
+
+
+def legacy_clean_text(text: str) -> str:
+    """La implementación anterior de DocumentParser.clean_text"""
+    text = re.sub(r'[^\w\s\.\,\;\:\!\?\-\(\)\[\]\{\}\"\'\n]', ' ', text)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\n+', '\n', text)
+    return text.strip()
+
+
+def load_corpus(files, size_mb: float) -> str:
+    texts = []
+    for path in files:
+        with open(path, encoding='utf-8') as f:
+            texts.append(f.read())
+    corpus = '\n'.join(texts)
+    target = int(size_mb * 1e6)
+    return (corpus * (target // len(corpus) + 1))[:target]
+
+
+def pdf_like(text: str, width: int):
+    """
+    Páginas de líneas de `width` caracteres como las de un PDF: las
+    palabras largas que no caben se cortan con guion y 'fi'/'fl' pasan a
+    ligadura. Cada párrafo empieza en línea nueva.
+    """
+    lines = []
+    for paragraph in text.split('\n'):
+        line = ''
+        for word in paragraph.split():
+            for pair, ligature in LIGATURES.items():
+                word = word.replace(pair, ligature)
+            if len(line) + 1 + len(word) <= width:
+                line = f'{line} {word}' if line else word
+                continue
+            room = width - len(line) - 2
+            if len(word) >= 8 and room >= 3 and word[:room].isalpha():
+                lines.append(f'{line} {word[:room]}-')
+                word = word[room:]
+            elif line:
+                lines.append(line)
+            line = word
+        if line:
+            lines.append(line)
+    return [
+        (number, '\n'.join(lines[start:start + LINES_PER_PAGE]))
+        for number, start in enumerate(range(0, len(lines), LINES_PER_PAGE), start=1)
+    ]
+
+
+def word_recall(output: str, reference: Counter) -> float:
+    found = Counter(re.findall(r'\w+', output))
+    return sum((found & reference).values()) / max(1, sum(reference.values()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de la limpieza de texto')
+    parser.add_argument('files', nargs='*', help='Archivos de texto (por defecto documents/*.txt)')
+    parser.add_argument('--size-mb', type=float, default=8.0, help='Tamaño del corpus repetido')
+    parser.add_argument('--runs', type=int, default=3, help='Se reporta la mejor ejecución')
+    parser.add_argument('--pdf-like', action='store_true', help='Simular líneas, guiones, ligaduras y páginas de PDF')
+    parser.add_argument('--width', type=int, default=90, help='Ancho de línea con --pdf-like')
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob(os.path.join('documents', '*.txt')))
+    if not files:
+        raise SystemExit('❌ No hay archivos de texto')
+    text = load_corpus(files, args.size_mb)
+    reference = Counter(re.findall(r'\w+', clean_text(text)))
+    pages = pdf_like(text, args.width) if args.pdf_like else [(1, text)]
+    raw = '\n'.join(page for _, page in pages)
+
+    modes = {
+        'legacy': lambda: legacy_clean_text(raw),
+        'fast': lambda: clean_text(raw),
+        'fast-pages': lambda: ' '.join(page for _, page in iter_clean_pages(pages)),
+    }
+    mb = len(raw.encode('utf-8')) / 1e6
+
+    print(f"🧹 Limpieza de texto: {mb:.1f} MB, {len(pages)} páginas"
+          f"{f', líneas de {args.width} caracteres' if args.pdf_like else ''}, mejor de {args.runs}")
+    print("=" * 72)
+    print(f"{'Modo':<12} {'Segundos':<10} {'MB/s':<10} {'vs legacy':<11} {'Saltos':<10} {'Palabras':<10}")
+    print("-" * 72)
+    baseline = None
+    for name, run in modes.items():
+        best = float('inf')
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            output = run()
+            best = min(best, time.perf_counter() - start)
+        baseline = baseline or best
+        print(f"{name:<12} {best:<10.3f} {mb / best:<10.1f} {f'{baseline / best:.1f}x':<11} "
+              f"{output.count(chr(10)):<10} {word_recall(output, reference):<10.1%}")
+
+
+if __name__ == "__main__":
+    main()
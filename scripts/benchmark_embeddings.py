@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark offline del throughput de embeddings usando el backend falso local.
+
+Compara el patrón anterior de DocumentLoader (un texto por request, en serie)
+contra get_embeddings_batch con lotes y concurrencia bajo el mismo limitador.
+
+Uso:
+    python scripts/benchmark_embeddings.py --texts 500 --latency 0.2 --rpm 300
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# Agregar el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.embedding_batch import call_with_backoff
+from lib.fake_embeddings import FakeEmbeddingBackend, get_embeddings_batch
+from lib.rate_limiter import TokenBucketRateLimiter
+
+
+def sample_texts(count: int):
+    base = "Artículo {n}. Toda persona tiene derecho a la protección de la salud y a un medio ambiente sano para su desarrollo y bienestar."
+    return [base.format(n=i + 1) for i in range(count)]
+
+
+def run_legacy(texts, backend, limiter, sleep_between: float):
+    for text in texts:
+        limiter.acquire(len(text) // 4)
+        call_with_backoff(backend.embed_batch, [text], base_delay=0.05, max_delay=1.0)
+        if sleep_between:
+            time.sleep(sleep_between)
+
+
+def run_batched(texts, backend, limiter, batch_size: int, concurrency: int):
+    get_embeddings_batch(
+        texts,
+        batch_size=batch_size,
+        concurrency=concurrency,
+        limiter=limiter,
+        backend=backend
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de throughput de embeddings (offline)')
+    parser.add_argument('--texts', type=int, default=500, help='Número de textos a embeber')
+    parser.add_argument('--latency', type=float, default=0.2, help='Latencia simulada por request (s)')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Probabilidad de 429 por request')
+    parser.add_argument('--rpm', type=float, default=1500, help='Requests por minuto del limitador')
+    parser.add_argument('--tpm', type=float, default=1000000, help='Tokens por minuto del limitador')
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--legacy-sleep', type=float, default=0.0,
+                        help='Pausa fija tras cada texto en el modo anterior (era 1.5s)')
+    args = parser.parse_args()
+
+    texts = sample_texts(args.texts)
+
+    modes = [
+        ('legacy (1 texto/request)', lambda b, l: run_legacy(texts, b, l, args.legacy_sleep)),
+        (f'batch={args.batch_size} concurrency=1', lambda b, l: run_batched(texts, b, l, args.batch_size, 1)),
+        (f'batch={args.batch_size} concurrency={args.concurrency}',
+         lambda b, l: run_batched(texts, b, l, args.batch_size, args.concurrency)),
+    ]
+
+    print(f"📊 Benchmark de embeddings: {len(texts)} textos, latencia {args.latency}s, {args.rpm:.0f} RPM")
+    print("=" * 80)
+    print(f"{'Modo':<32} {'Tiempo (s)':<12} {'Textos/s':<12} {'Requests':<10} {'429s':<6}")
+    print("-" * 80)
+
+    for name, run in modes:
+        backend = FakeEmbeddingBackend(latency=args.latency, rate_limit_rate=args.rate_limit_rate)
+        limiter = TokenBucketRateLimiter(args.rpm, args.tpm)
+        start = time.perf_counter()
+        run(backend, limiter)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<32} {elapsed:<12.2f} {len(texts) / elapsed:<12.1f} {backend.requests:<10} {backend.rate_limited:<6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark de recuperación híbrida (lib/hybrid_retrieval.py): etapas en serie
+contra etapas concurrentes.
+
+Se indexan los párrafos de los .txt del corpus con el BM25 local y con el
+índice vectorial local (embeddings del backend falso). A cada etapa se le
+suma una latencia simulada de red para reproducir el coste de las RPC de
+Supabase y de la API de embeddings.
+
+Uso:
+    python scripts/benchmark_hybrid_retrieval.py --queries 20 --embed-latency 0.15 --search-latency 0.05
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+
+# Agregar el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.bm25 import BM25Index
+from lib.fake_embeddings import FakeEmbeddingBackend
+from lib.hybrid_retrieval import HybridRetriever, local_lexical_search, local_vector_search
+from lib.vector_index import VectorIndex
+
+QUERIES = [
+    'derecho a la propiedad',
+    'pensión alimenticia de los hijos',
+    'requisitos para el matrimonio',
+    'plazo para interponer el recurso de apelación',
+    'obligaciones del arrendatario',
+    'prescripción de la acción',
+]
+
+
+def with_latency(fn, latency: float):
+    def wrapped(*args):
+        time.sleep(latency)
+        return fn(*args)
+    return wrapped
+
+
+def corpus_rows(documents_dir: str, limit: int):
+    rows = []
+    for name in sorted(os.listdir(documents_dir)):
+        if name.endswith('.txt'):
+            with open(os.path.join(documents_dir, name), encoding='utf-8', errors='replace') as f:
+                for paragraph in f.read().split('\n\n'):
+                    if paragraph.strip():
+                        rows.append({'chunk_id': f'chunk-{len(rows)}', 'chunk_text': paragraph.strip()})
+    if not rows:
+        raise SystemExit(f"❌ No hay archivos .txt en {documents_dir}")
+    return rows[:limit] if limit else rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de recuperación híbrida')
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--chunks', type=int, default=5000)
+    parser.add_argument('--embed-latency', type=float, default=0.15, help='Latencia simulada del embedding (s)')
+    parser.add_argument('--search-latency', type=float, default=0.05, help='Latencia simulada de cada búsqueda (s)')
+    parser.add_argument('--fusion', default='rrf', choices=['rrf', 'score'])
+    parser.add_argument('--documents-dir', default='documents')
+    args = parser.parse_args()
+
+    rows = corpus_rows(args.documents_dir, args.chunks)
+    backend = FakeEmbeddingBackend()
+    bm25 = BM25Index()
+    bm25.add(rows)
+
+    with tempfile.TemporaryDirectory() as path:
+        vectors = VectorIndex(path, dimension=backend.dimension)
+        vectors.append([row['chunk_id'] for row in rows], backend.embed_batch([row['chunk_text'] for row in rows]))
+        retriever = HybridRetriever(
+            embed=with_latency(backend.embed_text, args.embed_latency),
+            lexical_search=with_latency(local_lexical_search(bm25), args.search_latency),
+            vector_search=with_latency(
+                local_vector_search(vectors, rows_by_id={row['chunk_id']: row for row in rows}),
+                args.search_latency
+            ),
+            fusion=args.fusion
+        )
+
+        print(f"📊 Recuperación híbrida: {len(rows)} chunks, {args.queries} consultas, fusión {args.fusion}")
+        print("=" * 78)
+        print(f"{'Modo':<14} {'Total (ms)':<12} {'Embedding':<11} {'Léxica':<10} {'Vectorial':<11} {'Fusión':<8}")
+        print("-" * 78)
+        for concurrent in (False, True):
+            runs = [retriever.retrieve(QUERIES[i % len(QUERIES)], 10, concurrent=concurrent)
+                    for i in range(args.queries)]
+
+            def mean_ms(stage):
+                return statistics.mean(run['timings'].get(stage, 0) for run in runs) * 1000
+
+            label = 'concurrente' if concurrent else 'en serie'
+            print(f"{label:<14} {mean_ms('total'):<12.1f} {mean_ms('embedding'):<11.1f} {mean_ms('lexical'):<10.1f} "
+                  f"{mean_ms('vector'):<11.1f} {mean_ms('fusion'):<8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la ingesta distribuida con la cola de trabajos (lib/job_queue.py).
+
+Reparte --documents documentos sintéticos (trozos de documents/*.txt) entre
+1, 2, 4... procesos worker que ejecutan DocumentLoader.load_from_queue sobre
+una misma base LocalSupabaseClient en un archivo, como lo harían varias
+máquinas contra Supabase. Los embeddings se simulan con la latencia de una
+API (--latency por request) y una cuota total de requests por minuto
+(--quota-rpm) que se reparte entre los workers: el throughput crece con los
+workers hasta que la cuota pasa a ser el límite.
+
+Para cada número de workers se reporta documentos/s, chunks/s, aceleración
+sobre 1 worker, requests de embeddings por minuto frente a la cuota y si
+cada documento quedó cargado exactamente una vez. Con --kill-after se mata
+un worker a mitad de la carga: su trabajo se reclama cuando vence el lease.
+Los workers de cada ejecución comparten un directorio de caché de embeddings,
+como varios workers --queue en una misma máquina.
+
+Uso:
+    python scripts/benchmark_job_queue.py --workers 1,2,4,8 --documents 64
+    python scripts/benchmark_job_queue.py --workers 4 --kill-after 2 --lease-seconds 3
+"""
+
+import os
+import sys
+import glob
+import time
+import signal
+import argparse
+import tempfile
+import contextlib
+import multiprocessing
+
+# Agregar el directorio raíz y scripts/ al path
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(SCRIPTS_DIR))
+sys.path.append(SCRIPTS_DIR)
+
+from lib.embedding_providers import HashingProvider, register_provider
+from lib.job_queue import JobQueue
+from lib.rate_limiter import TokenBucketRateLimiter
+from lib.supabase.local_client import LocalSupabaseClient
+
+# La carga no debe leer ni escribir estado local compartido entre ejecuciones;
+# la caché de embeddings sí se comparte entre los workers de una misma ejecución
+# (un directorio nuevo por ejecución, ver run), como en --queue con varios
+# procesos en una máquina
+BENCHMARK_ENV = {
+    'DEDUP_MODE': 'off',
+    'INGEST_MANIFEST_PATH': '',
+    'CORPUS_GENERATION_PATH': '',
+}
+
+
+class SimulatedApiProvider(HashingProvider):
+    """Feature hashing con la latencia de una API remota por request"""
+
+    name = 'simulated-api'
+
+    def __init__(self, latency: float = 0.0, batch_size: int = 100):
+        super().__init__()
+        self.backend.latency = latency
+        self.batch_size = batch_size
+
+
+def write_documents(directory: str, sources, count: int, doc_chars: int):
+    texts = []
+    for path in sources:
+        with open(path, encoding='utf-8') as f:
+            texts.append(f.read())
+    corpus = '\n'.join(texts)
+    paths = []
+    for i in range(count):
+        start = (i * doc_chars) % max(1, len(corpus) - doc_chars)
+        path = os.path.join(directory, f'doc-{i:04d}.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f'Documento {i}\n' + corpus[start:start + doc_chars])
+        paths.append(path)
+    return paths
+
+
+def run_worker(db_path: str, index: int, args, results):
+    from load_documents import DocumentLoader
+
+    register_provider('simulated-api', lambda: SimulatedApiProvider(args.latency, args.batch_size))
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        loader = DocumentLoader(supabase=LocalSupabaseClient(db_path), embedding_provider='simulated-api')
+        # Cada worker recibe su parte de la cuota total, como varias máquinas con la misma API key
+        limiter = loader.embedder.limiter = TokenBucketRateLimiter(args.quota_rpm / args.current_workers)
+        # Cubeta vacía al empezar: se mide el ritmo sostenido de la cuota, no la ráfaga del primer minuto
+        for _ in range(int(limiter.requests_per_minute)):
+            limiter.acquire()
+        queue = JobQueue(loader.supabase, worker_id=f'bench-{index}', lease_seconds=args.lease_seconds)
+        stats = loader.load_from_queue(queue, concurrency=args.concurrency, poll_interval=0.2)
+    stats['requests'] = loader.embedder.backend.requests
+    results.put(stats)
+
+
+def run(files, workers: int, args):
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, 'bench.sqlite3')
+        # Los procesos spawn heredan el entorno al arrancar
+        os.environ['EMBEDDING_CACHE_DIR'] = os.path.join(directory, 'embeddings')
+        client = LocalSupabaseClient(db_path)
+        JobQueue(client).enqueue(files)
+
+        args.current_workers = workers
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        processes = [context.Process(target=run_worker, args=(db_path, i, args, results)) for i in range(workers)]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        killed = 0
+        if args.kill_after and workers > 1:
+            time.sleep(args.kill_after)
+            os.kill(processes[0].pid, signal.SIGKILL)
+            killed = 1
+        stats = [results.get() for _ in range(workers - killed)]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+        conn = client.connection
+        documents = conn.execute('SELECT count(*), count(DISTINCT source) FROM documents').fetchone()
+        chunks = conn.execute('SELECT count(*) FROM chunks').fetchone()[0]
+        done = conn.execute("SELECT count(*) FROM ingest_jobs WHERE status = 'done'").fetchone()[0]
+        reclaimed = conn.execute('SELECT count(*) FROM ingest_jobs WHERE attempts > 1').fetchone()[0]
+    return {
+        'seconds': elapsed,
+        'documents': documents[0],
+        'exactly_once': documents[0] == documents[1] == done == len(files),
+        'chunks': chunks,
+        'requests': sum(s['requests'] for s in stats),
+        'reclaimed': reclaimed,
+        'lost': sum(s['lost'] for s in stats),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de la ingesta con cola de trabajos y varios workers')
+    parser.add_argument('files', nargs='*', help='Textos fuente (por defecto documents/*.txt)')
+    parser.add_argument('--workers', default='1,2,4,8', help='Números de workers separados por coma')
+    parser.add_argument('--documents', type=int, default=48)
+    parser.add_argument('--doc-chars', type=int, default=40000, help='Caracteres por documento')
+    parser.add_argument('--concurrency', type=int, default=1, help='Hilos por worker')
+    parser.add_argument('--latency', type=float, default=0.3, help='Segundos por request de embeddings')
+    parser.add_argument('--batch-size', type=int, default=50, help='Textos por request de embeddings')
+    parser.add_argument('--quota-rpm', type=float, default=1200, help='Cuota total de requests de embeddings por minuto')
+    parser.add_argument('--lease-seconds', type=float, default=5.0)
+    parser.add_argument('--kill-after', type=float, help='Matar un worker tras estos segundos (con 2 o más workers)')
+    args = parser.parse_args()
+
+    sources = args.files or sorted(glob.glob(os.path.join('documents', '*.txt')))
+    if not sources:
+        raise SystemExit('❌ No hay archivos de texto')
+    os.environ.update(BENCHMARK_ENV)
+
+    with tempfile.TemporaryDirectory() as directory:
+        files = write_documents(directory, sources, args.documents, args.doc_chars)
+        print(f"🏭 Cola de ingesta: {len(files)} documentos de {args.doc_chars} caracteres, "
+              f"{args.latency:.2f}s por request, cuota {args.quota_rpm:.0f} requests/min")
+        print("=" * 96)
+        print(f"{'Workers':<9} {'Segundos':<10} {'Docs/s':<9} {'Chunks/s':<10} {'Aceler.':<9} "
+              f"{'Req/min':<9} {'% cuota':<9} {'Reclam.':<9} {'Exactamente 1 vez'}")
+        print("-" * 96)
+        baseline = None
+        for workers in [int(w) for w in args.workers.split(',')]:
+            result = run(files, workers, args)
+            rate = result['documents'] / result['seconds']
+            baseline = baseline or rate
+            rpm = result['requests'] / result['seconds'] * 60
+            print(f"{workers:<9} {result['seconds']:<10.2f} {rate:<9.2f} {result['chunks'] / result['seconds']:<10.1f} "
+                  f"{f'{rate / baseline:.2f}x':<9} {rpm:<9.0f} {rpm / args.quota_rpm:<9.0%} {result['reclaimed']:<9} "
+                  f"{'✅' if result['exactly_once'] else '❌'} ({result['documents']} documentos, {result['chunks']} chunks)")
+
+
+if __name__ == "__main__":
+    main()
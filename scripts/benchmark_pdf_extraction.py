@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark de extracción de PDF: páginas/s y pico de RSS por modo.
+
+Modos:
+  - legacy: concatenar todo el texto con `text += page.extract_text()`
+  - stream: iter_pdf_pages, página a página sin acumular texto
+  - stream+chunks: iter_page_chunks con SentenceChunker (solo si chonkie está instalado)
+
+Cada modo corre en un proceso nuevo para que el pico de RSS sea comparable.
+Con --pages se genera un PDF sintético de N páginas repitiendo las del
+original, para medir documentos de 1000+ páginas.
+
+Uso:
+    python scripts/benchmark_pdf_extraction.py documents/codigo-civil-para-el-distrito-federal.pdf --pages 2000
+"""
+
+import os
+import sys
+import time
+import resource
+import argparse
+import tempfile
+import multiprocessing
+
+# Agregar el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.pdf_stream import iter_page_chunks, iter_pdf_pages
+
+
+def build_synthetic_pdf(source: str, pages: int) -> str:
+    """PDF temporal con `pages` páginas, repitiendo las del original"""
+    import PyPDF2
+
+    reader = PyPDF2.PdfReader(source)
+    writer = PyPDF2.PdfWriter()
+    for i in range(pages):
+        writer.add_page(reader.pages[i % len(reader.pages)])
+    handle, path = tempfile.mkstemp(suffix='.pdf')
+    with os.fdopen(handle, 'wb') as f:
+        writer.write(f)
+    return path
+
+
+def run_legacy(file_path: str):
+    import PyPDF2
+
+    text = ""
+    pages = 0
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        for page in pdf_reader.pages:
+            text += page.extract_text() + "\n"
+            pages += 1
+    return pages, 0
+
+
+def run_stream(file_path: str):
+    pages = 0
+    for _ in iter_pdf_pages(file_path):
+        pages += 1
+    return pages, 0
+
+
+def run_stream_chunks(file_path: str):
+    from chonkie import SentenceChunker
+
+    chunker = SentenceChunker(tokenizer_or_token_counter="gpt2", chunk_size=512, chunk_overlap=50)
+    pages = 0
+
+    def counted():
+        nonlocal pages
+        for page in iter_pdf_pages(file_path):
+            pages += 1
+            yield page
+
+    chunks = sum(1 for _ in iter_page_chunks(counted(), chunker.chunk))
+    return pages, chunks
+
+
+MODES = {
+    'legacy': run_legacy,
+    'stream': run_stream,
+    'stream+chunks': run_stream_chunks,
+}
+
+
+def measure(mode: str, file_path: str, results):
+    start = time.perf_counter()
+    pages, chunks = MODES[mode](file_path)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss está en KB en Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    results.put((pages, chunks, elapsed, peak_mb))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de extracción de PDF')
+    parser.add_argument('pdf', nargs='?', default='documents/constitucion-politica-de-la-ciudad-de-mexico.pdf')
+    parser.add_argument('--pages', type=int, default=0, help='Generar un PDF sintético con N páginas')
+    parser.add_argument('--modes', default=','.join(MODES), help='Modos a medir, separados por coma')
+    args = parser.parse_args()
+
+    file_path = build_synthetic_pdf(args.pdf, args.pages) if args.pages else args.pdf
+    context = multiprocessing.get_context('spawn')
+
+    print(f"📊 Benchmark de extracción: {file_path}")
+    print("=" * 72)
+    print(f"{'Modo':<16} {'Páginas':<9} {'Chunks':<8} {'Tiempo (s)':<12} {'Páginas/s':<12} {'Pico RSS (MB)':<14}")
+    print("-" * 72)
+
+    try:
+        for mode in args.modes.split(','):
+            results = context.Queue()
+            process = context.Process(target=measure, args=(mode, file_path, results))
+            process.start()
+            process.join()
+            if process.exitcode != 0:
+                print(f"{mode:<16} error (código {process.exitcode})")
+                continue
+            pages, chunks, elapsed, peak_mb = results.get()
+            print(f"{mode:<16} {pages:<9} {chunks:<8} {elapsed:<12.2f} {pages / elapsed:<12.1f} {peak_mb:<14.1f}")
+    finally:
+        if args.pages:
+            os.remove(file_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark de embeddings cuantizados (lib/quantized_index.py): memoria,
+latencia y recall frente a la búsqueda exacta en float32.
+
+El corpus son los chunks de los .txt de documents/ (chunking por artículo y
+párrafo, como eval_retrieval.py) con embeddings del backend falso, o los de
+un índice ya exportado con --index. Los vectores del backend falso son
+dispersos (feature hashing), lo que perjudica mucho a la cuantización
+binaria; --synthetic N usa en cambio N vectores densos con clusters, más
+parecidos a los embeddings reales de Gemini. Las consultas son las del gold set más
+textos de chunks al azar. Para cada modo (int8, binary) se mide el recall@k
+de la primera pasada sola y con re-puntuación en float32, para varios
+factores de re-puntuación.
+
+Uso:
+    python scripts/benchmark_quantization.py --rescore 1,2,4,10,20
+    python scripts/benchmark_quantization.py --index .cache/vector_index
+    python scripts/benchmark_quantization.py --synthetic 100000
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+
+# Agregar el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.fake_embeddings import FakeEmbeddingBackend
+from lib.quantized_index import QUANTIZATION_MODES, QuantizedIndex
+from lib.retrieval_eval import build_eval_chunks
+from lib.vector_index import VectorIndex
+
+GOLD = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gold', 'constitucion_articulos.json')
+
+
+def build_corpus_index(path: str, backend, documents_dir: str):
+    rows = []
+    for file_path in sorted(glob.glob(os.path.join(documents_dir, '*.txt'))):
+        with open(file_path, encoding='utf-8', errors='replace') as f:
+            rows.extend(build_eval_chunks(f.read(), os.path.basename(file_path)))
+    index = VectorIndex(path, dimension=backend.dimension)
+    index.append([row['chunk_id'] for row in rows], backend.embed_batch([row['chunk_text'] for row in rows]))
+    return index, [row['chunk_text'] for row in rows]
+
+
+def recall(found, truth):
+    return np.mean([len({c for c, _ in f} & t) / len(t) for f, t in zip(found, truth)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de cuantización int8/binaria')
+    parser.add_argument('--index', help='Directorio de un VectorIndex existente (por defecto, el corpus de documents/)')
+    parser.add_argument('--synthetic', type=int, default=0, help='Usar N vectores densos sintéticos con clusters')
+    parser.add_argument('--documents-dir', default='documents')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--rescore', default='1,2,4,10,20', help='Factores de re-puntuación a medir')
+    args = parser.parse_args()
+
+    backend = FakeEmbeddingBackend()
+    workdir = tempfile.mkdtemp()
+    try:
+        if args.synthetic:
+            rng = np.random.default_rng(7)
+            centers = rng.standard_normal((256, backend.dimension), dtype=np.float32)
+
+            def clustered(count):
+                noise = 0.6 * rng.standard_normal((count, backend.dimension), dtype=np.float32)
+                return centers[rng.integers(0, len(centers), count)] + noise
+
+            exact = VectorIndex(workdir, dimension=backend.dimension)
+            for start in range(0, args.synthetic, 10000):
+                count = min(10000, args.synthetic - start)
+                exact.append([str(start + i) for i in range(count)], clustered(count))
+            queries = clustered(args.queries)
+        elif args.index:
+            # Los códigos se escriben junto a los vectores: trabajar sobre una copia
+            shutil.copytree(args.index, workdir, dirs_exist_ok=True)
+            exact = VectorIndex(workdir, dimension=backend.dimension)
+            rng = np.random.default_rng(0)
+            queries = np.asarray(exact.matrix[rng.choice(len(exact), min(args.queries, len(exact)), replace=False)])
+        else:
+            exact, texts = build_corpus_index(workdir, backend, args.documents_dir)
+            with open(GOLD, encoding='utf-8') as f:
+                query_texts = [item['query'] for item in json.load(f)['queries']]
+            rng = np.random.default_rng(0)
+            query_texts += [texts[i][:200] for i in rng.choice(len(texts), max(0, args.queries - len(query_texts)), replace=False)]
+            queries = np.asarray(backend.embed_batch(query_texts[:args.queries]), dtype=np.float32)
+
+        truth = [{c for c, _ in result} for result in exact.search_batch(queries, args.k)]
+        float_bytes = len(exact) * exact.dimension * 4
+
+        start = time.perf_counter()
+        for query in queries:
+            exact.search(query, args.k)
+        exact_ms = (time.perf_counter() - start) / len(queries) * 1000
+
+        print(f"📊 Cuantización: {len(exact)} vectores de {exact.dimension} dimensiones, "
+              f"{len(queries)} consultas, top-{args.k}")
+        print("=" * 78)
+        print(f"{'Modo':<10} {'Re-puntuación':<15} {'Memoria (MB)':<14} {'Reducción':<11} {'Recall@k':<10} {'Latencia (ms)':<14}")
+        print("-" * 78)
+        print(f"{'float32':<10} {'-':<15} {float_bytes / 1e6:<14.1f} {'1x':<11} {1.0:<10.3f} {exact_ms:<14.2f}")
+
+        for mode in QUANTIZATION_MODES:
+            index = QuantizedIndex(workdir, mode=mode, dimension=exact.dimension)
+            memory = index.code_bytes()
+            reduction = f'{float_bytes / memory:.0f}x'
+            found = index.search_batch(queries, args.k, rescore=False)
+            print(f"{mode:<10} {'sin':<15} {memory / 1e6:<14.1f} {reduction:<11} {recall(found, truth):<10.3f} {'-':<14}")
+            for factor in (int(f) for f in args.rescore.split(',')):
+                index.rescore_factor = factor
+                start = time.perf_counter()
+                found = [index.search(query, args.k) for query in queries]
+                latency = (time.perf_counter() - start) / len(queries) * 1000
+                print(f"{mode:<10} {f'{factor}x k':<15} {memory / 1e6:<14.1f} {reduction:<11} "
+                      f"{recall(found, truth):<10.3f} {latency:<14.2f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la caché de consultas (lib/query_cache.py): tasa de aciertos,
+latencia y calidad de los aciertos semánticos.
+
+Se reproduce un tráfico de chat sobre las consultas del gold set: cada
+petición elige una consulta con distribución Zipf (unas pocas preguntas se
+repiten mucho) y una variante de redacción (mayúsculas, sin acentos, signos
+de interrogación, muletillas al inicio o al final). El retriever es el
+híbrido local de benchmark_hybrid_retrieval.py con latencia de red simulada.
+
+Para cada acierto semántico se compara su top-k con el de una recuperación
+sin caché: el solape indica si el umbral es demasiado permisivo. Con
+--invalidate-every se marca el corpus como cambiado cada N peticiones.
+
+Uso:
+    python scripts/benchmark_query_cache.py --requests 500 --threshold 0.9
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+# Agregar el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark_hybrid_retrieval import corpus_rows, with_latency
+from lib.bm25 import BM25Index
+from lib.fake_embeddings import FakeEmbeddingBackend
+from lib.hybrid_retrieval import HybridRetriever, local_lexical_search, local_vector_search
+from lib.query_cache import CachedRetriever, QueryCache, bump_corpus_generation
+from lib.vector_index import VectorIndex
+
+GOLD = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gold', 'constitucion_articulos.json')
+
+VARIANTS = [
+    lambda q: q,
+    lambda q: q.upper(),
+    lambda q: q.replace('á', 'a').replace('é', 'e').replace('í', 'i').replace('ó', 'o').replace('ú', 'u'),
+    lambda q: f'¿{q}?',
+    lambda q: f'oye, {q}',
+    lambda q: f'{q} por favor',
+    lambda q: f'qué dice la constitución sobre {q}',
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de la caché de consultas')
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--threshold', type=float, default=0.9, help='Coseno mínimo del nivel semántico')
+    parser.add_argument('--max-entries', type=int, default=1000)
+    parser.add_argument('--zipf', type=float, default=1.2, help='Exponente de la distribución de consultas')
+    parser.add_argument('--invalidate-every', type=int, default=0, help='Cambiar el corpus cada N peticiones')
+    parser.add_argument('--embed-latency', type=float, default=0.15, help='Latencia simulada del embedding (s)')
+    parser.add_argument('--search-latency', type=float, default=0.05, help='Latencia simulada de cada búsqueda (s)')
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--chunks', type=int, default=5000)
+    parser.add_argument('--documents-dir', default='documents')
+    args = parser.parse_args()
+
+    with open(GOLD, encoding='utf-8') as f:
+        queries = [item['query'] for item in json.load(f)['queries']]
+    rows = corpus_rows(args.documents_dir, args.chunks)
+    rows_by_id = {row['chunk_id']: row for row in rows}
+    backend = FakeEmbeddingBackend()
+    bm25 = BM25Index()
+    bm25.add(rows)
+
+    with tempfile.TemporaryDirectory() as path:
+        vectors = VectorIndex(os.path.join(path, 'vectors'), dimension=backend.dimension)
+        vectors.append([row['chunk_id'] for row in rows], backend.embed_batch([row['chunk_text'] for row in rows]))
+        uncached = HybridRetriever(
+            embed=backend.embed_text,
+            lexical_search=local_lexical_search(bm25),
+            vector_search=local_vector_search(vectors, rows_by_id=rows_by_id)
+        )
+        retriever = HybridRetriever(
+            embed=with_latency(backend.embed_text, args.embed_latency),
+            lexical_search=with_latency(local_lexical_search(bm25), args.search_latency),
+            vector_search=with_latency(local_vector_search(vectors, rows_by_id=rows_by_id), args.search_latency)
+        )
+        generation_path = os.path.join(path, 'corpus_generation')
+        cache = QueryCache(threshold=args.threshold, max_entries=args.max_entries, generation_path=generation_path)
+        cached = CachedRetriever(retriever, cache)
+
+        rng = np.random.default_rng(0)
+        weights = 1.0 / np.arange(1, len(queries) + 1) ** args.zipf
+        picks = rng.choice(len(queries), args.requests, p=weights / weights.sum())
+        variants = rng.integers(0, len(VARIANTS), args.requests)
+
+        overlaps = []
+        elapsed = 0.0
+        for i, (pick, variant) in enumerate(zip(picks, variants)):
+            if args.invalidate_every and i and i % args.invalidate_every == 0:
+                bump_corpus_generation(generation_path)
+            query = VARIANTS[variant](queries[pick])
+            start = time.perf_counter()
+            result = cached.retrieve(query, args.k)
+            elapsed += time.perf_counter() - start
+            if result['cache'] == 'semantic':
+                fresh = {row['chunk_id'] for row in uncached.retrieve(query, args.k)['results']}
+                found = {row['chunk_id'] for row in result['results']}
+                overlaps.append(len(found & fresh) / max(1, len(fresh)))
+
+    metrics = cache.metrics()
+    print(f"📊 Caché de consultas: {args.requests} peticiones sobre {len(queries)} consultas, "
+          f"umbral {args.threshold}, {len(rows)} chunks")
+    print("=" * 60)
+    print(f"{'Resultado':<12} {'Peticiones':<12} {'%':<8} {'p50 (ms)':<10} {'p95 (ms)':<10}")
+    print("-" * 60)
+    for outcome in ('exact', 'semantic', 'miss'):
+        latency = metrics['latency'].get(outcome, {'p50_ms': 0.0, 'p95_ms': 0.0})
+        print(f"{outcome:<12} {metrics[outcome]:<12} {100 * metrics[outcome] / metrics['requests']:<8.1f} "
+              f"{latency['p50_ms']:<10.2f} {latency['p95_ms']:<10.2f}")
+    print("-" * 60)
+    print(f"Tasa de aciertos: {metrics['hit_rate']:.1%} (exactos {metrics['exact_hit_rate']:.1%}, "
+          f"semánticos {metrics['semantic_hit_rate']:.1%})")
+    print(f"Tiempo medio por petición: {elapsed / args.requests * 1000:.1f} ms")
+    print(f"Entradas: {metrics['entries']}, desalojos: {metrics['evictions']}, "
+          f"caducadas: {metrics['expirations']}, invalidaciones: {metrics['invalidations']}")
+    if overlaps:
+        print(f"Solape top-{args.k} de los aciertos semánticos con la recuperación sin caché: {np.mean(overlaps):.1%}")
+
+
+if __name__ == "__main__":
+    main()
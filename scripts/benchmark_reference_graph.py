@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la expansión por referencias entre artículos (lib/reference_graph.py).
+
+Chunkea la Constitución de documents/ como scripts/eval_retrieval.py, construye
+el grafo de referencias desde esos chunks y ejecuta el gold set con la
+recuperación híbrida local (BM25 + índice vectorial con embeddings falsos)
+en tres variantes:
+  - hybrid@k: los k primeros resultados
+  - hybrid@k+E: los k+E primeros (mismo número de chunks que la expansión)
+  - hybrid@k + refs: los k primeros y hasta E chunks de los artículos que citan
+
+Reporta recall de artículos gold, tiempo de construcción y tamaño del grafo,
+y la latencia de la etapa de expansión.
+
+Uso:
+    python scripts/benchmark_reference_graph.py --k 5 --expand-limit 5 --fan-out 3
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+
+# Agregar el directorio raíz y scripts/ al path
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(SCRIPTS_DIR))
+sys.path.append(SCRIPTS_DIR)
+
+from lib.bm25 import build_from_supabase
+from lib.fake_embeddings import FakeEmbeddingBackend
+from lib.hybrid_retrieval import HybridRetriever, local_lexical_search, local_vector_search
+from lib.legal_structure import iter_structure
+from lib.reference_graph import CrossReferenceGraph, build_article_rows, reference_expansion
+from lib.retrieval_eval import build_eval_chunks, load_gold
+from lib.supabase.local_client import LocalSupabaseClient
+from lib.vector_index import export_embeddings
+from eval_retrieval import load_corpus
+
+DEFAULT_GOLD = os.path.join(SCRIPTS_DIR, 'gold', 'constitucion_articulos.json')
+
+
+def structure_rows(text, rows):
+    """
+    Secciones del texto y chunks con su section_id, como los escribe el loader
+    (con una sección raíz): build_eval_chunks no los lleva, y sin ellos los
+    transitorios de todos los decretos serían un solo artículo.
+    """
+    sections = [{'section_id': 'raiz', 'section_type': 'main', 'parent_section_id': None}]
+    unit_sections = []
+    for kind, item in iter_structure([(1, text)]):
+        if kind == 'section':
+            sections.append({'section_id': item['key'], 'section_type': item['section_type'],
+                             'parent_section_id': item['parent_key'] or 'raiz'})
+        else:
+            unit_sections.append(item.section_key or 'raiz')
+    # build_eval_chunks numera chunk_order desde 0 en cada unidad
+    units = iter(unit_sections)
+    section_id = None
+    chunks = []
+    for row in rows:
+        if row['chunk_order'] == 0:
+            section_id = next(units)
+        chunks.append(dict(row, section_id=section_id))
+    return sections, chunks
+
+
+def recall(rows, gold, article_of):
+    return len(gold & {article_of.get(str(row['chunk_id'])) for row in rows}) / len(gold)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del grafo de referencias entre artículos')
+    parser.add_argument('--gold', default=DEFAULT_GOLD)
+    parser.add_argument('--documents-dir', default='documents')
+    parser.add_argument('--max-chars', type=int, default=1500)
+    parser.add_argument('--k', type=int, default=5, help='Resultados de la recuperación híbrida')
+    parser.add_argument('--expand-limit', type=int, default=5, help='Chunks citados añadidos como máximo')
+    parser.add_argument('--fan-out', type=int, default=3, help='Artículos citados que se siguen por resultado')
+    parser.add_argument('--chunks-per-article', type=int, default=2)
+    args = parser.parse_args()
+
+    gold = load_gold(args.gold)
+    with open(os.path.join(args.documents_dir, gold['document']), encoding='utf-8') as f:
+        text = f.read()
+    rows = build_eval_chunks(text, gold['document'], max_chars=args.max_chars)
+    article_of = {row['chunk_id']: row['article_number'] for row in rows}
+    rows_by_id = {row['chunk_id']: row for row in rows}
+
+    start = time.perf_counter()
+    sections, chunks = structure_rows(text, rows)
+    article_rows = build_article_rows(gold['document'], chunks, sections)
+    extract_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    graph = CrossReferenceGraph.from_rows(article_rows)
+    build_seconds = time.perf_counter() - start
+    print(f"🔗 {gold['document']}: {len(rows)} chunks, {len(graph)} artículos, {graph.edges} referencias")
+    print(f"   extracción {extract_seconds * 1000:.1f} ms, grafo {build_seconds * 1000:.1f} ms, "
+          f"arreglos de adyacencia {graph.nbytes / 1024:.1f} KB")
+
+    backend = FakeEmbeddingBackend()
+    client = LocalSupabaseClient()
+    load_corpus(client, rows, backend)
+    with tempfile.TemporaryDirectory() as path:
+        vector_index = export_embeddings(client, path, dimension=backend.dimension)
+        lexical = local_lexical_search(build_from_supabase(client))
+        vector = local_vector_search(vector_index, rows_by_id=rows_by_id)
+        expand = reference_expansion(graph, rows_by_id=rows_by_id, fan_out=args.fan_out,
+                                     chunks_per_article=args.chunks_per_article)
+        plain = HybridRetriever(backend.embed_text, lexical, vector)
+        expanded = HybridRetriever(backend.embed_text, lexical, vector, expand=expand, expand_limit=args.expand_limit)
+
+        recalls = {'base': [], 'wider': [], 'refs': []}
+        latencies, added = [], []
+        for item in gold['queries']:
+            articles = set(item['articles'])
+            recalls['base'].append(recall(plain.retrieve(item['query'], args.k)['results'], articles, article_of))
+            recalls['wider'].append(recall(plain.retrieve(item['query'], args.k + args.expand_limit)['results'], articles, article_of))
+            result = expanded.retrieve(item['query'], args.k)
+            recalls['refs'].append(recall(result['results'], articles, article_of))
+            latencies.append(result['timings'].get('expansion', 0.0))
+            added.append(len(result['expanded']))
+
+    k, e = args.k, args.expand_limit
+    print("=" * 64)
+    print(f"{'Variante':<22} {'Chunks':<10} {'Recall':<10}")
+    print("-" * 64)
+    print(f"{f'hybrid@{k}':<22} {k:<10} {statistics.mean(recalls['base']):<10.3f}")
+    print(f"{f'hybrid@{k + e}':<22} {k + e:<10} {statistics.mean(recalls['wider']):<10.3f}")
+    print(f"{f'hybrid@{k} + refs':<22} {f'{k}+{statistics.mean(added):.1f}':<10} {statistics.mean(recalls['refs']):<10.3f}")
+    latencies_us = sorted(latency * 1e6 for latency in latencies)
+    print(f"\n⏱️  Expansión: p50 {statistics.median(latencies_us):.0f} µs, "
+          f"p95 {latencies_us[int(len(latencies_us) * 0.95) - 1]:.0f} µs (incluye el paso por el hilo de asyncio)")
+
+
+if __name__ == "__main__":
+    main()
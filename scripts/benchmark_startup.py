@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark de arranque: tiempo de importación de los módulos de embeddings y
+de los CLIs, en procesos nuevos y sin red.
+
+Cada objetivo corre --runs veces en un intérprete nuevo, sin GOOGLE_API_KEY
+ni EMBEDDING_PROVIDER, así que también comprueba que importar no exige
+credenciales. Se reporta la mediana y el mínimo del tiempo de pared, el
+tiempo sobre un intérprete vacío y, con -X importtime, los paquetes que más
+tardan en importarse (tiempo propio de todos sus submódulos).
+
+Uso:
+    python scripts/benchmark_startup.py --runs 5 --top 8
+"""
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = {
+    'python': ['-c', 'pass'],
+    'lib.gemini': ['-c', 'import lib.gemini'],
+    'lib.embedding_providers': ['-c', 'import lib.embedding_providers'],
+    'hashing: 1er embedding': ['-c', "from lib.embedding_providers import get_provider; get_provider('hashing').get_embeddings('hola')"],
+    'load_documents --help': [os.path.join('scripts', 'load_documents.py'), '--help'],
+    'eval_retrieval --help': [os.path.join('scripts', 'eval_retrieval.py'), '--help'],
+}
+
+
+def offline_env():
+    env = dict(os.environ)
+    for name in ('GOOGLE_API_KEY', 'EMBEDDING_PROVIDER'):
+        env.pop(name, None)
+    env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    return env
+
+
+def run(args, env, importtime: bool = False):
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + args
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+    return time.perf_counter() - start, result
+
+
+def slowest_imports(stderr: str, top: int):
+    """Paquetes por tiempo de importación propio (ms), sumando sus submódulos, según -X importtime"""
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        package = name.strip().split('.')[0]
+        packages[package] = packages.get(package, 0) + int(self_us) / 1000
+    return sorted(((ms, package) for package, ms in packages.items()), reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de tiempo de arranque e importación')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=5, help='Paquetes más lentos a mostrar por objetivo')
+    parser.add_argument('--targets', default=','.join(TARGETS), help='Objetivos separados por coma')
+    args = parser.parse_args()
+
+    targets = args.targets.split(',')
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        raise SystemExit(f"❌ Objetivos desconocidos: {', '.join(sorted(unknown))}")
+
+    env = offline_env()
+    baseline = min(run(TARGETS['python'], env)[0] for _ in range(args.runs))
+
+    print(f"🚀 Arranque en frío: {args.runs} ejecuciones por objetivo, sin GOOGLE_API_KEY")
+    print("=" * 84)
+    print(f"{'Objetivo':<26} {'Mediana (ms)':<14} {'Mínimo (ms)':<13} {'Sobre python (ms)':<19} {'Estado':<10}")
+    print("-" * 84)
+    slowest = {}
+    for name in targets:
+        times, status = [], 'ok'
+        for _ in range(args.runs):
+            elapsed, result = run(TARGETS[name], env)
+            times.append(elapsed)
+            if result.returncode != 0:
+                lines = result.stderr.strip().splitlines()
+                status = f"error: {lines[-1] if lines else result.returncode}"
+        print(f"{name:<26} {statistics.median(times) * 1000:<14.1f} {min(times) * 1000:<13.1f} "
+              f"{(min(times) - baseline) * 1000:<19.1f} {status}")
+        if args.top and name != 'python':
+            slowest[name] = slowest_imports(run(TARGETS[name], env, importtime=True)[1].stderr, args.top)
+
+    for name, modules in slowest.items():
+        print(f"\n📦 {name}: paquetes más lentos de importar")
+        for ms, module in modules:
+            print(f"   {ms:>8.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark del índice vectorial local (lib/vector_index.py): consultas/s y
+latencia top-k según el tamaño del corpus.
+
+Para cada tamaño se construye un índice en un directorio temporal con
+vectores aleatorios de 768 dimensiones (añadidos en lotes, como hace la
+exportación incremental) y se mide:
+  - una consulta a la vez: mediana y p95 de latencia
+  - consultas en lote (--batch): consultas/s con un solo recorrido de la matriz
+
+Uso:
+    python scripts/benchmark_vector_index.py --sizes 1000,10000,100000 --queries 200 --batch 32
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+
+import numpy as np
+
+# Agregar el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.vector_index import EMBEDDING_DIMENSION, VectorIndex
+
+
+def build_index(path: str, size: int, rng, append_batch: int = 10000) -> float:
+    start = time.perf_counter()
+    index = VectorIndex(path, dimension=EMBEDDING_DIMENSION)
+    for offset in range(0, size, append_batch):
+        count = min(append_batch, size - offset)
+        vectors = rng.standard_normal((count, EMBEDDING_DIMENSION), dtype=np.float32)
+        index.append([f'chunk-{offset + i}' for i in range(count)], vectors)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del índice vectorial local')
+    parser.add_argument('--sizes', default='1000,10000,100000', help='Tamaños de corpus, separados por coma')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--batch', type=int, default=32, help='Consultas por lote')
+    parser.add_argument('-k', type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    queries = rng.standard_normal((args.queries, EMBEDDING_DIMENSION), dtype=np.float32)
+
+    print(f"📊 Benchmark de índice vectorial: {args.queries} consultas, top-{args.k}")
+    print("=" * 84)
+    print(f"{'Corpus':<10} {'Carga (s)':<11} {'Mediana (ms)':<14} {'p95 (ms)':<10} "
+          f"{'Consultas/s':<13} {f'Lote {args.batch} (cons/s)':<20}")
+    print("-" * 84)
+
+    for size in (int(s) for s in args.sizes.split(',')):
+        with tempfile.TemporaryDirectory() as path:
+            build_time = build_index(path, size, rng)
+            # Reabrir: las búsquedas leen la matriz mapeada desde disco
+            index = VectorIndex(path, dimension=EMBEDDING_DIMENSION)
+            index.search(queries[0], args.k)
+
+            latencies = []
+            for query in queries:
+                start = time.perf_counter()
+                index.search(query, args.k)
+                latencies.append(time.perf_counter() - start)
+            ordered = sorted(latencies)
+            p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+            start = time.perf_counter()
+            for i in range(0, len(queries), args.batch):
+                index.search_batch(queries[i:i + args.batch], args.k)
+            batched = time.perf_counter() - start
+
+            print(f"{size:<10} {build_time:<11.2f} {statistics.median(latencies) * 1000:<14.2f} "
+                  f"{p95 * 1000:<10.2f} {len(queries) / sum(latencies):<13.1f} {len(queries) / batched:<20.1f}")
+
+
+if __name__ == "__main__":
+    main()
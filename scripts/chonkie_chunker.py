@@ -1,29 +1,163 @@
 #!/usr/bin/env python3
+"""
+Chunking con Chonkie.
+
+Sin argumentos lee un documento de stdin e imprime la lista de chunks en JSON.
+
+Con --serve queda como worker persistente que habla JSON-lines por
+stdin/stdout (o por un socket Unix con --socket), manteniendo los chunkers y
+el tokenizer cargados entre peticiones. Cada línea es una petición:
+
+    {"id": 1, "documents": ["texto 1", "texto 2"], "params": {"chunk_size": 256}}
+
+y cada respuesta, una línea:
+
+    {"id": 1, "chunks": [["chunk", ...], ["chunk", ...]]}
+
+Con "detail": true cada chunk es un objeto con text, start_index, end_index
+y token_count. Los errores se devuelven como {"id": ..., "error": "..."}.
+"""
+
+import os
 import sys
 import json
+import argparse
+import threading
+import socketserver
+from collections import OrderedDict
 from chonkie import SentenceChunker
 
+DEFAULT_PARAMS = {
+    'tokenizer_or_token_counter': 'gpt2',
+    'chunk_size': 512,
+    'chunk_overlap': 50,
+    'min_sentences_per_chunk': 2,
+    'min_characters_per_sentence': 10,
+    'delim': [
+        '.', '!', '?', '\n',
+        'PRIMERA.', 'SEGUNDA.', 'TERCERA.', 'CUARTA.', 'QUINTA.',
+        'SEXTA.', 'SÉPTIMA.', 'OCTAVA.', 'NOVENA.', 'DÉCIMA.',
+        'Artículo', 'ARTÍCULO', 'CAPÍTULO', 'Capítulo', 'SECCIÓN', 'Sección',
+        'TÍTULO', 'Título', 'LIBRO', 'Libro', 'PARTE', 'Parte',
+        'PRIMERO.', 'SEGUNDO.', 'TERCERO.', 'CUARTO.', 'QUINTO.',
+        'SEXTO.', 'SÉPTIMO.', 'OCTAVO.', 'NOVENO.', 'DÉCIMO.'
+    ]
+}
+
+# Chunkers distintos que se mantienen cargados a la vez (uno por combinación de parámetros)
+MAX_CHUNKERS = 8
+
+_chunkers = OrderedDict()
+_chunkers_lock = threading.Lock()
+# Los tokenizers no garantizan ser thread-safe: un chunk() a la vez
+_chunk_lock = threading.Lock()
+
+def get_chunker(params: dict = None) -> SentenceChunker:
+    """Chunker para `params` (sobre los valores por defecto), reutilizado entre peticiones"""
+    params = params or {}
+    unknown = set(params) - set(DEFAULT_PARAMS)
+    if unknown:
+        raise ValueError(f"Parámetros no soportados: {', '.join(sorted(unknown))}")
+    merged = dict(DEFAULT_PARAMS, **params)
+    key = json.dumps(merged, sort_keys=True)
+
+    with _chunkers_lock:
+        if key in _chunkers:
+            _chunkers.move_to_end(key)
+            return _chunkers[key]
+        chunker = SentenceChunker(**merged)
+        _chunkers[key] = chunker
+        if len(_chunkers) > MAX_CHUNKERS:
+            _chunkers.popitem(last=False)
+        return chunker
+
+def chunk_documents(documents, params: dict = None, detail: bool = False):
+    chunker = get_chunker(params)
+    results = []
+    for text in documents:
+        with _chunk_lock:
+            chunks = chunker.chunk(text)
+        if detail:
+            results.append([
+                {
+                    'text': chunk.text,
+                    'start_index': chunk.start_index,
+                    'end_index': chunk.end_index,
+                    'token_count': chunk.token_count
+                }
+                for chunk in chunks
+            ])
+        else:
+            results.append([chunk.text for chunk in chunks])
+    return results
+
+def handle_request(line: str) -> dict:
+    """Procesar una línea JSON de petición y devolver la respuesta"""
+    request_id = None
+    try:
+        request = json.loads(line)
+        request_id = request.get('id')
+        if 'documents' in request:
+            documents = request['documents']
+        elif 'text' in request:
+            documents = [request['text']]
+        else:
+            raise ValueError('La petición debe incluir "documents" o "text"')
+        chunks = chunk_documents(documents, request.get('params'), request.get('detail', False))
+        return {'id': request_id, 'chunks': chunks}
+    except Exception as e:
+        return {'id': request_id, 'error': str(e)}
+
+def serve_stdio():
+    # Cargar el chunker por defecto antes de anunciar que el worker está listo
+    get_chunker()
+    print(json.dumps({'ready': True}), flush=True)
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        print(json.dumps(handle_request(line), ensure_ascii=False), flush=True)
+
+class _ChunkerHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            response = handle_request(line.decode('utf-8'))
+            self.wfile.write((json.dumps(response, ensure_ascii=False) + '\n').encode('utf-8'))
+            self.wfile.flush()
+
+class _ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def serve_socket(path: str):
+    get_chunker()
+    if os.path.exists(path):
+        os.remove(path)
+    with _ThreadingUnixServer(path, _ChunkerHandler) as server:
+        print(json.dumps({'ready': True, 'socket': path}), flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(path)
+
 def main():
+    parser = argparse.ArgumentParser(description='Chunking de documentos legales con Chonkie')
+    parser.add_argument('--serve', action='store_true', help='Worker persistente JSON-lines')
+    parser.add_argument('--socket', help='Escuchar en un socket Unix en lugar de stdin/stdout')
+    args = parser.parse_args()
+
+    if args.socket:
+        serve_socket(args.socket)
+        return
+    if args.serve:
+        serve_stdio()
+        return
+
     text = sys.stdin.read()
-    chunker = SentenceChunker(
-        tokenizer_or_token_counter="gpt2",
-        chunk_size=512,
-        chunk_overlap=50,
-        min_sentences_per_chunk=2,
-        min_characters_per_sentence=10,
-        delim=[
-            '.', '!', '?', '\n', 
-            'PRIMERA.', 'SEGUNDA.', 'TERCERA.', 'CUARTA.', 'QUINTA.', 
-            'SEXTA.', 'SÉPTIMA.', 'OCTAVA.', 'NOVENA.', 'DÉCIMA.',
-            'Artículo', 'ARTÍCULO', 'CAPÍTULO', 'Capítulo', 'SECCIÓN', 'Sección',
-            'TÍTULO', 'Título', 'LIBRO', 'Libro', 'PARTE', 'Parte',
-            'PRIMERO.', 'SEGUNDO.', 'TERCERO.', 'CUARTO.', 'QUINTO.',
-            'SEXTO.', 'SÉPTIMO.', 'OCTAVO.', 'NOVENO.', 'DÉCIMO.'
-        ]
-    )
-    chunks = chunker.chunk(text)
-    out = [chunk.text for chunk in chunks]
+    out = chunk_documents([text])[0]
     print(json.dumps(out, ensure_ascii=False))
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Instantáneas columnares del corpus para reconstruir una base sin reingerir.
+
+`export` escribe documents, sections, chunks y embeddings en archivos Arrow
+IPC sin comprimir (uno por tabla, con los embeddings como listas float32 de
+tamaño fijo) y un manifest.json con filas, sha256, modelo y dimensión.
+`import` comprueba los checksums y carga las tablas por lotes, de padres a
+hijas, sin llamar a ninguna API de embeddings. Con LOADER_COPY_DSN la carga
+usa COPY directo a Postgres (tablas vacías). `search` y `bm25` consultan los
+índices locales mapeando en memoria los mismos archivos. Requiere pyarrow.
+
+Uso:
+    python scripts/corpus_snapshot.py export snapshots/2024-06-30
+    python scripts/corpus_snapshot.py export snapshots/local-v2 --model-version local/all-MiniLM-L6-v2@384
+    python scripts/corpus_snapshot.py verify snapshots/2024-06-30
+    python scripts/corpus_snapshot.py import snapshots/2024-06-30 --local /tmp/corpus.sqlite3
+    python scripts/corpus_snapshot.py bm25 snapshots/2024-06-30 "derecho a la educación"
+    python scripts/corpus_snapshot.py search snapshots/2024-06-30 "derecho a la educación" --provider hashing
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# Agregar el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.corpus_snapshot import (
+    DEFAULT_BATCH_ROWS, DEFAULT_PAGE_SIZE, build_bm25_index, export_snapshot, import_snapshot,
+    open_vector_index, verify_snapshot
+)
+
+
+def open_client(args):
+    if args.local:
+        from lib.supabase.local_client import LocalSupabaseClient
+        return LocalSupabaseClient(args.local)
+    from lib.supabase.client import create_client
+    return create_client()
+
+
+def print_manifest(manifest):
+    embedding = manifest['embedding']
+    print(f"🗂️  Instantánea del {manifest['created_at']}: {embedding['model_version']} "
+          f"({embedding['source_table']}, {embedding['dimension']} dimensiones)")
+    for table, entry in manifest['tables'].items():
+        print(f"   {table:<11} {entry['rows']:>9} filas {entry['bytes'] / 1e6:>9.1f} MB  sha256 {entry['sha256'][:16]}…")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exportar o restaurar el corpus en archivos Arrow')
+    parser.add_argument('command', choices=['export', 'import', 'verify', 'search', 'bm25'])
+    parser.add_argument('path', help='Directorio de la instantánea')
+    parser.add_argument('query', nargs='?', help='Consulta (search y bm25)')
+    parser.add_argument('--local', metavar='PATH', help='Base SQLite de LocalSupabaseClient en lugar de Supabase')
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE, help='Filas por página al exportar')
+    parser.add_argument('--batch-rows', type=int, default=DEFAULT_BATCH_ROWS, help='Filas por record batch')
+    parser.add_argument('--model-version', help='Exportar los vectores de esta versión de chunk_embeddings')
+    parser.add_argument('--skip-verify', action='store_true', help='Importar sin comprobar los checksums')
+    parser.add_argument('--provider', help='Proveedor del embedding de la consulta (search)')
+    parser.add_argument('--limit', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        export_snapshot(open_client(args), args.path, page_size=args.page_size,
+                        batch_rows=args.batch_rows, model_version=args.model_version)
+        print_manifest(verify_snapshot(args.path))
+        return
+
+    if args.command == 'verify':
+        try:
+            manifest = verify_snapshot(args.path)
+        except ValueError as e:
+            raise SystemExit(f'❌ {e}')
+        print_manifest(manifest)
+        print("✅ Archivos íntegros")
+        return
+
+    if args.command == 'import':
+        copy_dsn = os.environ.get('LOADER_COPY_DSN')
+        writer = None
+        if copy_dsn:
+            from lib.supabase.bulk_writer import CopyBulkWriter
+            writer = CopyBulkWriter(copy_dsn)
+        stats = import_snapshot(open_client(args), args.path, writer=writer, upsert=writer is None,
+                                verify=not args.skip_verify)
+        total = sum(stats['rows'].values())
+        print(f"✅ {total} filas restauradas en {stats['seconds']:.1f} s, 0 llamadas de embeddings")
+        if stats['failed']:
+            print(f"⚠️  {stats['failed']} filas fallaron (ver los mensajes anteriores)")
+            raise SystemExit(1)
+        return
+
+    if not args.query:
+        raise SystemExit(f'❌ {args.command} necesita una consulta')
+
+    start = time.perf_counter()
+    if args.command == 'bm25':
+        index = build_bm25_index(args.path)
+        print(f"🔎 BM25 de {len(index)} chunks construido en {time.perf_counter() - start:.2f} s")
+        for row in index.search(args.query, limit=args.limit):
+            print(f"   {row['bm25_score']:.3f}  Art. {row.get('article_number') or '-':<8} {row['chunk_text'][:90]!r}")
+        return
+
+    from lib.embedding_providers import get_provider
+    index = open_vector_index(args.path)
+    provider = get_provider(args.provider)
+    if provider.dimension != index.dimension:
+        raise SystemExit(f'❌ {provider.name} produce {provider.dimension} dimensiones; la instantánea tiene {index.dimension}')
+    print(f"🔎 {len(index)} vectores mapeados en {time.perf_counter() - start:.2f} s")
+    for chunk_id, score in index.search(provider.get_embeddings(args.query), k=args.limit):
+        print(f"   {score:.3f}  {chunk_id}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Evaluación reproducible de recuperación sobre la Constitución de documents/.
+
+Carga el documento en el cliente local (SQLite con el esquema de Supabase),
+genera los embeddings con el backend falso y construye los índices locales
+desde esas tablas. Después ejecuta el gold set (consultas -> artículos) con
+cada método y reporta recall@k, MRR y latencia p50/p95/p99.
+
+Métodos:
+  - bm25: lib/bm25.py
+  - vector: lib/vector_index.py (búsqueda exacta por coseno)
+  - hnsw: lib/hnsw_index.py (búsqueda aproximada)
+  - hybrid: lib/hybrid_retrieval.py (bm25 + vector con RRF)
+
+El reporte se guarda en JSON (--output). Con --compare se muestran las
+diferencias de calidad respecto de un reporte anterior.
+
+Uso:
+    python scripts/eval_retrieval.py
+    python scripts/eval_retrieval.py --methods bm25,hybrid --output eval.json --compare .cache/retrieval_eval.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+
+# Agregar el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.bm25 import build_from_supabase
+from lib.fake_embeddings import FakeEmbeddingBackend
+from lib.hnsw_index import build_from_vector_index
+from lib.hybrid_retrieval import HybridRetriever, local_lexical_search, local_vector_search
+from lib.retrieval_eval import DEFAULT_K_VALUES, build_eval_chunks, compare_reports, evaluate_method, load_gold
+from lib.supabase.local_client import LocalSupabaseClient
+from lib.vector_index import export_embeddings
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_GOLD = os.path.join(SCRIPTS_DIR, 'gold', 'constitucion_articulos.json')
+METHODS = ('bm25', 'vector', 'hnsw', 'hybrid')
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_corpus(client, rows, backend):
+    """Escribir documento, chunks y embeddings en el cliente local"""
+    client.table('documents').insert({'document_id': rows[0]['document_id'], 'source': 'eval'}).execute()
+    client.table('chunks').insert(rows).execute()
+    embeddings = backend.embed_batch([row['chunk_text'] for row in rows])
+    client.table('embeddings').insert([
+        {'vector_id': row['chunk_id'], 'chunk_id': row['chunk_id'], 'embedding': json.dumps(vector), 'embeddings_order': 1}
+        for row, vector in zip(rows, embeddings)
+    ]).execute()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluación de recuperación (recall@k, MRR, latencia)')
+    parser.add_argument('--gold', default=DEFAULT_GOLD)
+    parser.add_argument('--documents-dir', default='documents')
+    parser.add_argument('--methods', default='bm25,vector,hybrid', help=f"Métodos separados por coma ({', '.join(METHODS)})")
+    parser.add_argument('--max-chars', type=int, default=1500, help='Tamaño máximo de chunk (caracteres)')
+    parser.add_argument('--output', default='.cache/retrieval_eval.json')
+    parser.add_argument('--compare', help='Reporte JSON anterior para mostrar diferencias')
+    args = parser.parse_args()
+
+    methods = args.methods.split(',')
+    unknown = set(methods) - set(METHODS)
+    if unknown:
+        raise SystemExit(f"❌ Métodos desconocidos: {', '.join(sorted(unknown))}")
+
+    gold = load_gold(args.gold)
+    with open(os.path.join(args.documents_dir, gold['document']), encoding='utf-8') as f:
+        text = f.read()
+    rows = build_eval_chunks(text, gold['document'], max_chars=args.max_chars)
+    article_of = {row['chunk_id']: row['article_number'] for row in rows}
+    rows_by_id = {row['chunk_id']: row for row in rows}
+
+    backend = FakeEmbeddingBackend()
+    client = LocalSupabaseClient()
+    load_corpus(client, rows, backend)
+    print(f"📚 {gold['document']}: {len(rows)} chunks, {len(gold['queries'])} consultas gold")
+
+    with tempfile.TemporaryDirectory() as path:
+        vector_index = export_embeddings(client, path, dimension=backend.dimension)
+        bm25 = build_from_supabase(client)
+        vector_search = local_vector_search(vector_index, rows_by_id=rows_by_id)
+
+        searches = {
+            'bm25': local_lexical_search(bm25),
+            'vector': lambda query, k: vector_search(backend.embed_text(query), k),
+        }
+        if 'hnsw' in methods:
+            hnsw = build_from_vector_index(vector_index)
+            searches['hnsw'] = lambda query, k: [
+                dict(rows_by_id[chunk_id], similarity_score=score) for chunk_id, score in hnsw.search(backend.embed_text(query), k)
+            ]
+        retriever = HybridRetriever(backend.embed_text, searches['bm25'], vector_search)
+        searches['hybrid'] = lambda query, k: retriever.retrieve(query, k)['results']
+
+        report = {
+            'generated_at': datetime.now(timezone.utc).isoformat(),
+            'git_commit': git_commit(),
+            'gold': os.path.relpath(args.gold),
+            'corpus': {'document': gold['document'], 'chunks': len(rows), 'max_chars': args.max_chars},
+            'embedding_model': f'fake/feature-hashing-{backend.dimension}',
+            'methods': {}
+        }
+        for method in methods:
+            report['methods'][method] = evaluate_method(searches[method], gold['queries'], article_of)
+
+    k_columns = [f'recall@{k}' for k in DEFAULT_K_VALUES]
+    print("=" * 84)
+    print(f"{'Método':<10} " + ' '.join(f'{c:<11}' for c in k_columns) + f" {'MRR':<8} {'p50 (ms)':<10} {'p95 (ms)':<10} {'p99 (ms)':<10}")
+    print("-" * 84)
+    for method, metrics in report['methods'].items():
+        latency = metrics['latency_ms']
+        print(f"{method:<10} " + ' '.join(f'{metrics[c]:<11.3f}' for c in k_columns)
+              + f" {metrics['mrr']:<8.3f} {latency['p50']:<10.2f} {latency['p95']:<10.2f} {latency['p99']:<10.2f}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)
+        changes = compare_reports(previous, report)
+        print(f"\n🔁 Cambios respecto de {args.compare} ({previous.get('git_commit') or 'sin commit'}):")
+        print('\n'.join(f'  {line}' for line in changes) if changes else '  sin cambios de calidad')
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Reporte guardado en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
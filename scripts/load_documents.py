@@ -5,32 +5,51 @@ Script para cargar documentos legales a la base de datos con embeddings
 
 import os
 import sys
+import glob
 import uuid
 import time
 import asyncio
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any
-import PyPDF2
-import re
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 
 # Agregar el directorio raíz al path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from chonkie import SentenceChunker
 from lib.supabase.client import create_client
-from lib.gemini import get_embeddings
+from lib.supabase.bulk_writer import BulkWriter, CopyBulkWriter
+from lib.embedding_providers import PROVIDERS, get_provider
+from lib.chunker_params import LOADER_CHUNKER_PARAMS
+from lib.embedding_batch import backoff_stats
+from lib.embedding_cache import open_default_cache
+from lib.embedding_migration import loading_models, model_version
+from lib.ingest_manifest import STATUS_COMPLETE, chunk_keys, file_hash, open_default_manifest
+from lib.job_queue import DEFAULT_LEASE_SECONDS, JobQueue, Lease
+from lib.ingest_metrics import PROFILE_MODES, IngestMetrics, StageProfiler, WorkerProfiler, timed_call, timed_iter
+from lib.legal_structure import iter_structured_chunks
+from lib.near_duplicates import DEDUP_MODES, open_default_dedup
+from lib.query_cache import bump_corpus_generation
+from lib.reference_graph import update_document_references
+from lib.pdf_stream import iter_pdf_pages
+from lib.text_normalizer import clean_text
+
+DOCUMENT_EXTENSIONS = ['.pdf', '.txt', '.doc', '.docx']
+
+class DocumentParser:
+    """Etapas CPU de la ingesta (lectura, limpieza y chunking), sin red ni base de datos"""
 
-class DocumentLoader:
     def __init__(self):
-        self.supabase = create_client()
-        self.chunker = SentenceChunker(
-            tokenizer_or_token_counter="gpt2",
-            chunk_size=512,
-            chunk_overlap=50,
-            min_sentences_per_chunk=1,
-            min_characters_per_sentence=10,
-            delim=['.', '!', '?', '\n', 'PRIMERA.', 'SEGUNDA.', 'TERCERA.', 'CUARTA.', 'QUINTA.', 'SEXTA.', 'SÉPTIMA.', 'OCTAVA.', 'NOVENA.', 'DÉCIMA.']
-        )
+        self._chunker = None
+    
+    @property
+    def chunker(self):
+        """SentenceChunker de Chonkie, creado en el primer uso (importar chonkie carga el tokenizer)"""
+        if self._chunker is None:
+            from chonkie import SentenceChunker
+            self._chunker = SentenceChunker(**LOADER_CHUNKER_PARAMS)
+        return self._chunker
     
     def read_text_file(self, file_path: str) -> str:
         """Leer archivo de texto"""
@@ -44,25 +63,21 @@ class DocumentLoader:
     
     def read_pdf_file(self, file_path: str) -> str:
         """Leer archivo PDF"""
-        text = ""
+        return "\n".join(text for _, text in self.iter_pages(file_path))
+    
+    def iter_pages(self, file_path: str) -> Iterator[Tuple[int, str]]:
+        """Páginas del archivo bajo demanda; los archivos de texto son una sola página"""
+        if Path(file_path).suffix.lower() != '.pdf':
+            yield 1, self.read_text_file(file_path)
+            return
         try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
+            yield from iter_pdf_pages(file_path)
         except Exception as e:
             print(f"Error leyendo PDF {file_path}: {e}")
-        return text
     
     def clean_text(self, text: str) -> str:
-        """Limpiar y normalizar texto"""
-        # Remover caracteres extraños
-        text = re.sub(r'[^\w\s\.\,\;\:\!\?\-\(\)\[\]\{\}\"\'\n]', ' ', text)
-        # Normalizar espacios
-        text = re.sub(r'\s+', ' ', text)
-        # Normalizar saltos de línea
-        text = re.sub(r'\n+', '\n', text)
-        return text.strip()
+        """Limpiar y normalizar texto (lib/text_normalizer.py: conserva los saltos de párrafo)"""
+        return clean_text(text)
     
     def chunk_document(self, text: str) -> List[Dict[str, Any]]:
         """Chunkear documento usando Chonkie"""
@@ -81,9 +96,63 @@ class DocumentLoader:
             for chunk in chunks if chunk.text.strip()
         ]
     
-    def create_document(self, source: str) -> str:
-        """Crear documento en la base de datos"""
-        document_id = str(uuid.uuid4())
+    def iter_document_chunks(self, file_path: str, timings: Dict[str, float] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Secciones y chunks del archivo en streaming y en una sola pasada. La
+        estructura legal (LIBRO/TÍTULO/CAPÍTULO/SECCIÓN/Artículo y cláusulas
+        ordinales) se detecta sobre las líneas originales; cada artículo se
+        limpia y chunkea por separado, con sus start_page/end_page reales.
+        Si se pasa `timings`, acumula ahí los segundos de extract, clean y chunk.
+        """
+        pages, chunk, clean = self.iter_pages(file_path), self.chunker.chunk, self.clean_text
+        if timings is not None:
+            pages = timed_iter(pages, timings, 'extract')
+            chunk = timed_call(chunk, timings, 'chunk')
+            clean = timed_call(clean, timings, 'clean')
+        return iter_structured_chunks(pages, chunk, clean=clean)
+    
+    def parse_document(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """Leer, limpiar y chunkear un archivo; None si no tiene texto"""
+        sections, chunks = [], []
+        timings = {'extract': 0.0, 'clean': 0.0, 'chunk': 0.0}
+        start = time.perf_counter()
+        for kind, item in self.iter_document_chunks(str(file_path), timings):
+            (sections if kind == 'section' else chunks).append(item)
+        timings['parse'] = time.perf_counter() - start
+        if not chunks:
+            return None
+        return {'text_chars': chunks[-1]['end_index'], 'chunks': chunks, 'sections': sections, 'timings': timings}
+
+
+class DocumentLoader(DocumentParser):
+    def __init__(self, supabase=None, copy_dsn: str = None, batch_size: int = 500, dedup_mode: str = None,
+                 metrics: IngestMetrics = None, embedding_provider: str = None):
+        super().__init__()
+        # Proveedor de embeddings (EMBEDDING_PROVIDER): se inicializa con el primer embedding
+        self.embedder = get_provider(embedding_provider)
+        # Tiempos por etapa y contadores (lib/ingest_metrics.py)
+        self.metrics = metrics or IngestMetrics()
+        self.supabase = supabase or create_client()
+        # Escritura por lotes: REST por defecto, COPY directo a Postgres si hay DSN
+        if copy_dsn:
+            self.writer = CopyBulkWriter(copy_dsn)
+        else:
+            self.writer = BulkWriter(self.supabase, batch_size=batch_size)
+        # Caché de embeddings en disco (EMBEDDING_CACHE_DIR vacío la desactiva)
+        self.embedding_cache = open_default_cache()
+        # Manifiesto de ingesta incremental (INGEST_MANIFEST_PATH vacío lo desactiva)
+        self.manifest = open_default_manifest()
+        # Duplicados exactos y casi exactos entre chunks de toda la ejecución (DEDUP_MODE)
+        self.dedup_mode, self.dedup = open_default_dedup(dedup_mode)
+        self.dedup_saved = {'embeddings': 0}
+        self._dedup_lock = threading.Lock()
+        # Proveedores de las versiones de chunk_embeddings que se mantienen al cargar
+        self.version_providers: Dict[str, Any] = {}
+        self._version_lock = threading.Lock()
+    
+    def create_document(self, source: str, document_id: str = None) -> str:
+        """Crear documento en la base de datos (con `document_id` si lo fija la cola de trabajos)"""
+        document_id = document_id or str(uuid.uuid4())
         
         try:
             result = self.supabase.table('documents').insert({
@@ -124,186 +193,684 @@ class DocumentLoader:
             print(f"Error creando sección: {e}")
             return None
     
-    def create_chunk(self, section_id: str, chunk_data: dict) -> str:
-        """Crear chunk en la base de datos"""
-        chunk_id = str(uuid.uuid4())
+    def sync_chunks_with_manifest(self, manifest_key: str, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Comparar los chunks actuales con los ya escritos según el manifiesto.
+        Borra los chunks obsoletos y las escrituras a medias de una ejecución
+        interrumpida, actualiza la posición de los que no cambiaron y devuelve
+        solo los chunks que faltan por escribir (con su chunk_key, que se
+        registra en el manifiesto junto al chunk_id).
+        """
+        # La clave incluye la ubicación: un chunk que cambia de artículo o sección se reescribe
+        keys = chunk_keys([
+            f"{chunk_data.get('section_key') or ''}\0{chunk_data.get('article_number') or ''}\0{chunk_data['text']}"
+            for chunk_data in chunks
+        ])
         
-        try:
-            result = self.supabase.table('chunks').insert({
-                'chunk_id': chunk_id,
-                'section_id': section_id,
-                'chunk_text': chunk_data['text'],
-                'char_count': len(chunk_data['text']),
-                'start_page': 1,  # Por defecto
-                'end_page': 1     # Por defecto
-            }).execute()
-            
-            if hasattr(result, 'error') and result.error:
-                print(f"Error creando chunk: {result.error}")
+        # Escrituras sin confirmar: pudieron quedar a medias, se rehacen
+        pending = self.manifest.pending_chunks(manifest_key)
+        if pending:
+            self.writer.delete_chunks(list(pending.values()))
+            self.manifest.remove_chunks(manifest_key, list(pending))
+        
+        committed = self.manifest.committed_chunks(manifest_key)
+        current = set(keys)
+        stale = [key for key in committed if key not in current]
+        if stale:
+            self.writer.delete_chunks([committed[key] for key in stale])
+            self.manifest.remove_chunks(manifest_key, stale)
+            print(f"🧹 Chunks obsoletos eliminados: {len(stale)}")
+        moved = self.update_chunk_positions(
+            {committed[key]: chunk_data for key, chunk_data in zip(keys, chunks) if key in committed}
+        )
+        if pending or stale or moved:
+            # Las cachés de consultas (lib/query_cache.py) no deben servir chunks borrados o movidos
+            bump_corpus_generation()
+        
+        new_chunks = []
+        for key, chunk_data in zip(keys, chunks):
+            if key in committed:
+                continue
+            new_chunks.append(dict(chunk_data, chunk_key=key))
+        
+        print(f"♻️ Chunks sin cambios: {len(chunks) - len(new_chunks)}, por escribir: {len(new_chunks)}")
+        return new_chunks
+    
+    def update_chunk_positions(self, unchanged: Dict[str, Dict[str, Any]]) -> int:
+        """
+        Corregir chunk_order y páginas de los chunks ya escritos cuyo texto no
+        cambió pero que se desplazaron (p. ej. un párrafo nuevo antes que ellos
+        en el mismo artículo). Devuelve cuántos se actualizaron.
+        """
+        chunk_ids = list(unchanged)
+        moved = {}
+        for start in range(0, len(chunk_ids), self.writer.batch_size):
+            rows = self.supabase.table('chunks').select('chunk_id, chunk_order, start_page, end_page') \
+                .in_('chunk_id', chunk_ids[start:start + self.writer.batch_size]).execute().data or []
+            for row in rows:
+                chunk_data = unchanged[str(row['chunk_id'])]
+                position = {
+                    'chunk_order': chunk_data.get('chunk_order'),
+                    'start_page': chunk_data.get('start_page', 1),
+                    'end_page': chunk_data.get('end_page', 1)
+                }
+                if any(row.get(column) != value for column, value in position.items()):
+                    moved[str(row['chunk_id'])] = position
+        if moved:
+            self.writer.update_chunks(moved)
+            print(f"↕️ Chunks desplazados: {len(moved)}")
+        return len(moved)
+    
+    def check_document(self, file_path) -> Optional[Dict[str, Any]]:
+        """
+        Consultar el manifiesto antes de leer el archivo. Devuelve el trabajo
+        de ingesta, o None si el archivo no cambió desde la última carga.
+        """
+        file_path = Path(file_path)
+        job = {
+            'file_path': str(file_path),
+            'source': file_path.name,
+            'manifest_key': str(file_path.resolve()),
+            'content_hash': None,
+            'entry': None
+        }
+        if self.manifest is not None:
+            job['content_hash'] = file_hash(str(file_path))
+            job['entry'] = self.manifest.get_file(job['manifest_key'])
+            entry = job['entry']
+            if entry and entry['content_hash'] == job['content_hash'] and entry['status'] == STATUS_COMPLETE:
+                print(f"⏭️ Sin cambios desde la última carga: {job['source']}")
                 return None
+        return job
+    
+    def prepare_document(self, job: Dict[str, Any], parsed: Dict[str, Any]) -> bool:
+        """Crear (o reutilizar) documento y sección y dejar en `job['chunks']` los chunks por escribir"""
+        print(f"📊 {job['source']}: texto extraído: {parsed['text_chars']} caracteres")
+        
+        entry = job['entry']
+        if entry:
+            # Reanudar o actualizar el documento existente en lugar de duplicarlo
+            document_id, section_id = entry['document_id'], entry['section_id']
+            print(f"🔁 Documento ya registrado ({entry['status']}), actualizando: {document_id}")
+        else:
+            # Crear documento
+            document_id = self.create_document(job['source'], job.get('document_id'))
+            if not document_id:
+                return False
             
-            return chunk_id
-            
-        except Exception as e:
-            print(f"Error creando chunk: {e}")
-            return None
+            # Crear sección
+            section_id = self.create_section(document_id)
+            if not section_id:
+                return False
+        
+        job['document_id'], job['section_id'] = document_id, section_id
+        if self.manifest is not None:
+            self.manifest.start_file(job['manifest_key'], job['content_hash'], document_id, section_id)
+        
+        # Secciones estructurales bajo la sección raíz, con ids deterministas
+        section_ids = self.write_structure(document_id, section_id, parsed.get('sections', []))
+        
+        # chunk_id en cliente para todos los chunks: lo usan la deduplicación,
+        # el manifiesto y las filas de embeddings por versión
+        chunks = parsed['chunks']
+        for chunk_data in chunks:
+            chunk_data.setdefault('chunk_id', str(uuid.uuid4()))
+            chunk_data['document_id'] = document_id
+            chunk_data['section_id'] = section_ids.get(chunk_data.get('section_key'), section_id)
+        articles = len({c['article_number'] for c in chunks if c.get('article_number')})
+        print(f"🔪 {job['source']}: chunks creados: {len(chunks)} ({articles} artículos, {len(section_ids)} secciones)")
+        if self.manifest is not None:
+            chunks = self.sync_chunks_with_manifest(job['manifest_key'], chunks)
+        
+        # Tras borrar los chunks obsoletos, las secciones que ya no existen quedan libres
+        if entry:
+            self.writer.delete_sections(document_id, [section_id, *section_ids.values()])
+        job['chunks'] = chunks
+        return True
     
-    def create_embedding(self, chunk_id: str, embedding: list) -> str:
-        """Crear embedding en la base de datos"""
-        vector_id = str(uuid.uuid4())
+    def write_structure(self, document_id: str, root_section_id: str, sections: List[Dict[str, Any]]) -> Dict[str, str]:
+        """
+        Escribir las secciones detectadas (LIBRO, TÍTULO, CAPÍTULO...) y devolver
+        clave de sección -> section_id. Los ids se derivan de la sección raíz y
+        de la ruta de la sección, así reingerir el documento los reutiliza.
+        """
+        namespace = uuid.UUID(root_section_id)
+        section_ids = {section['key']: str(uuid.uuid5(namespace, section['key'])) for section in sections}
+        rows = [
+            {
+                'section_id': section_ids[section['key']],
+                'document_id': document_id,
+                'parent_section_id': section_ids.get(section['parent_key'], root_section_id),
+                'section_type': section['section_type'],
+                'section_number': section['section_number']
+            }
+            for section in sections
+        ]
+        if rows:
+            self.writer.write_sections(rows)
+        return section_ids
+    
+    def dedup_chunks(self, job: Dict[str, Any]) -> List[str]:
+        """
+        Texto a embeber por chunk. Un duplicado (exacto o casi exacto) de un
+        chunk ya visto en esta ejecución usa el texto de su canónico, así
+        comparten un único embedding; cada chunk conserva su propia fila de
+        embeddings, que es la que unen match_documents y los índices locales.
+        """
+        chunks = job['chunks']
+        if self.dedup is None:
+            return [chunk_data['text'] for chunk_data in chunks]
+        
+        texts = []
+        exact = near = 0
+        for chunk_data in chunks:
+            match = self.dedup.check(chunk_data['chunk_id'], chunk_data['text'])
+            if match is None:
+                texts.append(chunk_data['text'])
+                continue
+            exact += match.exact
+            near += not match.exact
+            texts.append(match.canonical_text)
         
+        if exact or near:
+            print(f"🧬 {job['source']}: duplicados: {exact} exactos, {near} casi exactos")
+        return texts
+    
+    def embed_document(self, job: Dict[str, Any]) -> bool:
+        """Generar embeddings en lotes concurrentes (el limitador marca el ritmo)"""
+        texts = self.dedup_chunks(job)
+        unique = list(dict.fromkeys(texts))
         try:
-            result = self.supabase.table('embeddings').insert({
-                'vector_id': vector_id,
-                'chunk_id': chunk_id,
-                'embedding': embedding,
-                'embeddings_order': 1
-            }).execute()
-            
-            if hasattr(result, 'error') and result.error:
-                print(f"Error creando embedding: {result.error}")
-                return None
-            
-            # Actualizar el vector_id en la tabla chunks
-            update_result = self.supabase.table('chunks').update({
-                'vector_id': vector_id
-            }).eq('chunk_id', chunk_id).execute()
-            
-            if hasattr(update_result, 'error') and update_result.error:
-                print(f"Error actualizando chunk con vector_id: {update_result.error}")
-            
-            return vector_id
-            
+            vectors = dict(zip(unique, self.embedder.get_embeddings_batch(unique, cache=self.embedding_cache)))
         except Exception as e:
-            print(f"Error creando embedding: {e}")
-            return None
+            print(f"    ❌ Error generando embeddings para {job['source']}: {e}")
+            return False
+        job['embeddings'] = [vectors[text] for text in texts]
+        self.metrics.inc('embedding_texts_total', len(unique))
+        if not self.embed_versions(job, texts):
+            return False
+        
+        saved_embeddings = len(texts) - len(unique)
+        with self._dedup_lock:
+            self.dedup_saved['embeddings'] += saved_embeddings
+        if saved_embeddings:
+            print(f"✂️ {job['source']}: embeddings ahorrados: {saved_embeddings}/{len(texts)}")
+        
+        if self.embedding_cache is not None:
+            stats = self.embedding_cache.stats()
+            print(f"🗃️ Caché de embeddings: {stats['hits']} aciertos, {stats['misses']} fallos ({stats['hit_rate']:.0%})")
+        return True
     
-    def get_embedding_with_retry(self, text: str, max_retries: int = 3) -> List[float]:
-        """Obtener embedding con reintentos automáticos"""
-        for attempt in range(max_retries):
+    def version_provider(self, model: Dict[str, Any]):
+        """Proveedor de una versión de embedding_models (el del loader si coincide)"""
+        version = model['model_version']
+        with self._version_lock:
+            provider = self.version_providers.get(version)
+            if provider is None:
+                provider = self.embedder if model_version(self.embedder) == version else get_provider(model['provider'])
+                if model_version(provider) != version:
+                    raise ValueError(f'El proveedor {provider.name} produce {model_version(provider)}, no {version}')
+                self.version_providers[version] = provider
+        return provider
+    
+    def embed_versions(self, job: Dict[str, Any], texts: List[str]) -> bool:
+        """
+        Vectores de los chunks en las versiones de chunk_embeddings activa y en
+        construcción: sin ellos la búsqueda de la versión activa no vería el
+        documento. Si falla la versión activa el documento no se carga; una
+        versión en construcción solo avisa (reembed.py completa lo que falte).
+        """
+        job['version_embeddings'] = {}
+        try:
+            models = loading_models(self.supabase)
+        except Exception as e:
+            print(f"    ❌ No se pudieron leer las versiones de embeddings para {job['source']}: {e}")
+            return False
+        for model in models:
+            version = model['model_version']
             try:
-                embedding = get_embeddings(text)
-                if embedding:
-                    return embedding
+                provider = self.version_provider(model)
+                if provider is self.embedder:
+                    embeddings = job['embeddings']
                 else:
-                    print(f"    ⚠️ No se pudo generar embedding (intento {attempt + 1})")
-                    
+                    # La caché tiene una sola dimensión (la de la carga)
+                    cache = self.embedding_cache
+                    if cache is not None and cache.dimension != provider.dimension:
+                        cache = None
+                    unique = list(dict.fromkeys(texts))
+                    vectors = dict(zip(unique, provider.get_embeddings_batch(unique, cache=cache)))
+                    embeddings = [vectors[text] for text in texts]
+                    self.metrics.inc('embedding_texts_total', len(unique))
             except Exception as e:
-                error_str = str(e)
-                if "429" in error_str or "quota" in error_str.lower():
-                    wait_time = (attempt + 1) * 2  # Espera exponencial: 2s, 4s, 6s
-                    print(f"    ⏳ Rate limit alcanzado. Esperando {wait_time}s... (intento {attempt + 1}/{max_retries})")
-                    time.sleep(wait_time)
-                else:
-                    print(f"    ❌ Error generando embedding: {e}")
-                    if attempt == max_retries - 1:
-                        raise e
-                    time.sleep(1)
-        
-        return None
+                if model['status'] == 'active':
+                    print(f"    ❌ Error generando embeddings {version} (versión activa) para {job['source']}: {e}")
+                    return False
+                print(f"    ⚠️ Sin embeddings {version} para {job['source']}: {e}")
+                continue
+            job['version_embeddings'][version] = embeddings
+        return True
     
-    def process_document(self, file_path: str):
-        """Procesar un documento completo"""
-        file_path = Path(file_path)
-        source = file_path.name
-        
-        print(f"\n📄 Procesando: {source}")
+    def write_version_embeddings(self, job: Dict[str, Any], start: int, batch: List[Dict[str, Any]],
+                                 written_ids: set) -> bool:
+        """Filas de chunk_embeddings de un lote ya escrito, una por versión de embed_versions"""
+        for version, embeddings in job.get('version_embeddings', {}).items():
+            rows = [
+                {'chunk_id': chunk_data['chunk_id'], 'model_version': version, 'embedding': list(embedding)}
+                for chunk_data, embedding in zip(batch, embeddings[start:start + len(batch)])
+                if chunk_data['chunk_id'] in written_ids
+            ]
+            try:
+                written = self.writer.write_rows('chunk_embeddings', rows)
+            except Exception as e:
+                print(f"    ❌ Error guardando embeddings {version} de {job['source']}: {e}")
+                return False
+            self.metrics.inc('rows_written_total', written, table='chunk_embeddings')
+            if written < len(rows):
+                return False
+        return True
+    
+    def write_document(self, job: Dict[str, Any]) -> bool:
+        """
+        Escribir chunks y embeddings por lotes, con vector_id asignado en cliente.
+        Cada lote se confirma en el manifiesto para poder reanudar tras un corte.
+        """
+        chunks, embeddings = job['chunks'], job['embeddings']
+        manifest_key = job['manifest_key']
+        chunks_written = embeddings_written = 0
+        versions_complete = True
+        batch_size = self.writer.batch_size
+        for start in range(0, len(chunks), batch_size):
+            lease = job.get('lease')
+            if lease is not None and lease.lost.is_set():
+                # Otro worker reclamó el trabajo: sus filas son las que cuentan
+                print(f"⚠️ Lease perdido, se deja de escribir: {job['source']}")
+                return False
+            batch = chunks[start:start + batch_size]
+            if self.manifest is not None:
+                self.manifest.add_pending(manifest_key, {c['chunk_key']: c['chunk_id'] for c in batch})
+            
+            result = self.writer.write_chunks(job['section_id'], batch, embeddings[start:start + batch_size])
+            chunks_written += result['chunks_written']
+            embeddings_written += result['embeddings_written']
+            written_ids = set(result['chunk_ids'])
+            if not self.write_version_embeddings(job, start, batch, written_ids):
+                # Sin confirmar en el manifiesto: la próxima ejecución reescribe el lote
+                versions_complete = False
+                continue
+            
+            if self.manifest is not None:
+                self.manifest.mark_committed(manifest_key, [c['chunk_key'] for c in batch if c['chunk_id'] in written_ids])
+        print(f"💾 {job['source']}: chunks guardados: {chunks_written}/{len(chunks)}, embeddings: {embeddings_written}")
+        self.metrics.inc('rows_written_total', chunks_written, table='chunks')
+        self.metrics.inc('rows_written_total', embeddings_written, table='embeddings')
+        if chunks_written:
+            bump_corpus_generation()
         
-        # Leer documento
-        if file_path.suffix.lower() == '.pdf':
-            text = self.read_pdf_file(str(file_path))
-        else:
-            text = self.read_text_file(str(file_path))
+        if chunks_written < len(chunks) or not versions_complete:
+            # El archivo queda en curso: la próxima ejecución reintenta lo que falta
+            print(f"⚠️ Documento incompleto: {job['source']}")
+            return False
         
-        if not text.strip():
-            print(f"⚠️ Documento vacío: {source}")
+        self.update_references(job)
+        if self.manifest is not None:
+            self.manifest.complete_file(manifest_key)
+        print(f"✅ Documento procesado: {job['source']}")
+        return True
+    
+    def update_references(self, job: Dict[str, Any]):
+        """
+        Reescribir el grafo de referencias entre artículos del documento
+        (article_references) desde sus chunks ya escritos. Un fallo no
+        invalida la carga: el grafo se puede rehacer con scripts/reference_graph.py.
+        """
+        try:
+            rows = update_document_references(self.supabase, job['document_id'])
+        except Exception as e:
+            print(f"⚠️ No se pudo actualizar el grafo de referencias de {job['source']}: {e}")
             return
+        edges = sum(len(row['referenced_articles']) for row in rows)
+        print(f"🔗 {job['source']}: referencias entre artículos: {edges} en {len(rows)} artículos")
+        self.metrics.inc('rows_written_total', len(rows), table='article_references')
+    
+    def process_document(self, file_path: str):
+        """Procesar un documento completo (incremental si hay manifiesto)"""
+        print(f"\n📄 Procesando: {Path(file_path).name}")
         
-        # Limpiar texto
-        text = self.clean_text(text)
-        print(f"📊 Texto extraído: {len(text)} caracteres")
-        
-        # Crear documento
-        document_id = self.create_document(source)
-        if not document_id:
+        job = self.check_document(file_path)
+        if job is None:
             return
         
-        # Crear sección
-        section_id = self.create_section(document_id)
-        if not section_id:
+        parsed = self.parse_document(job['file_path'])
+        if parsed is None:
+            print(f"⚠️ Documento vacío: {job['source']}")
             return
+        self.record_parse(job, parsed)
+        
+        if self.run_stage('prepare', job, self.prepare_document, job, parsed) and self.run_stage('embed', job, self.embed_document, job):
+            self.run_stage('insert', job, self.write_document, job)
+    
+    def run_stage(self, stage: str, job: Dict[str, Any], fn, *args):
+        """Ejecutar una etapa de un documento midiéndola en self.metrics"""
+        with self.metrics.stage(stage, source=job['source']):
+            return fn(*args)
+    
+    def record_parse(self, job: Dict[str, Any], parsed: Dict[str, Any]):
+        """Registrar los tiempos que midió el parser (en este proceso o en el pool)"""
+        for stage, seconds in parsed.pop('timings', {}).items():
+            self.metrics.observe(stage, seconds, source=job['source'])
+        if 'parse_peak_bytes' in parsed:
+            self.metrics.event('memory', source=job['source'], parse_peak_bytes=parsed.pop('parse_peak_bytes'))
+        self.metrics.inc('chars_extracted_total', parsed['text_chars'])
+        self.metrics.inc('chunks_parsed_total', len(parsed['chunks']))
+    
+    def finish_metrics(self, stats: Dict[str, int]):
+        """Contadores de la ejecución completa: documentos, caché, duplicados y esperas"""
+        for status in ('completed', 'skipped', 'empty', 'failed'):
+            self.metrics.inc('documents_total', stats.get(status, 0), status=status)
+        if self.embedding_cache is not None:
+            cache_stats = self.embedding_cache.stats()
+            self.metrics.inc('embedding_cache_total', cache_stats['hits'], result='hit')
+            self.metrics.inc('embedding_cache_total', cache_stats['misses'], result='miss')
+        self.metrics.inc('dedup_saved_total', self.dedup_saved['embeddings'], kind='embeddings')
+        self.metrics.inc('embed_retries_total', backoff_stats['retries'])
+        self.metrics.inc('embed_backoff_seconds_total', backoff_stats['seconds'])
+        if self.embedder.limiter is not None:
+            self.metrics.inc('rate_limiter_wait_seconds_total', self.embedder.limiter.waited_seconds)
+    
+    def load_all_documents(self, documents_dir: str = "documents") -> Optional[Dict[str, int]]:
+        """Cargar todos los documentos del directorio con el pipeline de load_documents_parallel"""
+        files = expand_paths([documents_dir])
+        if not files:
+            print(f"❌ No se encontraron documentos en {documents_dir}")
+            return None
         
-        # Chunkear documento
-        chunks = self.chunk_document(text)
-        print(f"🔪 Chunks creados: {len(chunks)}")
+        print(f"📚 Encontrados {len(files)} documentos para procesar")
+        return self.load_documents_parallel(files)
+    
+    def load_documents_parallel(self, files: List[str], workers: int = None, concurrency: int = 4) -> Dict[str, int]:
+        """
+        Cargar varios documentos en pipeline: lectura y chunking en un pool de
+        procesos, embeddings y escrituras en hilos concurrentes. Las colas
+        entre etapas están acotadas, así que una etapa lenta frena a las
+        anteriores en lugar de acumular documentos en memoria.
+        """
+        return asyncio.run(self._run_pipeline(files, workers or os.cpu_count() or 1, concurrency))
+    
+    async def _run_pipeline(self, files: List[str], workers: int, concurrency: int) -> Dict[str, int]:
+        loop = asyncio.get_running_loop()
+        parsed_queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, concurrency))
+        write_queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, concurrency))
+        stats = {'files': len(files), 'skipped': 0, 'empty': 0, 'failed': 0, 'completed': 0}
         
-        # Procesar cada chunk
-        for i, chunk_data in enumerate(chunks):
-            print(f"  Procesando chunk {i+1}/{len(chunks)}...")
+        async def parse_stage(executor: ProcessPoolExecutor):
+            # Como mucho `workers` archivos en lectura a la vez; el resto espera
+            in_flight = asyncio.Semaphore(workers)
             
-            # Crear chunk
-            chunk_id = self.create_chunk(section_id, chunk_data)
-            if not chunk_id:
-                continue
+            async def parse_one(file_path):
+                async with in_flight:
+                    job = await asyncio.to_thread(self.check_document, file_path)
+                    if job is None:
+                        stats['skipped'] += 1
+                        return
+                    try:
+                        parsed = await loop.run_in_executor(executor, _parse_in_worker, job['file_path'])
+                    except Exception as e:
+                        print(f"❌ Error leyendo {job['source']}: {e}")
+                        stats['failed'] += 1
+                        return
+                    if parsed is None:
+                        print(f"⚠️ Documento vacío: {job['source']}")
+                        stats['empty'] += 1
+                        return
+                    self.record_parse(job, parsed)
+                    await parsed_queue.put((job, parsed))
             
-            # Generar embedding con reintentos
-            try:
-                embedding = self.get_embedding_with_retry(chunk_data['text'])
-                if embedding:
-                    self.create_embedding(chunk_id, embedding)
-                    print(f"    ✅ Embedding creado")
-                else:
-                    print(f"    ⚠️ No se pudo generar embedding después de reintentos")
-                
-                # Pausa entre requests para evitar rate limits
-                time.sleep(1.5)  # 1.5 segundos entre cada embedding
-                
-            except Exception as e:
-                print(f"    ❌ Error generando embedding: {e}")
+            await asyncio.gather(*(parse_one(file_path) for file_path in files))
         
-        print(f"✅ Documento procesado: {source}")
-    
-    def load_all_documents(self, documents_dir: str = "documents"):
-        """Cargar todos los documentos del directorio"""
-        documents_path = Path(documents_dir)
-        
-        if not documents_path.exists():
-            print(f"❌ Directorio {documents_dir} no existe")
-            return
+        async def embed_stage():
+            while True:
+                item = await parsed_queue.get()
+                if item is None:
+                    return
+                job, parsed = item
+                try:
+                    ok = await asyncio.to_thread(self.run_stage, 'prepare', job, self.prepare_document, job, parsed)
+                    ok = ok and await asyncio.to_thread(self.run_stage, 'embed', job, self.embed_document, job)
+                except Exception as e:
+                    print(f"❌ Error preparando {job['source']}: {e}")
+                    ok = False
+                if ok:
+                    await write_queue.put(job)
+                else:
+                    stats['failed'] += 1
         
-        # Encontrar todos los archivos
-        files = []
-        for ext in ['*.pdf', '*.txt', '*.doc', '*.docx']:
-            files.extend(documents_path.glob(ext))
+        async def write_stage():
+            while True:
+                job = await write_queue.get()
+                if job is None:
+                    return
+                try:
+                    ok = await asyncio.to_thread(self.run_stage, 'insert', job, self.write_document, job)
+                except Exception as e:
+                    print(f"❌ Error escribiendo {job['source']}: {e}")
+                    ok = False
+                stats['completed' if ok else 'failed'] += 1
         
-        if not files:
-            print(f"❌ No se encontraron documentos en {documents_dir}")
-            return
+        profiler = self.metrics.profiler
+        initargs = (profiler.mode, profiler.output_dir) if profiler else (None, None)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_parser_worker, initargs=initargs) as executor:
+            embedders = [asyncio.create_task(embed_stage()) for _ in range(concurrency)]
+            # CopyBulkWriter abre una conexión por hilo: las escrituras (y las de
+            # prepare en los hilos de embed) no comparten transacción
+            writers = [asyncio.create_task(write_stage()) for _ in range(concurrency)]
+            
+            await parse_stage(executor)
+            for _ in embedders:
+                await parsed_queue.put(None)
+            await asyncio.gather(*embedders)
+            for _ in writers:
+                await write_queue.put(None)
+            await asyncio.gather(*writers)
         
-        print(f"📚 Encontrados {len(files)} documentos para procesar")
+        return stats
+
+    def process_lease(self, queue: JobQueue, lease: Lease) -> str:
+        """
+        Procesar un trabajo de la cola con las mismas etapas que
+        process_document. El documento se crea con el document_id del lease;
+        si algo falla, fail() devuelve el trabajo a la cola y borra sus filas.
+        Si el lease se pierde, este worker borra lo que escribió (discard).
+        Devuelve 'completed', 'empty', 'failed' o 'lost'.
+        """
+        job = {
+            'file_path': lease.path,
+            'source': Path(lease.path).name,
+            'manifest_key': lease.path,
+            'content_hash': lease.content_hash,
+            'entry': None,
+            'document_id': lease.document_id,
+            'lease': lease
+        }
+        if lease.previous_document_id:
+            print(f"♻️ {job['source']}: reclamado (intento {lease.attempts}), filas del intento anterior borradas")
+        try:
+            if file_hash(lease.path) != lease.content_hash:
+                raise ValueError('el archivo cambió desde que se encoló')
+            parsed = self.parse_document(lease.path)
+            if parsed is None:
+                print(f"⚠️ Documento vacío: {job['source']}")
+                return 'empty' if queue.complete(lease) else 'lost'
+            self.record_parse(job, parsed)
+            ok = (self.run_stage('prepare', job, self.prepare_document, job, parsed)
+                  and self.run_stage('embed', job, self.embed_document, job)
+                  and self.run_stage('insert', job, self.write_document, job))
+            if lease.lost.is_set():
+                return self.discard_lease(queue, lease, job)
+            if not ok:
+                raise RuntimeError('el documento no se cargó completo')
+        except Exception as e:
+            print(f"❌ Error procesando {job['source']}: {e}")
+            if not queue.fail(lease, str(e)):
+                return self.discard_lease(queue, lease, job)
+            return 'failed'
+        if not queue.complete(lease):
+            print(f"⚠️ Lease perdido al confirmar: {job['source']}")
+            return self.discard_lease(queue, lease, job)
+        return 'completed'
+    
+    def discard_lease(self, queue: JobQueue, lease: Lease, job: Dict[str, Any]) -> str:
+        """Borrar las filas de un intento cuyo lease reclamó otro worker"""
+        try:
+            queue.discard(lease)
+            print(f"🗑️ {job['source']}: lease perdido, filas de este intento borradas")
+        except Exception as e:
+            print(f"⚠️ No se pudieron borrar las filas de {job['source']} ({lease.document_id}): {e}")
+        return 'lost'
+    
+    def load_from_queue(self, queue: JobQueue, concurrency: int = 1, poll_interval: float = 1.0) -> Dict[str, int]:
+        """
+        Worker de la cola: `concurrency` hilos toman trabajos hasta que no
+        queda ninguno pendiente ni en curso. Si quedan trabajos en curso de
+        otros workers se sigue esperando, por si su lease vence. Con
+        LOADER_COPY_DSN cada hilo escribe por su propia conexión.
+        """
+        stats = {'completed': 0, 'empty': 0, 'failed': 0, 'lost': 0}
+        lock = threading.Lock()
         
-        # Procesar cada documento
-        for file_path in files:
-            self.process_document(file_path)
+        def work():
+            while True:
+                lease = queue.claim()
+                if lease is None:
+                    if queue.drained():
+                        return
+                    time.sleep(poll_interval)
+                    continue
+                with queue.keep_alive(lease):
+                    outcome = self.process_lease(queue, lease)
+                with lock:
+                    stats[outcome] += 1
         
-        print(f"\n🎉 Proceso completado! {len(files)} documentos procesados")
+        threads = [threading.Thread(target=work) for _ in range(max(1, concurrency))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return stats
+
+# Parser por proceso del pool: el tokenizer se carga una vez por worker
+_worker_parser: Optional[DocumentParser] = None
+_worker_profiler: Optional[WorkerProfiler] = None
+
+def _init_parser_worker(profile_mode: str = None, profile_dir: str = None):
+    global _worker_parser, _worker_profiler
+    _worker_parser = DocumentParser()
+    # Cargar el tokenizer al arrancar el worker y no dentro del primer documento
+    _worker_parser.chunker
+    _worker_profiler = WorkerProfiler(profile_mode, profile_dir)
+
+def _parse_in_worker(file_path: str) -> Optional[Dict[str, Any]]:
+    parsed, extra = _worker_profiler.run(_worker_parser.parse_document, file_path)
+    if parsed is not None:
+        parsed.update(extra)
+    return parsed
+
+def expand_paths(paths: List[str]) -> List[str]:
+    """Expandir directorios (recursivo), globs y archivos sueltos a una lista de documentos"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            matches = [str(p) for p in sorted(Path(path).rglob('*'))]
+        elif glob.has_magic(path):
+            matches = sorted(glob.glob(path, recursive=True))
+        else:
+            matches = [path]
+        files.extend(m for m in matches if os.path.isfile(m) and Path(m).suffix.lower() in DOCUMENT_EXTENSIONS)
+    # Sin duplicados, conservando el orden
+    return list(dict.fromkeys(files))
 
 def main():
     """Función principal"""
-    print("�� Iniciando carga de la Constitución de la CDMX...")
+    parser = argparse.ArgumentParser(description='Cargar documentos legales con embeddings')
+    parser.add_argument('paths', nargs='*', default=['documents'],
+                        help='Directorios, globs (p. ej. "documents/**/*.pdf") o archivos')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Procesos para lectura y chunking')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='Documentos en embedding/escritura simultáneamente')
+    parser.add_argument('--batch-size', type=int, default=500, help='Filas por lote de escritura')
+    parser.add_argument('--dedup', choices=DEDUP_MODES,
+                        help='Duplicados: off o reuse (comparten embedding); por defecto DEDUP_MODE o reuse')
+    parser.add_argument('--embedding-provider', choices=list(PROVIDERS),
+                        help='Proveedor de embeddings (por defecto EMBEDDING_PROVIDER o gemini)')
+    parser.add_argument('--metrics-dir', default=os.environ.get('INGEST_METRICS_DIR', ''),
+                        help='Escribir events.jsonl (por etapa y documento) e ingest.prom (Prometheus) en este directorio')
+    parser.add_argument('--profile', choices=PROFILE_MODES, help='Perfilar la carga con cProfile o tracemalloc')
+    parser.add_argument('--profile-dir', default='.cache/ingest_profile', help='Directorio del informe de --profile')
+    parser.add_argument('--queue', action='store_true',
+                        help='Encolar los archivos en ingest_jobs y procesar la cola (varios workers o máquinas)')
+    parser.add_argument('--enqueue-only', action='store_true', help='Solo encolar los archivos')
+    parser.add_argument('--lease-seconds', type=float, default=DEFAULT_LEASE_SECONDS,
+                        help='Duración del lease de un trabajo de la cola (se renueva cada tercio)')
+    parser.add_argument('--worker-id', help='Nombre del worker en ingest_jobs (por defecto host:pid)')
+    args = parser.parse_args()
     
-    loader = DocumentLoader()
+    files = expand_paths(args.paths)
+    if not files:
+        print(f"❌ No se encontraron documentos en {', '.join(args.paths)}")
+        return
     
-    # Procesar solo el archivo específico
-    file_path = "documents/constitucion-politica-de-la-ciudad-de-mexico.pdf"
+    print(f"📚 Encontrados {len(files)} documentos ({args.workers} workers, concurrencia {args.concurrency})")
+    metrics = IngestMetrics(jsonl_path=os.path.join(args.metrics_dir, 'events.jsonl') if args.metrics_dir else None)
+    if args.profile:
+        metrics.profiler = StageProfiler(args.profile, args.profile_dir)
+        metrics.profiler.start()
+    loader = DocumentLoader(copy_dsn=os.environ.get('LOADER_COPY_DSN'), batch_size=args.batch_size, dedup_mode=args.dedup,
+                            metrics=metrics, embedding_provider=args.embedding_provider)
     
-    if not os.path.exists(file_path):
-        print(f"❌ Archivo no encontrado: {file_path}")
-        return
+    start = time.perf_counter()
+    if args.queue or args.enqueue_only:
+        queue = JobQueue(loader.supabase, worker_id=args.worker_id, lease_seconds=args.lease_seconds)
+        added, known = queue.enqueue(files)
+        print(f"📥 Cola de ingesta: {added} trabajos nuevos, {known} ya encolados")
+        if args.enqueue_only:
+            metrics.close()
+            if metrics.profiler is not None:
+                print(f"🔬 Perfil ({args.profile}) en {metrics.profiler.report()}")
+            return
+        # La cola sabe qué versión de cada archivo está cargada; el manifiesto es local a cada máquina
+        loader.manifest = None
+        stats = loader.load_from_queue(queue, concurrency=args.concurrency)
+        stats['skipped'] = 0
+    else:
+        stats = loader.load_documents_parallel(files, workers=args.workers, concurrency=args.concurrency)
+    elapsed = time.perf_counter() - start
+    loader.finish_metrics(stats)
+    
+    print(f"\n🎉 Proceso completado en {elapsed:.1f}s: {stats['completed']} cargados, "
+          f"{stats['skipped']} sin cambios, {stats['empty']} vacíos, {stats['failed']} con errores")
+    if args.queue:
+        print(f"📋 Este worker: {stats['lost']} leases perdidos; cola: "
+              + ', '.join(f'{count} {status}' for status, count in queue.counts().items()))
+    if loader.dedup is not None:
+        print(f"🧬 Deduplicación ({loader.dedup_mode}): {loader.dedup.stats['exact']} exactos, "
+              f"{loader.dedup.stats['near']} casi exactos de {loader.dedup.stats['checked']} chunks; "
+              f"{loader.dedup_saved['embeddings']} embeddings ahorrados")
     
-    print(f"📄 Procesando: {file_path}")
-    loader.process_document(file_path)
-    print("✅ Constitución de la CDMX procesada exitosamente!")
+    summary = metrics.summary()
+    if summary:
+        print("\n⏱️ Tiempo por etapa (segundos por documento):")
+        print(f"{'Etapa':<10} {'Docs':<6} {'Total':<10} {'p50':<9} {'p95':<9} {'Máx':<9}")
+        for stage, row in summary.items():
+            print(f"{stage:<10} {row['count']:<6} {row['total_s']:<10.2f} {row['p50_s']:<9.3f} {row['p95_s']:<9.3f} {row['max_s']:<9.3f}")
+        limiter_wait = loader.embedder.limiter.waited_seconds if loader.embedder.limiter is not None else 0.0
+        print(f"⏳ Esperas de embeddings ({loader.embedder.name}): {backoff_stats['retries']} reintentos, "
+              f"{backoff_stats['seconds']:.1f}s de backoff, {limiter_wait:.1f}s en el limitador")
+    if args.metrics_dir:
+        metrics.write_prometheus(os.path.join(args.metrics_dir, 'ingest.prom'))
+        print(f"📈 Métricas en {args.metrics_dir} (events.jsonl, ingest.prom)")
+    metrics.close()
+    if metrics.profiler is not None:
+        print(f"🔬 Perfil ({args.profile}) en {metrics.profiler.report()}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Re-embedding del corpus con otro modelo o dimensión, sin vaciar las tablas.
+
+Los vectores nuevos se escriben en chunk_embeddings con la versión
+'<modelo>@<dimensión>' del proveedor, junto a los de la versión activa, que
+sigue sirviendo la recuperación mientras tanto. El job es reanudable (guarda
+un checkpoint tras cada página) y reporta chunks/s y ETA. Con --activate,
+al completar la cobertura la versión pasa a ser la activa en una sola
+transacción (supabase/migrations/20240627000000_add_model_embeddings.sql).
+
+Uso:
+    python scripts/reembed.py --status
+    python scripts/reembed.py --provider local --page-size 500
+    python scripts/reembed.py --provider local --activate
+    python scripts/reembed.py --activate-version models/embedding-001@768 --force
+"""
+
+import os
+import sys
+import argparse
+
+# Agregar el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.embedding_cache import open_default_cache
+from lib.embedding_migration import DEFAULT_PAGE_SIZE, ReembedJob, activate, list_models, missing_chunks
+from lib.embedding_providers import EMBEDDING_DIMENSION, PROVIDERS, get_provider
+from lib.rate_limiter import TokenBucketRateLimiter
+
+
+def print_status(supabase):
+    print(f"{'Versión':<56} {'Estado':<10} {'Dim.':<6} {'Faltan':<8} {'Checkpoint'}")
+    print("-" * 100)
+    for model in list_models(supabase):
+        print(f"{model['model_version']:<56} {model['status']:<10} {model['dimension']:<6} "
+              f"{missing_chunks(supabase, model['model_version']):<8} {model.get('checkpoint_chunk_id') or '-'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-embedding del corpus y cambio de modelo de embeddings')
+    parser.add_argument('--provider', choices=sorted(PROVIDERS), help='Proveedor de embeddings (por defecto EMBEDDING_PROVIDER)')
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE, help='Chunks por página (y por checkpoint)')
+    parser.add_argument('--concurrency', type=int, help='Lotes de embeddings en paralelo')
+    parser.add_argument('--requests-per-minute', type=float, help='Límite propio de requests (por defecto el del proveedor)')
+    parser.add_argument('--activate', action='store_true', help='Activar la versión al completar la cobertura')
+    parser.add_argument('--activate-version', help='Solo activar esta versión (p. ej. volver a la anterior)')
+    parser.add_argument('--force', action='store_true', help='Activar aunque falten chunks')
+    parser.add_argument('--status', action='store_true', help='Mostrar las versiones y su cobertura')
+    parser.add_argument('--local', metavar='PATH', help='Base SQLite de LocalSupabaseClient en lugar de Supabase')
+    args = parser.parse_args()
+
+    if args.local:
+        from lib.supabase.local_client import LocalSupabaseClient
+        supabase = LocalSupabaseClient(args.local)
+    else:
+        from lib.supabase.client import create_client
+        supabase = create_client()
+
+    if args.status:
+        print_status(supabase)
+        return
+
+    if args.activate_version:
+        model = activate(supabase, args.activate_version, force=args.force)
+        print(f"✅ Versión activa: {model['model_version']}")
+        return
+
+    provider = get_provider(args.provider)
+    # La caché de embeddings en disco tiene una dimensión fija
+    cache = open_default_cache() if provider.dimension == EMBEDDING_DIMENSION else None
+    limiter = TokenBucketRateLimiter(args.requests_per_minute) if args.requests_per_minute else None
+    job = ReembedJob(supabase, provider, page_size=args.page_size, cache=cache,
+                     concurrency=args.concurrency, limiter=limiter)
+    try:
+        stats = job.run()
+    finally:
+        if cache is not None:
+            cache.close()
+
+    rate = stats['embedded'] / stats['seconds'] if stats['seconds'] else 0.0
+    print(f"📊 {stats['embedded']} embeddings nuevos, {stats['skipped']} ya estaban, "
+          f"{stats['pages']} páginas en {stats['seconds']:.1f} s ({rate:.1f} chunks/s)")
+    if stats['missing']:
+        print(f"⚠️  Faltan {stats['missing']} chunks: vuelve a ejecutar el job antes de activar {job.version}")
+        if args.activate and not args.force:
+            raise SystemExit(1)
+
+    if args.activate:
+        model = activate(supabase, job.version, force=args.force)
+        print(f"✅ Versión activa: {model['model_version']}")
+
+
+if __name__ == "__main__":
+    main()
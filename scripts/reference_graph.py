@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Mantenimiento del grafo de referencias entre artículos (tabla article_references).
+
+load_documents.py actualiza el grafo de cada documento al cargarlo y
+corpus_snapshot.py al restaurarlo; este script lo reconstruye para documentos
+cargados antes de la migración y muestra qué artículos cita uno dado.
+
+Uso:
+    python scripts/reference_graph.py --rebuild
+    python scripts/reference_graph.py --rebuild --local /tmp/corpus.sqlite3
+    python scripts/reference_graph.py --stats
+    python scripts/reference_graph.py --article 27
+"""
+
+import os
+import json
+import sys
+import time
+import argparse
+
+# Agregar el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.reference_graph import CrossReferenceGraph, update_document_references
+
+
+def open_client(args):
+    if args.local:
+        from lib.supabase.local_client import LocalSupabaseClient
+        return LocalSupabaseClient(args.local)
+    from lib.supabase.client import create_client
+    return create_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reconstruir o inspeccionar el grafo de referencias entre artículos')
+    parser.add_argument('--rebuild', action='store_true', help='Recalcular article_references de todos los documentos')
+    parser.add_argument('--stats', action='store_true', help='Cargar el grafo e imprimir su tamaño')
+    parser.add_argument('--article', help='Artículos citados por este artículo en cada documento')
+    parser.add_argument('--local', metavar='PATH', help='Base SQLite de LocalSupabaseClient en lugar de Supabase')
+    args = parser.parse_args()
+    if not (args.rebuild or args.stats or args.article):
+        parser.error('indica --rebuild, --stats o --article')
+
+    supabase = open_client(args)
+
+    if args.rebuild:
+        documents = supabase.table('documents').select('document_id, source').execute().data or []
+        start = time.perf_counter()
+        references = 0
+        for document in documents:
+            rows = update_document_references(supabase, document['document_id'])
+            count = sum(len(row['referenced_articles']) for row in rows)
+            references += count
+            print(f"🔗 {document['source']}: {count} referencias en {len(rows)} artículos")
+        print(f"✅ {len(documents)} documentos, {references} referencias en {time.perf_counter() - start:.1f} s")
+
+    if args.stats or args.article:
+        start = time.perf_counter()
+        graph = CrossReferenceGraph.from_supabase(supabase)
+        print(f"📊 {len(graph)} artículos, {graph.edges} referencias, {graph.nbytes / 1024:.1f} KB "
+              f"de adyacencias, cargado en {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    if args.article:
+        rows = supabase.table('article_references').select('document_id, section_id, referenced_articles') \
+            .eq('article_number', args.article).execute().data or []
+        for row in rows:
+            cited = row['referenced_articles']
+            if isinstance(cited, str):
+                cited = json.loads(cited)
+            print(f"   {row['document_id']} (sección {row['section_id']}): Art. {args.article} -> {', '.join(cited) or '(ninguno)'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+-- Búsqueda exacta por artículo ("artículo 27") sin pasar por la búsqueda vectorial.
+-- article_number se guarda en forma canónica desde la ingesta: '27', '274 bis', 'PRIMERA'.
+
+-- chunks.document_id: la ingesta la escribe para filtrar los chunks de un
+-- documento (y unir con documents) sin pasar por sections. Se borra con el
+-- documento, igual que sus secciones.
+ALTER TABLE chunks ADD COLUMN IF NOT EXISTS document_id UUID;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'chunks_document_id_fkey') THEN
+        ALTER TABLE chunks ADD CONSTRAINT chunks_document_id_fkey
+            FOREIGN KEY (document_id) REFERENCES documents(document_id) ON DELETE CASCADE;
+    END IF;
+END;
+$$;
+
+-- Chunks ya cargados: el documento de su sección
+UPDATE chunks c SET document_id = s.document_id
+FROM sections s
+WHERE s.section_id = c.section_id AND c.document_id IS NULL;
+
+-- Los inserts que no la traen (p. ej. las rutas de app/api/upload*) la toman de su sección
+CREATE OR REPLACE FUNCTION chunks_fill_document_id()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF NEW.document_id IS NULL AND NEW.section_id IS NOT NULL THEN
+        SELECT s.document_id INTO NEW.document_id FROM sections s WHERE s.section_id = NEW.section_id;
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS chunks_fill_document_id ON chunks;
+CREATE TRIGGER chunks_fill_document_id
+    BEFORE INSERT ON chunks
+    FOR EACH ROW EXECUTE FUNCTION chunks_fill_document_id();
+
+CREATE INDEX IF NOT EXISTS idx_chunks_article_number ON chunks (article_number);
+CREATE INDEX IF NOT EXISTS idx_chunks_document_article ON chunks (document_id, article_number, chunk_order);
+CREATE INDEX IF NOT EXISTS idx_sections_document ON sections (document_id);
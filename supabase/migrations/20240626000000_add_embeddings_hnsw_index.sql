@@ -0,0 +1,67 @@
+-- 20240320000001 creó embeddings.embedding como TEXT; el índice requiere vector(768)
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'embeddings' AND column_name = 'embedding' AND data_type = 'text'
+    ) THEN
+        ALTER TABLE embeddings ALTER COLUMN embedding TYPE vector(768) USING embedding::vector(768);
+    END IF;
+END;
+$$;
+
+-- Índice HNSW para búsqueda aproximada por coseno (declarado en lib/db/schema.ts
+-- como embeddings_hnsw_idx pero nunca creado por una migración).
+-- m: vecinos por nodo; ef_construction: amplitud de búsqueda al construir.
+CREATE INDEX IF NOT EXISTS embeddings_hnsw_idx
+    ON embeddings USING hnsw (embedding vector_cosine_ops)
+    WITH (m = 16, ef_construction = 64);
+
+-- match_documents ordenaba el join completo documents/sections/chunks/embeddings,
+-- lo que impide usar el índice. Ahora se eligen primero los vecinos más cercanos
+-- solo sobre embeddings (escaneo del índice HNSW) y después se une el resto.
+-- ef_search controla el equilibrio recall/latencia de cada consulta (debe ser >= match_count).
+DROP FUNCTION IF EXISTS match_documents(VECTOR(768), integer);
+
+CREATE OR REPLACE FUNCTION match_documents(
+    query_embedding VECTOR(768),
+    match_count INT DEFAULT 10,
+    ef_search INT DEFAULT 40
+)
+RETURNS TABLE (
+    document_id UUID,
+    source TEXT,
+    legal_document_name TEXT,
+    content TEXT,
+    chunk_id UUID,
+    similarity_score FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM set_config('hnsw.ef_search', GREATEST(ef_search, match_count)::text, true);
+
+    RETURN QUERY
+    WITH nearest AS (
+        SELECT
+            e.chunk_id,
+            e.embedding <=> query_embedding AS distance
+        FROM embeddings e
+        WHERE e.embedding IS NOT NULL
+        ORDER BY e.embedding <=> query_embedding
+        LIMIT match_count
+    )
+    SELECT
+        d.document_id,
+        d.source,
+        d.source as legal_document_name,
+        c.chunk_text as content,
+        c.chunk_id,
+        1 - n.distance as similarity_score
+    FROM nearest n
+    JOIN chunks c ON c.chunk_id = n.chunk_id
+    JOIN sections s ON s.section_id = c.section_id
+    JOIN documents d ON d.document_id = s.document_id
+    ORDER BY n.distance;
+END;
+$$;
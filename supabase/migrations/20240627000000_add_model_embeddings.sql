@@ -0,0 +1,166 @@
+-- Embeddings versionados por modelo, para migrar el corpus a otro modelo o
+-- dimensión sin vaciar las tablas (scripts/reembed.py).
+--
+-- embedding_models registra cada versión ('<modelo>@<dimensión>'). La tabla
+-- embeddings de siempre es la versión inicial (models/embedding-001@768); las
+-- demás guardan sus vectores en chunk_embeddings, junto a los anteriores.
+-- Solo una versión está activa: es la que usa la recuperación.
+
+CREATE TABLE IF NOT EXISTS embedding_models (
+    model_version TEXT PRIMARY KEY,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    dimension INTEGER NOT NULL,
+    -- building: el job de re-embedding la está llenando; active: la usa la recuperación; retired: la anterior
+    status TEXT NOT NULL DEFAULT 'building' CHECK (status IN ('building', 'active', 'retired')),
+    -- Tabla de los vectores: embeddings (versión inicial) o chunk_embeddings
+    source_table TEXT NOT NULL DEFAULT 'chunk_embeddings' CHECK (source_table IN ('embeddings', 'chunk_embeddings')),
+    -- Checkpoint del job: último chunk_id procesado en la pasada en curso
+    checkpoint_chunk_id TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL,
+    activated_at TIMESTAMP WITH TIME ZONE
+);
+
+-- Como mucho una versión activa
+CREATE UNIQUE INDEX IF NOT EXISTS embedding_models_one_active_idx ON embedding_models (status) WHERE status = 'active';
+
+INSERT INTO embedding_models (model_version, provider, model, dimension, status, source_table, activated_at)
+VALUES ('models/embedding-001@768', 'gemini', 'models/embedding-001', 768, 'active', 'embeddings', timezone('utc'::text, now()))
+ON CONFLICT (model_version) DO NOTHING;
+
+-- vector sin dimensión: cada versión puede tener la suya. La búsqueda usa un
+-- índice HNSW parcial por versión sobre embedding::vector(<dimensión>), que
+-- crea activate_embedding_model.
+CREATE TABLE IF NOT EXISTS chunk_embeddings (
+    chunk_id UUID NOT NULL REFERENCES chunks(chunk_id) ON DELETE CASCADE,
+    model_version TEXT NOT NULL REFERENCES embedding_models(model_version) ON DELETE CASCADE,
+    embedding vector NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL,
+    PRIMARY KEY (model_version, chunk_id)
+);
+
+CREATE INDEX IF NOT EXISTS chunk_embeddings_chunk_idx ON chunk_embeddings (chunk_id);
+
+-- Chunks sin vector en una versión
+CREATE OR REPLACE FUNCTION embedding_model_missing(p_model_version TEXT)
+RETURNS BIGINT
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    v_source TEXT;
+    v_missing BIGINT;
+BEGIN
+    SELECT source_table INTO v_source FROM embedding_models WHERE model_version = p_model_version;
+    IF v_source IS NULL THEN
+        RAISE EXCEPTION 'Versión de embeddings desconocida: %', p_model_version;
+    END IF;
+
+    IF v_source = 'embeddings' THEN
+        SELECT count(*) INTO v_missing FROM chunks c
+        WHERE NOT EXISTS (SELECT 1 FROM embeddings e WHERE e.chunk_id = c.chunk_id AND e.embedding IS NOT NULL);
+    ELSE
+        SELECT count(*) INTO v_missing FROM chunks c
+        WHERE NOT EXISTS (
+            SELECT 1 FROM chunk_embeddings ce WHERE ce.model_version = p_model_version AND ce.chunk_id = c.chunk_id
+        );
+    END IF;
+    RETURN v_missing;
+END;
+$$;
+
+-- Cambio atómico de versión activa. Falla si a la versión le falta algún
+-- chunk, salvo con p_force (p. ej. volver a la versión anterior tras cargar
+-- documentos nuevos). La tabla se bloquea, así dos activaciones no se cruzan.
+CREATE OR REPLACE FUNCTION activate_embedding_model(p_model_version TEXT, p_force BOOLEAN DEFAULT FALSE)
+RETURNS SETOF embedding_models
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_model embedding_models;
+    v_missing BIGINT;
+    v_index TEXT;
+BEGIN
+    LOCK TABLE embedding_models IN SHARE ROW EXCLUSIVE MODE;
+    SELECT * INTO v_model FROM embedding_models WHERE model_version = p_model_version;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Versión de embeddings desconocida: %', p_model_version;
+    END IF;
+
+    v_missing := embedding_model_missing(p_model_version);
+    IF v_missing > 0 AND NOT p_force THEN
+        RAISE EXCEPTION 'La versión % no cubre el corpus: faltan % chunks', p_model_version, v_missing;
+    END IF;
+
+    IF v_model.source_table = 'chunk_embeddings' THEN
+        v_index := 'chunk_embeddings_hnsw_' || substr(md5(p_model_version), 1, 12);
+        EXECUTE format(
+            'CREATE INDEX IF NOT EXISTS %I ON chunk_embeddings USING hnsw ((embedding::vector(%s)) vector_cosine_ops) '
+            'WITH (m = 16, ef_construction = 64) WHERE model_version = %L',
+            v_index, v_model.dimension, p_model_version
+        );
+    END IF;
+
+    UPDATE embedding_models SET status = 'retired', updated_at = timezone('utc'::text, now())
+    WHERE status = 'active' AND model_version <> p_model_version;
+    UPDATE embedding_models
+    SET status = 'active', activated_at = timezone('utc'::text, now()), updated_at = timezone('utc'::text, now())
+    WHERE model_version = p_model_version;
+
+    RETURN QUERY SELECT * FROM embedding_models WHERE model_version = p_model_version;
+END;
+$$;
+
+-- match_documents sobre los vectores de una versión de chunk_embeddings.
+-- El embedding de la consulta debe venir del mismo modelo; el cast a
+-- vector(<dimensión>) coincide con la expresión del índice parcial.
+CREATE OR REPLACE FUNCTION match_chunk_embeddings(
+    query_embedding vector,
+    p_model_version TEXT,
+    match_count INT DEFAULT 10,
+    ef_search INT DEFAULT 40
+)
+RETURNS TABLE (
+    document_id UUID,
+    source TEXT,
+    legal_document_name TEXT,
+    content TEXT,
+    chunk_id UUID,
+    similarity_score FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_dimension INTEGER;
+BEGIN
+    SELECT dimension INTO v_dimension FROM embedding_models
+    WHERE model_version = p_model_version AND source_table = 'chunk_embeddings';
+    IF v_dimension IS NULL THEN
+        RAISE EXCEPTION 'Versión de chunk_embeddings desconocida: %', p_model_version;
+    END IF;
+    IF vector_dims(query_embedding) <> v_dimension THEN
+        RAISE EXCEPTION 'El embedding de la consulta tiene % dimensiones; % usa %',
+            vector_dims(query_embedding), p_model_version, v_dimension;
+    END IF;
+
+    PERFORM set_config('hnsw.ef_search', GREATEST(ef_search, match_count)::text, true);
+
+    RETURN QUERY EXECUTE format(
+        'WITH nearest AS (
+            SELECT ce.chunk_id, ce.embedding::vector(%1$s) <=> $1::vector(%1$s) AS distance
+            FROM chunk_embeddings ce
+            WHERE ce.model_version = $2
+            ORDER BY ce.embedding::vector(%1$s) <=> $1::vector(%1$s)
+            LIMIT $3
+        )
+        SELECT d.document_id, d.source, d.source, c.chunk_text, c.chunk_id, 1 - n.distance
+        FROM nearest n
+        JOIN chunks c ON c.chunk_id = n.chunk_id
+        JOIN sections s ON s.section_id = c.section_id
+        JOIN documents d ON d.document_id = s.document_id
+        ORDER BY n.distance',
+        v_dimension
+    ) USING query_embedding, p_model_version, match_count;
+END;
+$$;
@@ -0,0 +1,192 @@
+-- Cola de trabajos de ingesta para varios workers (scripts/load_documents.py --queue).
+--
+-- Cada archivo (ruta + hash de contenido) es un trabajo. Un worker lo toma con
+-- claim_ingest_job y recibe un lease: un token y una hora de vencimiento que
+-- renueva con heartbeat_ingest_job mientras trabaja. Si el worker muere, el
+-- lease vence y otro worker lo reclama. Cada intento escribe bajo un
+-- document_id propio; solo el intento que conserva el token puede confirmar el
+-- trabajo (complete_ingest_job), y las filas de los intentos anteriores se
+-- borran al reclamar, así cada archivo queda cargado exactamente una vez.
+
+CREATE TABLE IF NOT EXISTS ingest_jobs (
+    job_id TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    -- pending -> running -> done | failed; superseded: una versión más nueva del archivo reemplazó sus filas
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'running', 'done', 'failed', 'superseded')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    worker_id TEXT,
+    lease_token UUID,
+    lease_expires_at TIMESTAMP WITH TIME ZONE,
+    -- Documento del intento en curso (o del que se confirmó)
+    document_id UUID,
+    error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL,
+    started_at TIMESTAMP WITH TIME ZONE,
+    finished_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX IF NOT EXISTS ingest_jobs_claim_idx ON ingest_jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS ingest_jobs_path_idx ON ingest_jobs (path);
+
+-- Borrar un documento con sus secciones, chunks y embeddings: las FK de
+-- lib/db/schema.ts son ON DELETE CASCADE de documents a sections, chunks y
+-- embeddings
+CREATE OR REPLACE FUNCTION delete_ingest_document(p_document_id UUID)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    DELETE FROM documents WHERE document_id = p_document_id;
+$$;
+
+-- Encolar trabajos [{job_id, path, content_hash}]; los que ya existen se ignoran.
+-- Devuelve cuántos se añadieron.
+CREATE OR REPLACE FUNCTION enqueue_ingest_jobs(p_jobs JSONB, p_max_attempts INTEGER DEFAULT 3)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_added INTEGER;
+BEGIN
+    INSERT INTO ingest_jobs (job_id, path, content_hash, max_attempts)
+    SELECT j->>'job_id', j->>'path', j->>'content_hash', p_max_attempts
+    FROM jsonb_array_elements(p_jobs) AS j
+    ON CONFLICT (job_id) DO NOTHING;
+    GET DIAGNOSTICS v_added = ROW_COUNT;
+    RETURN v_added;
+END;
+$$;
+
+-- Tomar el trabajo pendiente más antiguo (o uno con el lease vencido).
+-- SKIP LOCKED: dos workers nunca esperan por la misma fila ni la toman los
+-- dos. Devuelve el trabajo con el lease nuevo y, en previous_document_id, el
+-- documento del intento anterior, cuyas filas ya se borraron.
+CREATE OR REPLACE FUNCTION claim_ingest_job(p_worker_id TEXT, p_lease_seconds FLOAT DEFAULT 60)
+RETURNS TABLE (
+    job_id TEXT,
+    path TEXT,
+    content_hash TEXT,
+    attempts INTEGER,
+    lease_token UUID,
+    lease_expires_at TIMESTAMP WITH TIME ZONE,
+    document_id UUID,
+    previous_document_id UUID
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_job ingest_jobs;
+    v_previous UUID;
+    v_stale RECORD;
+BEGIN
+    -- Leases vencidos sin intentos restantes: el trabajo falla y se limpian sus filas
+    FOR v_stale IN
+        UPDATE ingest_jobs j
+        SET status = 'failed', error = 'Lease vencido en el último intento', lease_token = NULL,
+            finished_at = timezone('utc'::text, now())
+        WHERE j.status = 'running' AND j.lease_expires_at < now() AND j.attempts >= j.max_attempts
+        RETURNING j.document_id
+    LOOP
+        PERFORM delete_ingest_document(v_stale.document_id);
+    END LOOP;
+
+    SELECT * INTO v_job FROM ingest_jobs j
+    WHERE j.status = 'pending'
+       OR (j.status = 'running' AND j.lease_expires_at < now() AND j.attempts < j.max_attempts)
+    ORDER BY j.created_at, j.job_id
+    FOR UPDATE SKIP LOCKED
+    LIMIT 1;
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    v_previous := v_job.document_id;
+    IF v_previous IS NOT NULL THEN
+        PERFORM delete_ingest_document(v_previous);
+    END IF;
+
+    UPDATE ingest_jobs j
+    SET status = 'running',
+        attempts = j.attempts + 1,
+        worker_id = p_worker_id,
+        lease_token = gen_random_uuid(),
+        lease_expires_at = now() + make_interval(secs => p_lease_seconds),
+        document_id = gen_random_uuid(),
+        error = NULL,
+        started_at = COALESCE(j.started_at, timezone('utc'::text, now()))
+    WHERE j.job_id = v_job.job_id
+    RETURNING j.* INTO v_job;
+
+    RETURN QUERY SELECT v_job.job_id, v_job.path, v_job.content_hash, v_job.attempts, v_job.lease_token,
+        v_job.lease_expires_at, v_job.document_id, v_previous;
+END;
+$$;
+
+-- Renovar el lease. FALSE si el worker ya no tiene el trabajo.
+CREATE OR REPLACE FUNCTION heartbeat_ingest_job(p_job_id TEXT, p_lease_token UUID, p_lease_seconds FLOAT DEFAULT 60)
+RETURNS BOOLEAN
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE ingest_jobs
+    SET lease_expires_at = now() + make_interval(secs => p_lease_seconds)
+    WHERE job_id = p_job_id AND lease_token = p_lease_token AND status = 'running';
+    RETURN FOUND;
+END;
+$$;
+
+-- Confirmar el trabajo. Solo lo consigue quien tiene el token, una vez. Las
+-- cargas anteriores del mismo archivo (otro hash) se borran en la misma
+-- transacción y quedan como superseded.
+CREATE OR REPLACE FUNCTION complete_ingest_job(p_job_id TEXT, p_lease_token UUID)
+RETURNS BOOLEAN
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_path TEXT;
+    v_old RECORD;
+BEGIN
+    UPDATE ingest_jobs
+    SET status = 'done', lease_token = NULL, finished_at = timezone('utc'::text, now())
+    WHERE job_id = p_job_id AND lease_token = p_lease_token AND status = 'running'
+    RETURNING path INTO v_path;
+    IF NOT FOUND THEN
+        RETURN FALSE;
+    END IF;
+
+    FOR v_old IN
+        UPDATE ingest_jobs
+        SET status = 'superseded'
+        WHERE path = v_path AND job_id <> p_job_id AND status = 'done'
+        RETURNING document_id
+    LOOP
+        PERFORM delete_ingest_document(v_old.document_id);
+    END LOOP;
+    RETURN TRUE;
+END;
+$$;
+
+-- Devolver un trabajo que falló: vuelve a pending, o queda failed si no le
+-- quedan intentos. Las filas del intento se borran.
+CREATE OR REPLACE FUNCTION fail_ingest_job(p_job_id TEXT, p_lease_token UUID, p_error TEXT)
+RETURNS BOOLEAN
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_document UUID;
+BEGIN
+    UPDATE ingest_jobs
+    SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END,
+        error = p_error,
+        lease_token = NULL,
+        finished_at = CASE WHEN attempts >= max_attempts THEN timezone('utc'::text, now()) END
+    WHERE job_id = p_job_id AND lease_token = p_lease_token AND status = 'running'
+    RETURNING document_id INTO v_document;
+    IF NOT FOUND THEN
+        RETURN FALSE;
+    END IF;
+    PERFORM delete_ingest_document(v_document);
+    RETURN TRUE;
+END;
+$$;
@@ -0,0 +1,26 @@
+-- Grafo de referencias entre artículos (lib/reference_graph.py).
+--
+-- Una fila por artículo de cada documento con dos arreglos de adyacencia: los
+-- artículos del mismo documento que cita ("conforme al artículo 27"), de más
+-- a menos citado, y los chunk_id del propio artículo en orden. Un artículo es
+-- el par (section_id, article_number): section_id es la sección que numera el
+-- artículo, el bloque TRANSITORIOS que lo contiene o la sección raíz del
+-- documento, así los transitorios de dos decretos no se mezclan. Cada cita es
+-- el par (referenced_sections[i], referenced_articles[i]). La ingesta
+-- reescribe las filas de un documento al terminar de cargarlo; la
+-- recuperación carga la tabla completa en memoria y expande cada resultado
+-- con los chunks de los artículos que cita, sin otra búsqueda.
+
+CREATE TABLE IF NOT EXISTS article_references (
+    document_id UUID NOT NULL REFERENCES documents(document_id) ON DELETE CASCADE,
+    section_id UUID NOT NULL REFERENCES sections(section_id) ON DELETE CASCADE,
+    article_number VARCHAR(50) NOT NULL,
+    referenced_articles TEXT[] NOT NULL DEFAULT '{}',
+    referenced_sections UUID[] NOT NULL DEFAULT '{}',
+    chunk_ids UUID[] NOT NULL DEFAULT '{}',
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL,
+    PRIMARY KEY (document_id, section_id, article_number)
+);
+
+-- Qué artículos citan a uno dado (p. ej. para ver el impacto de una reforma)
+CREATE INDEX IF NOT EXISTS article_references_referenced_idx ON article_references USING GIN (referenced_articles);